@@ -0,0 +1,56 @@
+import tempfile
+from typing import Literal
+
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app import models, schemas
+from app.auth import get_current_admin
+from app.database import get_db, get_read_db
+from app.utils import bulk
+
+# Import bodies are spooled in memory up to this size, then on disk.
+SPOOL_MEMORY_SIZE = 1024 * 1024
+USER_COLUMNS = ["id", "email", "video_count"]
+VIDEO_COLUMNS = [
+    "id", "title", "description", "video_url", "image_url", "tags", "shared_by", "likes", "dislikes", "shared_at",
+]
+
+router = APIRouter(dependencies=[Depends(get_current_admin)])
+
+
+def export_response(db: Session, model, columns, format: str, name: str, *criteria) -> StreamingResponse:
+    statement = select(*(getattr(model, column) for column in columns)).where(*criteria).order_by(model.id)
+    return StreamingResponse(
+        bulk.export_rows(db, statement, columns, format),
+        media_type=bulk.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{format}"'},
+    )
+
+
+@router.get("/users/export")
+def export_users(format: Literal["ndjson", "csv"] = "ndjson", db: Session = Depends(get_read_db)):
+    """Every user (without password hashes), streamed as NDJSON or CSV."""
+    return export_response(db, models.User, USER_COLUMNS, format, "users")
+
+
+@router.get("/videos/export")
+def export_videos(format: Literal["ndjson", "csv"] = "ndjson", db: Session = Depends(get_read_db)):
+    """Every video that is not deleted, streamed as NDJSON or CSV."""
+    return export_response(db, models.Video, VIDEO_COLUMNS, format, "videos", models.Video.deleted_at.is_(None))
+
+
+@router.post("/users/import", response_model=schemas.ImportResponse)
+async def import_users(request: Request, format: Literal["ndjson", "csv"] = "ndjson", db: Session = Depends(get_db)):
+    """Create users from NDJSON or CSV records with `email` and `password`; existing emails are skipped."""
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_SIZE)
+    try:
+        async for data in request.stream():
+            spool.write(data)
+        spool.seek(0)
+        return await run_in_threadpool(bulk.import_users, db, spool, format)
+    finally:
+        spool.close()
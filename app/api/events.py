@@ -0,0 +1,60 @@
+import asyncio
+from typing import AsyncIterator, List, Optional
+
+from fastapi import APIRouter, Header, HTTPException, status
+from fastapi.responses import StreamingResponse
+
+from app.api.websockets import FEED, EventStream, parse_channels, websocketsManager
+from app.config import settings
+
+router = APIRouter()
+
+
+def format_event(message: str, event_id: Optional[int] = None) -> str:
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines += [f"data: {line}" for line in message.splitlines() or [""]]
+    return "\n".join(lines) + "\n\n"
+
+
+async def stream_events(stream: EventStream, channels: List[str], after: Optional[int]) -> AsyncIterator[str]:
+    """Events missed since `after`, then live events, with a comment line whenever the stream goes idle."""
+    # No await between the snapshot and attaching, so an event is either replayed or queued, never both.
+    backlog = websocketsManager.replay(channels, after) if after is not None else []
+    websocketsManager.attach(stream, channels)
+    try:
+        yield f"retry: {settings.WS_RECONNECT_MAX_DELAY_MS}\n\n"
+        for event_id, message in backlog:
+            yield format_event(message, event_id)
+        while not (stream.closed and stream.queue.empty()):
+            try:
+                event = await asyncio.wait_for(stream.queue.get(), settings.SSE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                # Keeps proxies from timing out the idle connection.
+                yield ": ping\n\n"
+                continue
+            if event is None:
+                break
+            event_id, message = event
+            yield format_event(message, event_id)
+    finally:
+        websocketsManager.disconnect(stream)
+
+
+@router.get("")
+async def event_stream(channels: str = FEED, last_event_id: Optional[str] = Header(None)):
+    """The websocket notifications as server-sent events, for clients that cannot keep a websocket open.
+
+    Browsers send `Last-Event-ID` when they reconnect; events this worker published since then are replayed.
+    """
+    if websocketsManager.draining:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Server is restarting",
+            headers={"retry-after": "1"},
+        )
+    after = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+    return StreamingResponse(
+        stream_events(EventStream(), parse_channels(channels), after),
+        media_type="text/event-stream",
+        # Proxies must pass each event through as it is written.
+        headers={"cache-control": "no-cache", "x-accel-buffering": "no"},
+    )
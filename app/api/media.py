@@ -0,0 +1,52 @@
+import hashlib
+import os
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import Response
+
+from app.utils.media import MediaCache, MediaResponse, content_type, get_media_cache, parse_range
+from app.utils.s3 import IMMUTABLE_CACHE_CONTROL
+from app.utils.storage import ObjectNotFound, StorageError
+
+router = APIRouter()
+
+
+@router.api_route("/{key:path}", methods=["GET", "HEAD"])
+async def get_media(key: str, request: Request, cache: MediaCache = Depends(get_media_cache)):
+    """Serve a stored object from the local disk cache, honouring `Range` so players can seek."""
+    if not key or ".." in key.split("/"):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"No media with this key: {key} found")
+    try:
+        file = await cache.open(key)
+    except ObjectNotFound:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"No media with this key: {key} found")
+    except StorageError as e:
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=f"Media fetch failed: {str(e)}")
+
+    size = os.fstat(file.fileno()).st_size
+    # Keys are content-addressed or unique per upload, so an object never changes under its key.
+    etag = f'"{hashlib.sha256(f"{key}:{size}".encode()).hexdigest()[:32]}"'
+    headers = {"accept-ranges": "bytes", "etag": etag, "cache-control": IMMUTABLE_CACHE_CONTROL}
+    if request.headers.get("if-none-match") == etag:
+        file.close()
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    range_header = request.headers.get("range")
+    if request.headers.get("if-range", etag) != etag:
+        range_header = None
+    try:
+        byte_range = parse_range(range_header, size)
+    except ValueError:
+        file.close()
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE, detail="Range not satisfiable",
+            headers={"content-range": f"bytes */{size}"},
+        )
+    if byte_range is None:
+        return MediaResponse(file, 0, size, headers=headers, media_type=content_type(key))
+    start, end = byte_range
+    headers["content-range"] = f"bytes {start}-{end}/{size}"
+    return MediaResponse(
+        file, start, end - start + 1, status_code=status.HTTP_206_PARTIAL_CONTENT, headers=headers,
+        media_type=content_type(key),
+    )
@@ -0,0 +1,274 @@
+import json
+import os
+import tempfile
+import uuid
+from datetime import datetime, timedelta
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, status
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from app import models, schemas
+from app.auth import get_current_user
+from app.config import settings
+from app.database import get_db
+from app.utils import s3, thumbnails
+from app.utils.ids import uuid7
+from app.utils.ratelimit import upload_slot, user_rate_limit
+from app.utils.sniffing import VIDEO_EXTENSIONS, check_video
+
+# Chunks are spooled in memory up to this size, then on disk.
+SPOOL_MEMORY_SIZE = 1024 * 1024
+
+router = APIRouter()
+
+
+def upload_headers(session: models.UploadSession):
+    return {
+        "Upload-Offset": str(session.upload_offset),
+        "Upload-Length": str(session.length),
+        "Cache-Control": "no-store",
+    }
+
+
+def upload_state(session: models.UploadSession):
+    return {
+        "id": str(session.id),
+        "offset": session.upload_offset,
+        "length": session.length,
+        "completed": session.completed,
+        "url": session.key if session.completed else None,
+    }
+
+
+def get_session(upload_id: uuid.UUID, db: Session, user: models.User) -> models.UploadSession:
+    session = db.get(models.UploadSession, upload_id)
+    if not session or session.user_id != user.id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"No upload with this id: {upload_id} found")
+    return session
+
+
+def expire_stale_sessions(db: Session, now: datetime = None, limit: int = 100) -> int:
+    """Drop sessions idle for longer than the TTL, aborting their S3 multipart upload if unfinished."""
+    cutoff = (now or datetime.utcnow()) - timedelta(hours=settings.RESUMABLE_SESSION_TTL_HOURS)
+    stale = (
+        db.query(models.UploadSession)
+        .filter(models.UploadSession.updated_at < cutoff)
+        .limit(limit).all()
+    )
+    delete_sessions(db, stale)
+    db.commit()
+    return len(stale)
+
+
+def delete_sessions(db: Session, sessions):
+    """Delete upload sessions, aborting their S3 multipart upload if unfinished. The caller commits."""
+    for session in sessions:
+        if not session.completed:
+            s3.abort_multipart_upload(session.key, session.s3_upload_id)
+        db.delete(session)
+
+
+async def spool_body(request: Request, remaining: int, sniff: bool = False):
+    """Stream the request body to a temporary file, refusing to buffer more than one chunk.
+
+    With `sniff`, the chunk is the start of the file and its first bytes must look like a video.
+    """
+    limit = min(remaining, settings.RESUMABLE_MAX_CHUNK_SIZE)
+    too_large = HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Chunk exceeds the {limit} bytes allowed at this offset",
+    )
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > limit:
+        raise too_large
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_SIZE)
+    size, head = 0, b""
+    try:
+        async for data in request.stream():
+            size += len(data)
+            if size > limit:
+                raise too_large
+            if sniff and len(head) < settings.UPLOAD_SNIFF_BYTES:
+                head += data[:settings.UPLOAD_SNIFF_BYTES - len(head)]
+                if len(head) == settings.UPLOAD_SNIFF_BYTES:
+                    check_video(head)
+            spool.write(data)
+        if sniff and len(head) < settings.UPLOAD_SNIFF_BYTES:
+            check_video(head)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool, size
+
+
+def claim_part(db: Session, session: models.UploadSession, upload_offset: int) -> datetime:
+    """Reserve the next part for this request, or raise 409 while another PATCH is sending it.
+
+    The returned claim identifies the request: only its holder may record the part. Claims older
+    than RESUMABLE_PART_CLAIM_SECONDS belong to requests that died and are taken over.
+    """
+    now = datetime.utcnow()
+    claimed = (
+        db.query(models.UploadSession)
+        .filter(
+            models.UploadSession.id == session.id,
+            models.UploadSession.upload_offset == upload_offset,
+            or_(
+                models.UploadSession.claimed_at.is_(None),
+                models.UploadSession.claimed_at < now - timedelta(seconds=settings.RESUMABLE_PART_CLAIM_SECONDS),
+            ),
+        )
+        .update({"claimed_at": now}, synchronize_session=False)
+    )
+    db.commit()
+    if not claimed:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT, detail="Another request is uploading a chunk at this offset",
+        )
+    return now
+
+
+def release_part(db: Session, session: models.UploadSession, claim: datetime):
+    db.query(models.UploadSession).filter(
+        models.UploadSession.id == session.id, models.UploadSession.claimed_at == claim
+    ).update({"claimed_at": None}, synchronize_session=False)
+    db.commit()
+
+
+async def complete_upload(session: models.UploadSession, db: Session):
+    await s3.complete_multipart_upload(session.key, session.s3_upload_id, json.loads(session.parts))
+    session.completed = True
+    db.commit()
+    thumbnails.schedule_thumbnails(session.key)
+
+
+@router.post(
+    "", status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(user_rate_limit("upload", "RATE_LIMIT_UPLOAD"))],
+)
+def create_upload(
+        payload: schemas.ResumableUploadCreate,
+        response: Response,
+        db: Session = Depends(get_db),
+        current_user: models.User = Depends(get_current_user)
+):
+    _, extension = os.path.splitext(payload.filename.lower())
+    if extension not in VIDEO_EXTENSIONS:
+        raise HTTPException(status_code=400, detail="Invalid video file format")
+    if payload.length > settings.RESUMABLE_MAX_SIZE:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Upload is too large")
+
+    # Opportunistic cleanup keeps abandoned multipart uploads from accumulating in S3.
+    expire_stale_sessions(db)
+
+    upload_id = uuid7()
+    key = f"videos/{upload_id.hex}{extension}"
+    session = models.UploadSession(
+        id=upload_id,
+        user_id=current_user.id,
+        filename=payload.filename,
+        key=key,
+        s3_upload_id=s3.create_multipart_upload(key),
+        length=payload.length,
+    )
+    db.add(session)
+    db.commit()
+    db.refresh(session)
+
+    response.headers.update(upload_headers(session))
+    response.headers["Location"] = f"/api/uploads/resumable/{upload_id}"
+    return {
+        **upload_state(session),
+        "min_chunk_size": settings.RESUMABLE_MIN_CHUNK_SIZE,
+        "max_chunk_size": settings.RESUMABLE_MAX_CHUNK_SIZE,
+    }
+
+
+@router.head("/{upload_id}")
+def get_upload_offset(
+        upload_id: uuid.UUID,
+        db: Session = Depends(get_db),
+        current_user: models.User = Depends(get_current_user)
+):
+    session = get_session(upload_id, db, current_user)
+    return Response(status_code=status.HTTP_200_OK, headers=upload_headers(session))
+
+
+@router.patch("/{upload_id}", dependencies=[Depends(upload_slot)])
+async def upload_chunk(
+        upload_id: uuid.UUID,
+        request: Request,
+        response: Response,
+        upload_offset: int = Header(..., alias="Upload-Offset"),
+        db: Session = Depends(get_db),
+        current_user: models.User = Depends(get_current_user)
+):
+    session = get_session(upload_id, db, current_user)
+    if session.completed:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Upload is already complete")
+    if upload_offset != session.upload_offset:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Upload-Offset {upload_offset} does not match the current offset {session.upload_offset}",
+            headers=upload_headers(session),
+        )
+    if session.upload_offset == session.length:
+        # Every part is stored but completing the multipart upload failed; a retry only completes it.
+        await complete_upload(session, db)
+        response.headers.update(upload_headers(session))
+        return upload_state(session)
+
+    spool, size = await spool_body(request, session.length - session.upload_offset, sniff=upload_offset == 0)
+    try:
+        new_offset = session.upload_offset + size
+        if size == 0 or (size < settings.RESUMABLE_MIN_CHUNK_SIZE and new_offset < session.length):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Chunks other than the last must be at least {settings.RESUMABLE_MIN_CHUNK_SIZE} bytes",
+            )
+        parts = json.loads(session.parts)
+        part_number = len(parts) + 1
+        claim = claim_part(db, session, upload_offset)
+        try:
+            etag = await s3.upload_part(session.key, session.s3_upload_id, part_number, spool, size)
+        except BaseException:
+            release_part(db, session, claim)
+            raise
+    finally:
+        spool.close()
+
+    parts.append({"PartNumber": part_number, "ETag": etag})
+    # Still holding the claim means no other PATCH wrote this part since.
+    updated = (
+        db.query(models.UploadSession)
+        .filter(models.UploadSession.id == session.id, models.UploadSession.claimed_at == claim)
+        .update({
+            "upload_offset": new_offset,
+            "parts": json.dumps(parts),
+            "claimed_at": None,
+            "updated_at": datetime.utcnow(),
+        }, synchronize_session=False)
+    )
+    db.commit()
+    if not updated:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Upload offset changed concurrently")
+    db.refresh(session)
+
+    if session.upload_offset == session.length:
+        await complete_upload(session, db)
+
+    response.headers.update(upload_headers(session))
+    return upload_state(session)
+
+
+@router.delete("/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_upload(
+        upload_id: uuid.UUID,
+        db: Session = Depends(get_db),
+        current_user: models.User = Depends(get_current_user)
+):
+    session = get_session(upload_id, db, current_user)
+    delete_sessions(db, [session])
+    db.commit()
@@ -1,24 +1,42 @@
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
+from fastapi import APIRouter, Depends, Request
+from sqlalchemy.orm import Session
+
 from app.auth import get_current_user
+from app.database import get_db
 from app.models import User
+from app.utils.ratelimit import upload_slot, user_rate_limit
 from app.utils.s3 import upload_file_to_s3
+from app.utils.sniffing import IMAGE_UPLOAD, VIDEO_UPLOAD, receive_upload
+from app.utils import thumbnails
 
 router = APIRouter()
 
+UPLOAD_LIMITS = [Depends(user_rate_limit("upload", "RATE_LIMIT_UPLOAD")), Depends(upload_slot)]
+# The body is parsed by the handler, so it can be validated while it streams in; documented here instead.
+UPLOAD_FORM = {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+    "type": "object", "required": ["file"], "properties": {"file": {"type": "string", "format": "binary"}},
+}}}}}
 
-@router.post("/video")
-async def upload_video(file: UploadFile = File(...), _: User = Depends(get_current_user)):
-    if not file.filename.lower().endswith(('.mp4', '.avi', '.mov', '.wmv')):
-        raise HTTPException(status_code=400, detail="Invalid video file format")
-
-    s3_url = upload_file_to_s3(file, "videos")
-    return {"message": "Video uploaded successfully", "url": s3_url}
 
+@router.post("/video", dependencies=UPLOAD_LIMITS, openapi_extra=UPLOAD_FORM)
+async def upload_video(request: Request, db: Session = Depends(get_db), _: User = Depends(get_current_user)):
+    file, sha256 = await receive_upload(request, VIDEO_UPLOAD)
+    try:
+        s3_url = await upload_file_to_s3(file, "videos", db, sha256)
+    finally:
+        await file.close()
+    # Posters are extracted from the stored video in the background; clients may use one as image_url.
+    variants = thumbnails.schedule_thumbnails(s3_url)
+    return {"message": "Video uploaded successfully", "url": s3_url, "thumbnails": variants}
 
-@router.post("/image")
-async def upload_image(file: UploadFile = File(...), _: User = Depends(get_current_user)):
-    if not file.filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif')):
-        raise HTTPException(status_code=400, detail="Invalid image file format")
 
-    s3_url = upload_file_to_s3(file, "images")
-    return {"message": "Image uploaded successfully", "url": s3_url}
+@router.post("/image", dependencies=UPLOAD_LIMITS, openapi_extra=UPLOAD_FORM)
+async def upload_image(request: Request, db: Session = Depends(get_db), _: User = Depends(get_current_user)):
+    file, sha256 = await receive_upload(request, IMAGE_UPLOAD)
+    try:
+        s3_url = await upload_file_to_s3(file, "images", db, sha256)
+    finally:
+        await file.close()
+    # Only the key is queued; the job reads the image back from storage.
+    variants = thumbnails.schedule_thumbnails(s3_url)
+    return {"message": "Image uploaded successfully", "url": s3_url, "thumbnails": variants}
@@ -1,53 +1,76 @@
-from datetime import timedelta, datetime
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
 
-from dotenv import load_dotenv
-from fastapi import Depends, HTTPException, status, APIRouter
+from fastapi import Depends, HTTPException, Query, status, APIRouter
+from sqlalchemy import and_, case, desc, func, or_, select
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 
 import app.models as models
 import app.schemas as schemas
-from app.auth import verify_password, ACCESS_TOKEN_EXPIRE_MINUTES, create_access_token, \
-    get_current_user, hash_password
-from app.database import get_db
-
-load_dotenv()
+from app.auth import REVOKE_ALL, create_token_pair, get_current_user, hash_password, revoke_refresh_token, \
+    revoke_user_tokens, rotate_refresh_token, verify_password
+from app.api.resumable_uploads import delete_sessions
+from app.api.videos import video_list
+from app.config import settings
+from app.database import get_db, get_read_db
+from app.utils.pagination import decode_cursor, encode_cursor
+from app.utils.ratelimit import bcrypt_limiter, check_rate, rate_limit
+from app.utils.reaper import schedule_reaper
+from app.utils.trending import refresher
 
 router = APIRouter()
 
 
-@router.post("/login", response_model=schemas.Token)
+@router.post(
+    "/login", response_model=schemas.Token, dependencies=[Depends(rate_limit("login", "RATE_LIMIT_LOGIN"))]
+)
 def login_for_access_token(form_data: schemas.UserLoginSchema, db: Session = Depends(get_db)):
+    # Per account as well as per IP, so a botnet cannot guess one password from many addresses.
+    check_rate("login", settings.RATE_LIMIT_LOGIN_ACCOUNT, f"account:{form_data.email.lower()}")
     user = db.query(models.User).filter(models.User.email == form_data.email).first()
 
-    if user and not verify_password(form_data.password, user.password):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Incorrect email or password",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+    with bcrypt_limiter.slot():
+        if user and not verify_password(form_data.password, user.password):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Incorrect email or password",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        hashed_password = None if user else hash_password(form_data.password)
 
     if not user:
-        hashed_password = hash_password(form_data.password)
         user_data = form_data.model_dump(exclude={'password'})
         user_data['password'] = hashed_password
 
-        new_user = models.User(**user_data)
-        db.add(new_user)
+        user = models.User(**user_data)
+        db.add(user)
         db.commit()
 
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": form_data.email}, expires_delta=access_token_expires
-    )
-    return {"access_token": access_token, "email": form_data.email, "token_type": "bearer"}
+    return create_token_pair(db, user)
+
+
+@router.post("/token/refresh", response_model=schemas.Token)
+def refresh_access_token(payload: schemas.RefreshTokenSchema, db: Session = Depends(get_db)):
+    """Trade a refresh token for a new access/refresh pair without paying bcrypt again."""
+    return rotate_refresh_token(db, payload.refresh_token)
+
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+def logout(payload: schemas.RefreshTokenSchema, db: Session = Depends(get_db)):
+    revoke_refresh_token(db, payload.refresh_token)
 
 
 # Update the create_user function to use get_password_hash
-@router.post("/", status_code=status.HTTP_201_CREATED, response_model=schemas.UserResponse)
+@router.post(
+    "/", status_code=status.HTTP_201_CREATED, response_model=schemas.UserResponse,
+    dependencies=[Depends(rate_limit("signup", "RATE_LIMIT_SIGNUP"))],
+)
 def create_user(payload: schemas.UserCreateSchema, db: Session = Depends(get_db)):
-    try:
+    with bcrypt_limiter.slot():
         hashed_password = hash_password(payload.password)
+    try:
         user_data = payload.model_dump(exclude={'password'})
         user_data['password'] = hashed_password
 
@@ -74,7 +97,7 @@ def create_user(payload: schemas.UserCreateSchema, db: Session = Depends(get_db)
 @router.get(
     "/{userId}", status_code=status.HTTP_200_OK, response_model=schemas.GetUserResponse
 )
-def get_user(userId: str, db: Session = Depends(get_db), _: models.User = Depends(get_current_user)):
+def get_user(userId: str, db: Session = Depends(get_read_db), _: models.User = Depends(get_current_user)):
     user_query = db.query(models.User).filter(models.User.id == userId)
     db_user = user_query.first()
 
@@ -94,6 +117,47 @@ def get_user(userId: str, db: Session = Depends(get_db), _: models.User = Depend
         ) from e
 
 
+@router.get("/{userId}/videos", response_model=schemas.UserVideoResponse)
+def get_user_videos(
+        userId: UUID,
+        db: Session = Depends(get_read_db),
+        limit: int = Query(10, ge=1, le=100),
+        cursor: Optional[str] = None,
+        image_width: Optional[int] = None,
+):
+    """Videos shared by one user, newest first. Pass `NextCursor` back as `cursor` for the next page."""
+    db_user = db.query(models.User).filter(models.User.id == userId).first()
+    if not db_user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No User with this id: `{userId}` found",
+        )
+
+    # Walks ix_videos_shared_by_shared_at; the cursor seeks instead of counting skipped rows.
+    query = (
+        db.query(models.Video)
+        .options(joinedload(models.Video.user))
+        .filter(models.Video.shared_by == userId, models.Video.deleted_at.is_(None))
+        .order_by(desc(models.Video.shared_at), desc(models.Video.id))
+    )
+    if cursor:
+        shared_at, video_id = decode_cursor(cursor, datetime, UUID)
+        query = query.filter(or_(
+            models.Video.shared_at < shared_at,
+            and_(models.Video.shared_at == shared_at, models.Video.id < video_id),
+        ))
+    videos = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(videos) > limit:
+        next_cursor = encode_cursor(videos[limit - 1].shared_at, videos[limit - 1].id)
+    return schemas.UserVideoResponse(
+        Status=schemas.Status.Success,
+        Videos=video_list(db, videos[:limit], image_width),
+        VideoCount=db_user.video_count,
+        NextCursor=next_cursor,
+    )
+
+
 @router.patch(
     "/{userId}",
     status_code=status.HTTP_202_ACCEPTED,
@@ -112,17 +176,23 @@ def update_user(
         )
 
     update_data = payload.model_dump(exclude_unset=True)
+    credentials_changed = 'password' in update_data or 'email' in update_data
 
     # If password is being updated, hash it
     if 'password' in update_data:
-        update_data['password'] = hash_password(update_data['password'])
+        with bcrypt_limiter.slot():
+            update_data['password'] = hash_password(update_data['password'])
 
     for key, value in update_data.items():
         setattr(db_user, key, value)
 
     db_user.updatedAt = datetime.utcnow()
+    if credentials_changed:
+        db_user.token_version = (db_user.token_version or 0) + 1
     try:
         db.commit()
+        if credentials_changed:
+            revoke_user_tokens(db, db_user.id, db_user.token_version)
         db.refresh(db_user)
 
         user_response = schemas.UserResponseSchema.model_validate(db_user)
@@ -154,8 +224,41 @@ def delete_user(userId: str, db: Session = Depends(get_db), _: models.User = Dep
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"No User with this id: `{userId}` found",
             )
+        user_id = user.id
+        own_videos = select(models.Video.id).where(models.Video.shared_by == user_id)
+        voted = [
+            video_id for video_id, in db.query(models.Vote.video_id)
+            .filter(models.Vote.user_id == user_id, models.Vote.video_id.not_in(own_videos))
+        ]
+        # Take the user's votes out of other videos' totals, in one statement for all of them.
+        own_vote = (
+            select(models.Vote.value)
+            .where(models.Vote.user_id == user_id, models.Vote.video_id == models.Video.id)
+            .scalar_subquery()
+        )
+        voted_query = select(models.Vote.video_id).where(models.Vote.user_id == user_id)
+        db.query(models.Video).filter(models.Video.id.in_(voted_query)).update({
+            models.Video.likes: models.Video.likes - case((own_vote == 1, 1), else_=0),
+            models.Video.dislikes: models.Video.dislikes - case((own_vote == -1, 1), else_=0),
+        }, synchronize_session=False)
+        db.query(models.Vote).filter(
+            or_(models.Vote.user_id == user_id, models.Vote.video_id.in_(own_videos))
+        ).delete(synchronize_session=False)
+        # Soft delete, so the reaper purges the videos' storage objects with the rows; videos the user
+        # deleted earlier keep their place in its queue.
+        db.query(models.Video).filter(models.Video.shared_by == user_id).update({
+            models.Video.deleted_at: func.coalesce(models.Video.deleted_at, datetime.utcnow()),
+            models.Video.shared_by: None,
+        }, synchronize_session=False)
+        db.query(models.RefreshToken).filter(models.RefreshToken.user_id == user_id).delete()
+        # Upload sessions reference the user; unfinished ones would leave multipart uploads behind in S3.
+        delete_sessions(db, db.query(models.UploadSession).filter(models.UploadSession.user_id == user_id).all())
         user_query.delete(synchronize_session=False)
         db.commit()
+        revoke_user_tokens(db, user_id, REVOKE_ALL)
+        schedule_reaper()
+        for video_id in voted:
+            refresher.mark_dirty(video_id)
         return schemas.DeleteUserResponse(
             Status=schemas.Status.Success, Message="User deleted successfully"
         )
@@ -171,7 +274,7 @@ def delete_user(userId: str, db: Session = Depends(get_db), _: models.User = Dep
     "/", status_code=status.HTTP_200_OK, response_model=schemas.ListUserResponse
 )
 def get_users(
-        db: Session = Depends(get_db),
+        db: Session = Depends(get_read_db),
         _: models.User = Depends(get_current_user),
         limit: int = 10, page: int = 1, search: str = ""
 ):
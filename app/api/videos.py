@@ -1,29 +1,52 @@
 import json
+from datetime import datetime
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import desc
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, status
+from sqlalchemy import and_, desc, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload
 from uuid import UUID
 
-from app.api.websockets import websocketsManager
-from app.database import get_db
+from app.api.websockets import FEED, tag_channels, user_channel, video_channel, websocketsManager
+from app.database import get_db, get_read_db
 from app import models, schemas
 from app.auth import get_current_user
+from app.config import settings
+from app.utils.pagination import decode_cursor, encode_cursor
+from app.utils.ratelimit import user_rate_limit
+from app.utils.reaper import schedule_reaper
+from app.utils.thumbnails import resolve_images
+from app.utils.transcoding import prepare_transcode, schedule_transcode
+from app.utils.trending import refresher, trending_score
 
 router = APIRouter()
 
 
-@router.post("", status_code=status.HTTP_201_CREATED, response_model=schemas.VideoResponse)
+@router.post(
+    "", status_code=status.HTTP_201_CREATED, response_model=schemas.VideoResponse,
+    dependencies=[Depends(user_rate_limit("create_video", "RATE_LIMIT_CREATE_VIDEO"))],
+)
 async def create_video(
         payload: schemas.VideoCreate,
+        background_tasks: BackgroundTasks,
         db: Session = Depends(get_db),
         current_user: models.User = Depends(get_current_user)
 ):
-    new_video = models.Video(**payload.dict(), shared_by=current_user.id)
+    now = datetime.utcnow()
+    new_video = models.Video(
+        **payload.dict(), shared_by=current_user.id, shared_at=now, trending_score=trending_score(0, 0, now)
+    )
+    transcode = prepare_transcode(db, new_video)
     db.add(new_video)
+    db.query(models.User).filter(models.User.id == current_user.id).update(
+        {models.User.video_count: models.User.video_count + 1}, synchronize_session=False
+    )
     db.commit()
     db.refresh(new_video)
-    # Broadcast notification to all connected clients
+    if transcode:
+        schedule_transcode(new_video.video_url)
+    # Notify the global feed and the followers of the uploader and of each tag, after the response is sent
     notification = {
         "type": "newVideo",
         "data": {
@@ -33,29 +56,16 @@ async def create_video(
             "id": str(new_video.id),
         }
     }
-    try:
-        await websocketsManager.broadcast(json.dumps(notification))
-    except Exception as e:
-        print(f"Failed to broadcast message: {e}")
+    background_tasks.add_task(
+        websocketsManager.publish,
+        [FEED, user_channel(current_user.id), *tag_channels(new_video.tags)], json.dumps(notification),
+    )
     return schemas.VideoResponse(Status=schemas.Status.Success, Video=schemas.VideoSchema.from_orm(new_video))
 
 
-@router.get("/{video_id}", response_model=schemas.VideoResponse)
-def get_video(video_id: UUID, db: Session = Depends(get_db)):
-    video = db.query(models.Video).filter(models.Video.id == video_id).first()
-    if not video:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"No video with this id: {video_id} found")
-    return schemas.VideoResponse(Status=schemas.Status.Success, Video=schemas.VideoSchema.from_orm(video))
-
-
-@router.get("", response_model=schemas.ListVideoResponse)
-def list_videos(db: Session = Depends(get_db), skip: int = 0, limit: int = 10):
-    videos = (
-        db.query(models.Video)
-        .join(models.User, models.Video.shared_by == models.User.id)
-        .order_by(desc(models.Video.shared_at))
-        .offset(skip).limit(limit).all()
-    )
+def video_list(db: Session, videos: List[models.Video], image_width: Optional[int]) -> List[schemas.VideoListSchema]:
+    # Serve the smallest generated thumbnail that fits instead of the original upload.
+    images = resolve_images(db, (video.image_url for video in videos), image_width or settings.FEED_IMAGE_WIDTH)
     video_response = []
     for video in videos:
         video_response.append(schemas.VideoListSchema.from_orm({
@@ -63,13 +73,82 @@ def list_videos(db: Session = Depends(get_db), skip: int = 0, limit: int = 10):
             "title": video.title,
             "shared_by": video.user.email,
             "video_url": video.video_url,
-            "image_url": video.image_url,
+            "image_url": images.get(video.image_url, video.image_url),
             "tags": video.tags,
             "likes": video.likes,
             "dislikes": video.dislikes,
             "shared_at": video.shared_at,
+            "processing_status": video.processing_status,
+            "manifest_key": video.manifest_key,
         }))
-    return schemas.ListVideoResponse(Status=schemas.Status.Success, Videos=video_response)
+    return video_response
+
+
+def tag_filter(tag: str):
+    """Videos whose comma-separated `tags` include `tag` exactly. Served by ix_videos_tags on Postgres."""
+    tag = tag.strip()
+    pattern = tag.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    tags = models.Video.tags
+    return or_(
+        tags == tag,
+        tags.like(f"{pattern},%", escape="\\"),
+        tags.like(f"%,{pattern}", escape="\\"),
+        tags.like(f"%,{pattern},%", escape="\\"),
+    )
+
+
+@router.get("", response_model=schemas.ListVideoResponse)
+def list_videos(
+        db: Session = Depends(get_read_db), skip: int = 0, limit: int = 10, image_width: Optional[int] = None,
+        tag: Optional[str] = None,
+):
+    query = (
+        db.query(models.Video)
+        .join(models.User, models.Video.shared_by == models.User.id)
+        .filter(models.Video.deleted_at.is_(None))
+        .order_by(desc(models.Video.shared_at))
+    )
+    if tag:
+        query = query.filter(tag_filter(tag))
+    videos = query.offset(skip).limit(limit).all()
+    return schemas.ListVideoResponse(Status=schemas.Status.Success, Videos=video_list(db, videos, image_width))
+
+
+@router.get("/trending", response_model=schemas.TrendingVideoResponse)
+def list_trending_videos(
+        db: Session = Depends(get_read_db),
+        limit: int = Query(10, ge=1, le=100),
+        cursor: Optional[str] = None,
+        image_width: Optional[int] = None,
+):
+    """Videos by precomputed trending score, paginated by keyset: pass `NextCursor` back as `cursor`."""
+    query = (
+        db.query(models.Video)
+        .options(joinedload(models.Video.user))
+        .filter(models.Video.deleted_at.is_(None))
+        .order_by(desc(models.Video.trending_score), desc(models.Video.id))
+    )
+    if cursor:
+        score, video_id = decode_cursor(cursor, float, UUID)
+        query = query.filter(or_(
+            models.Video.trending_score < score,
+            and_(models.Video.trending_score == score, models.Video.id < video_id),
+        ))
+    videos = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(videos) > limit:
+        next_cursor = encode_cursor(videos[limit - 1].trending_score, videos[limit - 1].id)
+    return schemas.TrendingVideoResponse(
+        Status=schemas.Status.Success, Videos=video_list(db, videos[:limit], image_width), NextCursor=next_cursor
+    )
+
+
+@router.get("/{video_id}", response_model=schemas.VideoResponse)
+def get_video(video_id: UUID, db: Session = Depends(get_read_db)):
+    video = db.query(models.Video).filter(models.Video.id == video_id, models.Video.deleted_at.is_(None)).first()
+    if not video:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"No video with this id: {video_id} found")
+    return schemas.VideoResponse(Status=schemas.Status.Success, Video=schemas.VideoSchema.from_orm(video))
 
 
 @router.patch("/{video_id}", response_model=schemas.VideoResponse)
@@ -79,7 +158,7 @@ def update_video(
         db: Session = Depends(get_db),
         current_user: models.User = Depends(get_current_user)
 ):
-    video_query = db.query(models.Video).filter(models.Video.id == video_id)
+    video_query = db.query(models.Video).filter(models.Video.id == video_id, models.Video.deleted_at.is_(None))
     video = video_query.first()
     if not video:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"No video with this id: {video_id} found")
@@ -87,21 +166,78 @@ def update_video(
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to update this video")
 
     update_data = payload.dict(exclude_unset=True)
+    if "video_url" in update_data:
+        # The renditions belong to the old source.
+        update_data.update(processing_status=None, manifest_key=None)
     video_query.update(update_data, synchronize_session=False)
     db.commit()
     db.refresh(video)
+    if "video_url" in update_data:
+        transcode = prepare_transcode(db, video)
+        db.commit()
+        db.refresh(video)
+        if transcode:
+            schedule_transcode(video.video_url)
     return schemas.VideoResponse(Status=schemas.Status.Success, Video=schemas.VideoSchema.from_orm(video))
 
 
 @router.delete("/{video_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_video(video_id: UUID, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    video_query = db.query(models.Video).filter(models.Video.id == video_id)
+    video_query = db.query(models.Video).filter(models.Video.id == video_id, models.Video.deleted_at.is_(None))
     video = video_query.first()
     if not video:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"No video with this id: {video_id} found")
     if video.shared_by != current_user.id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to delete this video")
 
-    video_query.delete(synchronize_session=False)
+    # Soft delete: the row, its votes and its storage objects are purged later by the reaper.
+    if not video_query.update({models.Video.deleted_at: datetime.utcnow()}, synchronize_session=False):
+        # A concurrent request deleted it first.
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"No video with this id: {video_id} found")
+    db.query(models.User).filter(models.User.id == current_user.id).update(
+        {models.User.video_count: models.User.video_count - 1}, synchronize_session=False
+    )
     db.commit()
+    schedule_reaper()
     return {"status": "success"}
+
+
+@router.post("/{video_id}/vote", response_model=schemas.VideoResponse)
+def vote_video(
+        video_id: UUID,
+        payload: schemas.VoteCreate,
+        background_tasks: BackgroundTasks,
+        db: Session = Depends(get_db),
+        current_user: models.User = Depends(get_current_user)
+):
+    video = db.query(models.Video).filter(models.Video.id == video_id, models.Video.deleted_at.is_(None)).first()
+    if not video:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"No video with this id: {video_id} found")
+
+    vote = db.get(models.Vote, (current_user.id, video_id))
+    previous = vote.value if vote else 0
+    if payload.value != previous:
+        if vote is None:
+            db.add(models.Vote(user_id=current_user.id, video_id=video_id, value=payload.value))
+        elif payload.value == 0:
+            db.delete(vote)
+        else:
+            vote.value = payload.value
+        # Relative updates, so concurrent votes by different users do not overwrite each other.
+        db.query(models.Video).filter(models.Video.id == video_id).update({
+            models.Video.likes: models.Video.likes + (payload.value == 1) - (previous == 1),
+            models.Video.dislikes: models.Video.dislikes + (payload.value == -1) - (previous == -1),
+        }, synchronize_session=False)
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Concurrent vote, please retry")
+        db.refresh(video)
+        refresher.mark_dirty(video.id)
+        notification = {
+            "type": "voteVideo",
+            "data": {"id": str(video.id), "likes": video.likes, "dislikes": video.dislikes},
+        }
+        background_tasks.add_task(websocketsManager.publish, [video_channel(video.id)], json.dumps(notification))
+    return schemas.VideoResponse(Status=schemas.Status.Success, Video=schemas.VideoSchema.from_orm(video))
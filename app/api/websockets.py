@@ -1,40 +1,233 @@
-from typing import List
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+from collections import deque
+from typing import Deque, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
 
 from fastapi import APIRouter
 from starlette.websockets import WebSocket, WebSocketDisconnect
 
+from app.config import settings
+from app.utils.metrics import observe_connections
+
+# "Service Restart": the server is going away, the client should reconnect.
+CLOSE_SERVICE_RESTART = 1012
+
+# Every new video; connections without a `channels` query parameter join it.
+FEED = "feed"
+CHANNEL_PATTERN = re.compile(r"^(feed|(user|video):[0-9a-fA-F-]{32,36}|tag:[^\s,]{1,64})$")
+
+
+def user_channel(user_id) -> str:
+    return f"user:{user_id}"
+
+
+def video_channel(video_id) -> str:
+    return f"video:{video_id}"
+
+
+def tag_channels(tags) -> List[str]:
+    return [f"tag:{tag.strip()}" for tag in (tags or "").split(",") if tag.strip()]
+
+
+class EventStream:
+    """A server-sent events client. It stands in for a websocket in the channel sets: messages are queued
+    here and written out by the streaming response.
+    """
+
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue(settings.SSE_QUEUE_SIZE)
+        self.closed = False
+
+    async def send_text(self, message: str, event_id: Optional[int] = None):
+        try:
+            self.queue.put_nowait((event_id, message))
+        except asyncio.QueueFull:
+            # The client reads slower than we publish; end the stream once the queue drains and let
+            # it resume from its Last-Event-ID.
+            self.closed = True
+            raise
+
+    async def close(self, code: Optional[int] = None):
+        self.closed = True
+        try:
+            self.queue.put_nowait(None)
+        except asyncio.QueueFull:
+            pass
+
 
 class ConnectionManager:
+    """Websocket and event stream connections and the channels they subscribe to.
+
+    Subscribers are kept in a set per channel, so a message only visits the connections that
+    asked for it, and a channel's presence count is the size of its set. Counts are per worker.
+    The last `SSE_REPLAY_EVENTS` messages are kept so event streams can resume after a reconnect.
+    """
+
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
+        self.active_connections: Set[WebSocket] = set()
+        self.channels: Dict[str, Set[WebSocket]] = {}
+        self.subscriptions: Dict[WebSocket, Set[str]] = {}
+        self.history: Deque[Tuple[int, FrozenSet[str], str]] = deque(maxlen=settings.SSE_REPLAY_EVENTS)
+        self.last_event_id = 0
+        self.draining = False
 
-    async def connect(self, websocket: WebSocket):
+    async def connect(self, websocket: WebSocket, channels: Iterable[str] = (FEED,)) -> bool:
+        if self.draining:
+            await websocket.close(code=CLOSE_SERVICE_RESTART)
+            return False
         await websocket.accept()
-        self.active_connections.append(websocket)
+        self.attach(websocket, channels)
         await websocket.send_text("Connection established")
+        return True
+
+    def attach(self, connection, channels: Iterable[str]):
+        self.active_connections.add(connection)
+        observe_connections(len(self.active_connections))
+        self.subscriptions[connection] = set()
+        for channel in channels:
+            self.subscribe(connection, channel)
+
+    def subscribe(self, websocket: WebSocket, channel: str):
+        if websocket in self.subscriptions:
+            self.channels.setdefault(channel, set()).add(websocket)
+            self.subscriptions[websocket].add(channel)
+
+    def unsubscribe(self, websocket: WebSocket, channel: str):
+        subscribers = self.channels.get(channel)
+        if subscribers is not None:
+            subscribers.discard(websocket)
+            if not subscribers:
+                del self.channels[channel]
+        self.subscriptions.get(websocket, set()).discard(channel)
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        for channel in list(self.subscriptions.get(websocket, ())):
+            self.unsubscribe(websocket, channel)
+        self.subscriptions.pop(websocket, None)
+        self.active_connections.discard(websocket)
+        observe_connections(len(self.active_connections))
+
+    def presence(self, channel: str) -> int:
+        return len(self.channels.get(channel, ()))
+
+    def replay(self, channels: Iterable[str], after: int) -> List[Tuple[int, str]]:
+        """Messages published to any of `channels` since event `after`, oldest first."""
+        channels = set(channels)
+        return [(event_id, message) for event_id, targets, message in self.history
+                if event_id > after and targets & channels]
+
+    async def publish(self, channels: Iterable[str], message: str):
+        """Send `message` once to every connection subscribed to any of `channels`."""
+        # Microseconds since the epoch, so ids stay increasing across restarts of the worker.
+        event_id = self.last_event_id = max(time.time_ns() // 1000, self.last_event_id + 1)
+        channels = frozenset(channels)
+        self.history.append((event_id, channels, message))
+        recipients = set()
+        for channel in channels:
+            recipients |= self.channels.get(channel, set())
+        if not recipients:
+            return
+        recipients = list(recipients)
+        results = await asyncio.gather(*(
+            connection.send_text(message, event_id) if isinstance(connection, EventStream)
+            else connection.send_text(message)
+            for connection in recipients
+        ), return_exceptions=True)
+        for connection, result in zip(recipients, results):
+            if isinstance(result, Exception):
+                # The client went away without a close frame.
+                self.disconnect(connection)
 
     async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            print("broadcast :", message)
-            await connection.send_text(message)
+        await self.publish([FEED], message)
+
+    async def drain(self):
+        """Refuse new connections and ask every connected client to reconnect elsewhere.
+
+        Each client gets a random delay so a restart does not turn into a reconnect stampede.
+        """
+        self.draining = True
+        connections = list(self.active_connections)
+        self.active_connections, self.channels, self.subscriptions = set(), {}, {}
+        observe_connections(0)
+        for connection in connections:
+            notice = {
+                "type": "reconnect",
+                "data": {"retry_after_ms": random.randint(0, settings.WS_RECONNECT_MAX_DELAY_MS)},
+            }
+            try:
+                await connection.send_text(json.dumps(notice))
+                await connection.close(code=CLOSE_SERVICE_RESTART)
+            except Exception:
+                # The client went away on its own.
+                pass
 
 
 websocketsManager = ConnectionManager()
 router = APIRouter()
 
 
+def canonical_channel(channel: str) -> Optional[str]:
+    """`channel` named as publishers name it, or None when it is not a valid channel.
+
+    Events go to ids in their hyphenated lowercase form, so other spellings of an id are rewritten to it.
+    """
+    if not CHANNEL_PATTERN.match(channel):
+        return None
+    kind, _, value = channel.partition(":")
+    if kind not in ("user", "video"):
+        return channel
+    try:
+        return f"{kind}:{uuid.UUID(value)}"
+    except ValueError:
+        return None
+
+
+def parse_channels(value: str) -> List[str]:
+    return [channel for channel in map(canonical_channel, value.split(",")) if channel is not None]
+
+
+async def handle_action(websocket: WebSocket, request: dict):
+    """`{"action": "subscribe" | "unsubscribe" | "presence", "channel": "video:<id>"}`."""
+    channel = request.get("channel")
+    canonical = canonical_channel(channel) if isinstance(channel, str) else None
+    if canonical is None:
+        await websocket.send_text(json.dumps({"type": "error", "data": {"detail": f"Invalid channel: {channel}"}}))
+        return
+    channel = canonical
+    if request["action"] == "subscribe":
+        websocketsManager.subscribe(websocket, channel)
+    elif request["action"] == "unsubscribe":
+        websocketsManager.unsubscribe(websocket, channel)
+    elif request["action"] != "presence":
+        await websocket.send_text(json.dumps({"type": "error", "data": {"detail": "Unknown action"}}))
+        return
+    await websocket.send_text(json.dumps({
+        "type": "presence", "data": {"channel": channel, "count": websocketsManager.presence(channel)},
+    }))
+
+
 @router.websocket("")
-async def websocket_endpoint(websocket: WebSocket):
+async def websocket_endpoint(websocket: WebSocket, channels: str = FEED):
     # TODO _: models.User = Depends(get_current_user)
-    await websocketsManager.connect(websocket)
+    if not await websocketsManager.connect(websocket, parse_channels(channels)):
+        return
     try:
         while True:
             data = await websocket.receive_text()
-            print("Received data:", data)
-            await websocketsManager.broadcast(data)
+            try:
+                request = json.loads(data)
+            except ValueError:
+                request = None
+            if isinstance(request, dict) and "action" in request:
+                await handle_action(websocket, request)
+            else:
+                await websocketsManager.broadcast(data)
     except WebSocketDisconnect:
         websocketsManager.disconnect(websocket)
-        await websocketsManager.broadcast(f"Client disconnected")
+        if not websocketsManager.draining:
+            await websocketsManager.broadcast(f"Client disconnected")
@@ -1,26 +1,30 @@
-import os
+import threading
+import time
+import uuid
 from datetime import timedelta, datetime
+from typing import Dict, Optional, Tuple
 
 import bcrypt
-from dotenv import load_dotenv
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from sqlalchemy import select, update
 from sqlalchemy.orm import Session
 
 import app.models as models
 import app.schemas as schemas
-from app.database import get_db
+from app.config import settings
+from app.database import get_db, get_read_db
+from app.utils.ids import uuid7
 
-load_dotenv()
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
 # JWT settings
-SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# Token version recorded for deleted users: no token can reach it.
+REVOKE_ALL = 2 ** 31 - 1
 
 
 def verify_password(plain_password, hashed_password):
@@ -44,25 +48,188 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+class RevocationList:
+    """Per-worker copy of `token_revocations`, so access tokens are checked without a query.
+
+    Reloaded at most every REVOCATION_REFRESH_SECONDS; revocations made by this worker apply at once.
+    """
+
+    def __init__(self):
+        self._versions: Dict[str, int] = {}
+        self._local: Dict[str, Tuple[int, datetime]] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def min_version(self, db: Session, user_id: str) -> int:
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > settings.REVOCATION_REFRESH_SECONDS:
+            self.load(db)
+        return self._versions.get(user_id, 0)
+
+    def load(self, db: Session):
+        started = time.monotonic()
+        # Older revocations only concern tokens that have expired by now.
+        cutoff = datetime.utcnow() - timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+        rows = (
+            db.query(models.TokenRevocation.user_id, models.TokenRevocation.min_version)
+            .filter(models.TokenRevocation.revoked_at >= cutoff)
+            .all()
+        )
+        versions = {str(user_id): min_version for user_id, min_version in rows}
+        with self._lock:
+            # Keep local revocations the query may have raced with.
+            for user_id, (min_version, revoked_at) in list(self._local.items()):
+                if revoked_at < cutoff:
+                    del self._local[user_id]
+                else:
+                    versions[user_id] = max(versions.get(user_id, 0), min_version)
+            self._versions = versions
+            self._loaded_at = started
+
+    def add(self, user_id: str, min_version: int):
+        with self._lock:
+            self._local[user_id] = (min_version, datetime.utcnow())
+            self._versions = {**self._versions, user_id: max(self._versions.get(user_id, 0), min_version)}
+
+    def clear(self):
+        with self._lock:
+            self._versions, self._local, self._loaded_at = {}, {}, None
+
+
+revocations = RevocationList()
+
+
+def revoke_user_tokens(db: Session, user_id: uuid.UUID, min_version: int):
+    """Reject access tokens of `user_id` older than `min_version` in every worker. Commits."""
+    now = datetime.utcnow()
+    cutoff = now - timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    db.query(models.TokenRevocation).filter(models.TokenRevocation.revoked_at < cutoff).delete()
+    db.merge(models.TokenRevocation(user_id=user_id, min_version=min_version, revoked_at=now))
+    db.query(models.RefreshToken).filter(models.RefreshToken.user_id == user_id).update({"revoked": True})
+    db.commit()
+    revocations.add(str(user_id), min_version)
+
+
+def create_token_pair(db: Session, user: models.User, family_id: Optional[uuid.UUID] = None) -> dict:
+    """Issue an access token and a refresh token for `user`. Commits the refresh token row."""
+    claims = {"sub": user.email, "uid": str(user.id), "ver": user.token_version or 0}
+    refresh = models.RefreshToken(
+        id=uuid7(), user_id=user.id, family_id=family_id or uuid7(),
+        expires_at=datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+    )
+    db.add(refresh)
+    db.commit()
+    return {
+        "access_token": create_access_token(
+            {**claims, "type": "access"}, timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+        ),
+        "refresh_token": create_access_token(
+            {**claims, "type": "refresh", "jti": str(refresh.id)},
+            refresh.expires_at - datetime.utcnow(),
+        ),
+        "email": user.email,
+        "token_type": "bearer",
+    }
+
+
+def credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+def decode_token(token: str, token_type: str) -> dict:
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-        token_data = schemas.TokenData(email=email)
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
     except JWTError:
-        raise credentials_exception
-    user = db.query(models.User).filter(models.User.email == token_data.email).first()
-    if user is None:
-        raise credentials_exception
-    return user
+        raise credentials_exception()
+    # Tokens issued before refresh tokens existed carry no type and are access tokens.
+    if payload.get("sub") is None or payload.get("type", "access") != token_type:
+        raise credentials_exception()
+    return payload
+
+
+def _stored_refresh_token(db: Session, token: str) -> Tuple[dict, models.RefreshToken]:
+    payload = decode_token(token, "refresh")
+    try:
+        stored = db.get(models.RefreshToken, uuid.UUID(payload["jti"]))
+    except (KeyError, ValueError):
+        raise credentials_exception()
+    if stored is None:
+        raise credentials_exception()
+    return payload, stored
+
+
+def _revoke_family(db: Session, family_id: uuid.UUID):
+    db.query(models.RefreshToken).filter(models.RefreshToken.family_id == family_id).update({"revoked": True})
+    db.commit()
+
+
+def rotate_refresh_token(db: Session, token: str) -> dict:
+    """Exchange a refresh token for a new token pair; the presented token cannot be used again.
+
+    Presenting an already rotated token means it leaked: its whole family is revoked.
+    """
+    payload, stored = _stored_refresh_token(db, token)
+    if stored.revoked or stored.expires_at < datetime.utcnow():
+        raise credentials_exception()
+    # Compare-and-set, so two concurrent refreshes cannot both rotate the same token.
+    rotated = db.execute(
+        update(models.RefreshToken)
+        .where(models.RefreshToken.id == stored.id, models.RefreshToken.used_at.is_(None))
+        .values(used_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not rotated:
+        _revoke_family(db, stored.family_id)
+        raise credentials_exception()
+    user = db.get(models.User, stored.user_id)
+    if user is None or user.token_version != payload.get("ver"):
+        db.rollback()
+        raise credentials_exception()
+    return create_token_pair(db, user, family_id=stored.family_id)
+
+
+def revoke_refresh_token(db: Session, token: str):
+    """Log out: revoke every refresh token rotated from the same login."""
+    _, stored = _stored_refresh_token(db, token)
+    _revoke_family(db, stored.family_id)
+
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_read_db)):
+    """The authenticated user, checked against the in-process revocation list only.
+
+    The returned user is built from the token claims and is not attached to `db`; only `id`
+    and `email` are set. Tokens without a `uid` claim fall back to loading the user.
+    """
+    payload = decode_token(token, "access")
+    token_data = schemas.TokenData(email=payload["sub"])
+    user_id = payload.get("uid")
+    if user_id is None:
+        user = db.query(models.User).filter(models.User.email == token_data.email).first()
+        if user is None:
+            raise credentials_exception()
+        return user
+    try:
+        user_uuid = uuid.UUID(user_id)
+    except ValueError:
+        raise credentials_exception()
+    if payload.get("ver", 0) < revocations.min_version(db, user_id):
+        raise credentials_exception()
+    return models.User(id=user_uuid, email=token_data.email, token_version=payload.get("ver", 0))
+
+
+def get_current_admin(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """The authenticated user, if their account has `is_admin` set.
+
+    Read from the primary on every request, so revoking admin rights takes effect at once.
+    """
+    is_admin = db.scalar(select(models.User.is_admin).where(models.User.id == current_user.id))
+    if not is_admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return current_user
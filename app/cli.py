@@ -0,0 +1,128 @@
+"""Operational commands, run as `python -m app.cli <command>`."""
+import argparse
+import os
+
+from sqlalchemy import inspect
+
+from app.config import settings
+from app.database import SessionLocal, dispose_engine, get_engine
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def alembic_config():
+    from alembic.config import Config
+
+    config = Config(os.path.join(PROJECT_ROOT, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(PROJECT_ROOT, "migrations"))
+    # ConfigParser interpolates `%`, which URL-encoded passwords contain.
+    config.set_main_option("sqlalchemy.url", settings.DATABASE_URL.replace("%", "%%"))
+    return config
+
+
+def migrate(args):
+    from alembic import command
+
+    try:
+        tables = set(inspect(get_engine()).get_table_names())
+    finally:
+        dispose_engine()
+    if "users" in tables and "alembic_version" not in tables:
+        raise SystemExit(
+            "The database was created without migrations. Record the revision its schema matches with "
+            "`python -m app.cli stamp <revision>` (0001 for the original schema), then migrate again."
+        )
+    command.upgrade(alembic_config(), args.revision)
+
+
+def downgrade(args):
+    from alembic import command
+
+    command.downgrade(alembic_config(), args.revision)
+
+
+def stamp(args):
+    from alembic import command
+
+    command.stamp(alembic_config(), args.revision)
+
+
+def current(args):
+    from alembic import command
+
+    command.current(alembic_config(), verbose=args.verbose)
+
+
+def refresh_trending(args):
+    from app.utils.trending import refresh_all_scores
+
+    db = SessionLocal()
+    try:
+        print(f"Rescored {refresh_all_scores(db)} videos.")
+    finally:
+        db.close()
+
+
+def reap_videos(args):
+    from app.utils.reaper import reap_videos
+
+    db = SessionLocal()
+    try:
+        print(f"Purged {reap_videos(db)} deleted videos.")
+    finally:
+        db.close()
+
+
+def set_admin(args):
+    from app import models
+
+    db = SessionLocal()
+    try:
+        user = db.query(models.User).filter(models.User.email == args.email).first()
+        if user is None:
+            raise SystemExit(f"No user with the email {args.email}.")
+        user.is_admin = args.admin
+        db.commit()
+        print(f"{args.email} {'is now' if user.is_admin else 'is no longer'} an admin.")
+    finally:
+        db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    command = subcommands.add_parser("migrate", help="Apply schema migrations")
+    command.add_argument("revision", nargs="?", default="head")
+    command.set_defaults(func=migrate)
+    command = subcommands.add_parser("downgrade", help="Revert schema migrations down to a revision")
+    command.add_argument("revision")
+    command.set_defaults(func=downgrade)
+    command = subcommands.add_parser(
+        "stamp", help="Record a revision as applied without running it, for databases created before migrations"
+    )
+    command.add_argument("revision")
+    command.set_defaults(func=stamp)
+    command = subcommands.add_parser("current", help="Show the revision the database is at")
+    command.add_argument("--verbose", action="store_true")
+    command.set_defaults(func=current)
+    subcommands.add_parser(
+        "refresh-trending", help="Recompute every trending score, e.g. after changing TRENDING_DECAY_SECONDS"
+    ).set_defaults(func=refresh_trending)
+    for name, admin, description in (
+        ("grant-admin", True, "Allow a user on the /api/admin endpoints"),
+        ("revoke-admin", False, "Take a user's admin rights away"),
+    ):
+        command = subcommands.add_parser(name, help=description)
+        command.add_argument("email")
+        command.set_defaults(func=set_admin, admin=admin)
+    subcommands.add_parser(
+        "reap-videos", help="Purge videos deleted more than VIDEO_PURGE_DELAY_HOURS ago and their storage objects"
+    ).set_defaults(func=reap_videos)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+import os
+from typing import List, Optional
+
+from decouple import Csv, config
+
+
+class Settings:
+    """Application configuration, read once from the environment and `.env`.
+
+    Attributes are plain values so tests can override them with `monkeypatch.setattr`.
+    """
+
+    def __init__(self):
+        # Auth
+        self.SECRET_KEY: Optional[str] = config("SECRET_KEY", default=None)
+        self.ACCESS_TOKEN_EXPIRE_MINUTES: int = config("ACCESS_TOKEN_EXPIRE_MINUTES", default=30, cast=int)
+        self.REFRESH_TOKEN_EXPIRE_DAYS: int = config("REFRESH_TOKEN_EXPIRE_DAYS", default=30, cast=int)
+        # How stale a worker's copy of the revocation list may get.
+        self.REVOCATION_REFRESH_SECONDS: float = config("REVOCATION_REFRESH_SECONDS", default=5.0, cast=float)
+
+        # Database
+        self.DATABASE_URL: str = config("DATABASE_URL", default="sqlite:///./shareytb.db")
+        self.SQL_ECHO: bool = config("SQL_ECHO", default=False, cast=bool)
+        # Read-only endpoints spread over these; empty sends everything to DATABASE_URL.
+        self.DATABASE_REPLICA_URLS: List[str] = config("DATABASE_REPLICA_URLS", default="", cast=Csv())
+        # After a write, the client's reads go to the primary this long, covering replication lag.
+        self.REPLICA_STICKY_SECONDS: float = config("REPLICA_STICKY_SECONDS", default=5.0, cast=float)
+
+        # Observability
+        self.METRICS_ENABLED: bool = config("METRICS_ENABLED", default=False, cast=bool)
+        self.QUERY_PROFILER_ENABLED: bool = config("QUERY_PROFILER_ENABLED", default=False, cast=bool)
+        self.SLOW_QUERY_THRESHOLD_MS: float = config("SLOW_QUERY_THRESHOLD_MS", default=100.0, cast=float)
+        self.QUERY_PROFILER_EXPLAIN: bool = config("QUERY_PROFILER_EXPLAIN", default=True, cast=bool)
+        self.QUERY_PROFILER_HISTORY: int = config("QUERY_PROFILER_HISTORY", default=100, cast=int)
+
+        # Storage
+        self.STORAGE_BACKEND: str = config("STORAGE_BACKEND", default="s3")
+        self.S3_BUCKET: Optional[str] = config("S3_BUCKET", default=None)
+        self.S3_ENDPOINT_URL: Optional[str] = config("S3_ENDPOINT_URL", default=None)
+        self.AWS_REGION: Optional[str] = config("AWS_REGION", default=None)
+        self.AWS_ACCESS_KEY_ID: Optional[str] = config("AWS_ACCESS_KEY_ID", default=None)
+        self.AWS_SECRET_ACCESS_KEY: Optional[str] = config("AWS_SECRET_ACCESS_KEY", default=None)
+        # Upper bound on concurrent storage calls per process; also the size of the HTTP connection pool.
+        self.STORAGE_MAX_POOL_CONNECTIONS: int = config("STORAGE_MAX_POOL_CONNECTIONS", default=32, cast=int)
+        self.STORAGE_MAX_ATTEMPTS: int = config("STORAGE_MAX_ATTEMPTS", default=5, cast=int)
+        self.STORAGE_CONNECT_TIMEOUT: float = config("STORAGE_CONNECT_TIMEOUT", default=5.0, cast=float)
+        self.STORAGE_READ_TIMEOUT: float = config("STORAGE_READ_TIMEOUT", default=60.0, cast=float)
+        self.LOCAL_STORAGE_ROOT: str = config("LOCAL_STORAGE_ROOT", default="./media")
+        self.LOCAL_STORAGE_BASE_URL: str = config("LOCAL_STORAGE_BASE_URL", default="/media")
+        # Serve media through GET /media/{key} from a disk cache instead of linking to the bucket.
+        self.MEDIA_PROXY_ENABLED: bool = config("MEDIA_PROXY_ENABLED", default=False, cast=bool)
+        # Where clients reach the proxy, e.g. https://api.example.com/media when the API has its own host.
+        self.MEDIA_PROXY_BASE_URL: str = config("MEDIA_PROXY_BASE_URL", default="/media")
+        self.MEDIA_CACHE_DIR: str = config("MEDIA_CACHE_DIR", default="./media-cache")
+        self.MEDIA_CACHE_MAX_BYTES: int = config("MEDIA_CACHE_MAX_BYTES", default=10 * 1024 ** 3, cast=int)
+
+        # Single-request uploads; larger videos go through resumable uploads.
+        self.UPLOAD_MAX_VIDEO_SIZE: int = config("UPLOAD_MAX_VIDEO_SIZE", default=1024 * 1024 * 1024, cast=int)
+        self.UPLOAD_MAX_IMAGE_SIZE: int = config("UPLOAD_MAX_IMAGE_SIZE", default=10 * 1024 * 1024, cast=int)
+        self.UPLOAD_MAX_IMAGE_PIXELS: int = config("UPLOAD_MAX_IMAGE_PIXELS", default=40_000_000, cast=int)
+        # Leading bytes of an upload inspected for magic numbers and image headers.
+        self.UPLOAD_SNIFF_BYTES: int = config("UPLOAD_SNIFF_BYTES", default=64 * 1024, cast=int)
+
+        # Resumable uploads. S3 rejects multipart parts under 5 MiB except for the last one.
+        self.RESUMABLE_MIN_CHUNK_SIZE: int = config("RESUMABLE_MIN_CHUNK_SIZE", default=5 * 1024 * 1024, cast=int)
+        self.RESUMABLE_MAX_CHUNK_SIZE: int = config("RESUMABLE_MAX_CHUNK_SIZE", default=64 * 1024 * 1024, cast=int)
+        self.RESUMABLE_MAX_SIZE: int = config("RESUMABLE_MAX_SIZE", default=10 * 1024 * 1024 * 1024, cast=int)
+        self.RESUMABLE_SESSION_TTL_HOURS: int = config("RESUMABLE_SESSION_TTL_HOURS", default=24, cast=int)
+        # A PATCH holds its part this long at most; longer than any one part upload to S3 can take.
+        self.RESUMABLE_PART_CLAIM_SECONDS: int = config("RESUMABLE_PART_CLAIM_SECONDS", default=900, cast=int)
+
+        # Server (app.server)
+        self.HOST: str = config("HOST", default="0.0.0.0")
+        self.PORT: int = config("PORT", default=8000, cast=int)
+        # Websocket and event-stream subscribers live in the worker they connected to, and notifications are
+        # published in-process, so extra workers split the subscribers until a cross-process broker exists.
+        self.WEB_CONCURRENCY: int = config("WEB_CONCURRENCY", default=1, cast=int)
+        # Seconds a stopping worker waits for in-flight requests (uploads) before cancelling them.
+        self.GRACEFUL_SHUTDOWN_TIMEOUT: int = config("GRACEFUL_SHUTDOWN_TIMEOUT", default=30, cast=int)
+        # Upper bound of the jittered delay clients are told to wait before reconnecting their websocket.
+        self.WS_RECONNECT_MAX_DELAY_MS: int = config("WS_RECONNECT_MAX_DELAY_MS", default=5000, cast=int)
+        # Server-sent events (/api/events): idle seconds between keep-alive comments, events kept per worker
+        # for Last-Event-ID resume, and events buffered per slow client before it is told to reconnect.
+        self.SSE_HEARTBEAT_SECONDS: float = config("SSE_HEARTBEAT_SECONDS", default=15, cast=float)
+        self.SSE_REPLAY_EVENTS: int = config("SSE_REPLAY_EVENTS", default=1000, cast=int)
+        self.SSE_QUEUE_SIZE: int = config("SSE_QUEUE_SIZE", default=100, cast=int)
+
+        # Response compression: text bodies from this size on, brotli or gzip as the client accepts. Levels favour
+        # speed; JSON feeds compress well even at low levels.
+        self.COMPRESSION_ENABLED: bool = config("COMPRESSION_ENABLED", default=True, cast=bool)
+        self.COMPRESSION_MINIMUM_SIZE: int = config("COMPRESSION_MINIMUM_SIZE", default=1024, cast=int)
+        self.COMPRESSION_GZIP_LEVEL: int = config("COMPRESSION_GZIP_LEVEL", default=6, cast=int)
+        self.COMPRESSION_BROTLI_QUALITY: int = config("COMPRESSION_BROTLI_QUALITY", default=4, cast=int)
+
+        # Rate limiting: "<requests>/<second|minute|hour>" per client IP and per user or account.
+        self.RATE_LIMIT_ENABLED: bool = config("RATE_LIMIT_ENABLED", default=True, cast=bool)
+        # "memory" (per worker) or "database" (shared by all workers).
+        self.RATE_LIMIT_BACKEND: str = config("RATE_LIMIT_BACKEND", default="memory")
+        self.RATE_LIMIT_MAX_KEYS: int = config("RATE_LIMIT_MAX_KEYS", default=100_000, cast=int)
+        self.RATE_LIMIT_LOGIN: str = config("RATE_LIMIT_LOGIN", default="20/minute")
+        self.RATE_LIMIT_LOGIN_ACCOUNT: str = config("RATE_LIMIT_LOGIN_ACCOUNT", default="10/minute")
+        self.RATE_LIMIT_SIGNUP: str = config("RATE_LIMIT_SIGNUP", default="10/hour")
+        self.RATE_LIMIT_CREATE_VIDEO: str = config("RATE_LIMIT_CREATE_VIDEO", default="30/minute")
+        self.RATE_LIMIT_UPLOAD: str = config("RATE_LIMIT_UPLOAD", default="60/minute")
+        # Concurrent bcrypt hashes and uploads per worker before new ones are shed with 503.
+        self.BCRYPT_CONCURRENCY: int = config("BCRYPT_CONCURRENCY", default=os.cpu_count() or 1, cast=int)
+        self.BCRYPT_QUEUE_TIMEOUT: float = config("BCRYPT_QUEUE_TIMEOUT", default=0.5, cast=float)
+        self.UPLOAD_CONCURRENCY: int = config("UPLOAD_CONCURRENCY", default=32, cast=int)
+
+        # Trending feed: seconds of age worth a 10x difference in net votes.
+        self.TRENDING_DECAY_SECONDS: float = config("TRENDING_DECAY_SECONDS", default=45000.0, cast=float)
+        self.TRENDING_REFRESH_ENABLED: bool = config("TRENDING_REFRESH_ENABLED", default=True, cast=bool)
+
+        # Bulk export and import (/api/admin): rows per database fetch and per import transaction.
+        self.EXPORT_BATCH_SIZE: int = config("EXPORT_BATCH_SIZE", default=1000, cast=int)
+        self.IMPORT_BATCH_SIZE: int = config("IMPORT_BATCH_SIZE", default=500, cast=int)
+
+        # Background work
+        self.WORKER_PROCESSES: int = config("WORKER_PROCESSES", default=os.cpu_count() or 1, cast=int)
+        # Threads running background jobs (app.utils.jobs); CPU-heavy steps go to the process pool.
+        self.WORKER_THREADS: int = config("WORKER_THREADS", default=4, cast=int)
+        # Jobs queued beyond this are dropped (and logged); retries back off from the base delay, doubling.
+        self.JOB_QUEUE_SIZE: int = config("JOB_QUEUE_SIZE", default=1000, cast=int)
+        self.JOB_MAX_ATTEMPTS: int = config("JOB_MAX_ATTEMPTS", default=3, cast=int)
+        self.JOB_RETRY_BACKOFF_SECONDS: float = config("JOB_RETRY_BACKOFF_SECONDS", default=2.0, cast=float)
+        # SQLite file keeping unfinished jobs across restarts; empty keeps them in memory only. Worker processes
+        # sharing it lease the jobs they hold; a job whose lease is not renewed in time is run by another one.
+        self.JOB_STORE_PATH: str = config("JOB_STORE_PATH", default="")
+        self.JOB_LEASE_SECONDS: float = config("JOB_LEASE_SECONDS", default=60.0, cast=float)
+
+        # Deleted videos: kept this long, then purged with their storage objects, `REAPER_BATCH_SIZE` rows at a time.
+        self.REAPER_ENABLED: bool = config("REAPER_ENABLED", default=True, cast=bool)
+        self.VIDEO_PURGE_DELAY_HOURS: float = config("VIDEO_PURGE_DELAY_HOURS", default=24.0, cast=float)
+        self.REAPER_BATCH_SIZE: int = config("REAPER_BATCH_SIZE", default=500, cast=int)
+        # Each worker queues a reaper run this often (deletes queue one too, no more often than that);
+        # `python -m app.cli reap-videos` runs one from cron.
+        self.REAPER_INTERVAL_SECONDS: float = config("REAPER_INTERVAL_SECONDS", default=300.0, cast=float)
+
+        # Thumbnails
+        self.THUMBNAILS_ENABLED: bool = config("THUMBNAILS_ENABLED", default=True, cast=bool)
+        self.THUMBNAIL_WIDTHS: List[int] = config("THUMBNAIL_WIDTHS", default="160,320,640", cast=Csv(int))
+        self.THUMBNAIL_QUALITY: int = config("THUMBNAIL_QUALITY", default=80, cast=int)
+        self.FEED_IMAGE_WIDTH: int = config("FEED_IMAGE_WIDTH", default=320, cast=int)
+
+        # Transcoding uploaded videos to HLS: "<height>:<video kb/s>" per rendition.
+        self.TRANSCODING_ENABLED: bool = config("TRANSCODING_ENABLED", default=True, cast=bool)
+        self.TRANSCODE_RENDITIONS: List[str] = config(
+            "TRANSCODE_RENDITIONS", default="360:800,720:2800,1080:5000", cast=Csv()
+        )
+        self.HLS_SEGMENT_SECONDS: int = config("HLS_SEGMENT_SECONDS", default=4, cast=int)
+        # Per rendition; a slower ffmpeg run is killed and the video marked failed.
+        self.TRANSCODE_TIMEOUT: int = config("TRANSCODE_TIMEOUT", default=3600, cast=int)
+        # Videos transcoded at once, on job threads of their own so encodes cannot hold up other jobs.
+        self.TRANSCODE_CONCURRENCY: int = config("TRANSCODE_CONCURRENCY", default=1, cast=int)
+
+
+settings = Settings()
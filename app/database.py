@@ -1,13 +1,82 @@
+import functools
+import itertools
+import math
+import time
+from typing import List
+
+from fastapi import Request
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from starlette.datastructures import MutableHeaders
+
+from app.config import settings
+
+# Unix time until which the client's reads must see the primary; set after its writes.
+PRIMARY_COOKIE = "db_primary_until"
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+def _create_engine(url: str) -> Engine:
+    connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+    engine = create_engine(url, echo=settings.SQL_ECHO, connect_args=connect_args)
+    if settings.METRICS_ENABLED:
+        from app.utils import metrics
+        metrics.instrument_engine(engine)
+    if settings.QUERY_PROFILER_ENABLED:
+        from app.utils import profiler
+        profiler.instrument_engine(engine)
+    return engine
+
+
+@functools.lru_cache(maxsize=None)
+def get_engine() -> Engine:
+    """Build the engine on first use, so importing the app never touches the database."""
+    return _create_engine(settings.DATABASE_URL)
+
+
+@functools.lru_cache(maxsize=None)
+def get_replica_engines() -> List[Engine]:
+    return [_create_engine(url) for url in settings.DATABASE_REPLICA_URLS]
+
+
+def dispose_engine():
+    if get_engine.cache_info().currsize:
+        get_engine().dispose()
+        get_engine.cache_clear()
+    if get_replica_engines.cache_info().currsize:
+        for engine in get_replica_engines():
+            engine.dispose()
+        get_replica_engines.cache_clear()
+
+
+class LazySessionmaker(sessionmaker):
+    """A sessionmaker that binds to `get_engine()` when the first session is opened."""
+
+    def _engine(self) -> Engine:
+        return get_engine()
+
+    def __call__(self, **local_kw):
+        if "bind" not in local_kw and self.kw.get("bind") is None:
+            local_kw["bind"] = self._engine()
+        return super().__call__(**local_kw)
+
+
+class ReplicaSessionmaker(LazySessionmaker):
+    """Binds each new session to the next replica in turn, or to the primary when there are none."""
+
+    _turn = itertools.count()
 
-SQLITE_DATABASE_URL = "sqlite:///./shareytb.db"
+    def _engine(self) -> Engine:
+        replicas = get_replica_engines()
+        if not replicas:
+            return get_engine()
+        return replicas[next(self._turn) % len(replicas)]
 
-engine = create_engine(
-    SQLITE_DATABASE_URL, echo=True, connect_args={"check_same_thread": False}
-)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+SessionLocal = LazySessionmaker(autocommit=False, autoflush=False)
+ReadSessionLocal = ReplicaSessionmaker(autocommit=False, autoflush=False)
 
 Base = declarative_base()
 
@@ -18,3 +87,48 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def reads_primary(request: Request) -> bool:
+    try:
+        return float(request.cookies.get(PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def get_read_db(request: Request):
+    """Session for read-only endpoints: a replica, unless the client wrote recently.
+
+    Replicas lag the primary, so for REPLICA_STICKY_SECONDS after a write the client keeps reading
+    from the primary and sees its own changes.
+    """
+    db = SessionLocal() if reads_primary(request) else ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+class ReadYourWritesMiddleware:
+    """Marks clients whose request may have written with a short-lived cookie pinning their reads to the primary."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS or not settings.DATABASE_REPLICA_URLS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                max_age = math.ceil(settings.REPLICA_STICKY_SECONDS)
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "set-cookie",
+                    f"{PRIMARY_COOKIE}={time.time() + settings.REPLICA_STICKY_SECONDS:.3f}; "
+                    f"Max-Age={max_age}; Path=/; HttpOnly; SameSite=Lax",
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
@@ -1,12 +1,36 @@
-from app import models
-from app.api import user, videos, uploads, websockets
+from contextlib import asynccontextmanager
+
+from app.api import admin, events, user, videos, uploads, resumable_uploads, websockets, media
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import engine
+from fastapi.staticfiles import StaticFiles
+from app.config import settings
+from app.database import ReadYourWritesMiddleware, dispose_engine
+from app.utils.jobs import get_job_runner, shutdown_jobs
+from app.utils.pools import shutdown_pools
+from app.utils.reaper import start_reaper, stop_reaper
+from app.utils.storage import shutdown_storage
+
 
-models.Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The engine, storage client and worker pools are created on first use; release them on shutdown.
+    if settings.JOB_STORE_PATH:
+        # Picks up the jobs a previous run left unfinished.
+        get_job_runner()
+    start_reaper()
+    yield
+    stop_reaper()
+    shutdown_jobs(wait=False)
+    shutdown_pools(wait=False)
+    shutdown_storage()
+    dispose_engine()
+    if settings.METRICS_ENABLED:
+        from app.utils import metrics
+        metrics.mark_worker_stopped()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 
 origins = [
     '*',
@@ -19,12 +43,38 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(ReadYourWritesMiddleware)
+
+if settings.COMPRESSION_ENABLED:
+    from app.utils.compression import CompressionMiddleware
+    app.add_middleware(CompressionMiddleware)
+
+if settings.METRICS_ENABLED:
+    from app.utils import metrics
+    metrics.setup_metrics(app)
+
+if settings.QUERY_PROFILER_ENABLED:
+    from app.utils import profiler
+    profiler.setup_profiler(app)
 
 
 app.include_router(user.router, prefix="/api/users", tags=["Users"])
 app.include_router(videos.router, prefix="/api/videos", tags=["videos"])
 app.include_router(uploads.router, prefix="/api/uploads", tags=["uploads"])
+app.include_router(resumable_uploads.router, prefix="/api/uploads/resumable", tags=["uploads"])
 app.include_router(websockets.router, prefix="/ws", tags=["websocket"])
+app.include_router(events.router, prefix="/api/events", tags=["websocket"])
+app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
+
+if settings.MEDIA_PROXY_ENABLED:
+    app.include_router(media.router, prefix="/media", tags=["media"])
+elif settings.STORAGE_BACKEND == "local":
+    # Serve the offline storage stand-in at the URLs its public_url() hands out.
+    app.mount(
+        settings.LOCAL_STORAGE_BASE_URL,
+        StaticFiles(directory=settings.LOCAL_STORAGE_ROOT, check_dir=False),
+        name="media",
+    )
 
 
 @app.get("/api/healthchecker")
@@ -1,33 +1,151 @@
-import uuid
 from datetime import datetime
 
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey
+from sqlalchemy import BigInteger, Boolean, Column, String, Integer, DateTime, Float, ForeignKey, Index, SmallInteger, \
+    Text, false, text
 from sqlalchemy.orm import relationship
 from sqlalchemy_utils import UUIDType
 
 from app.database import Base
+from app.utils.ids import uuid7
+
+# 16 bytes on SQLite and MySQL, the native uuid type on PostgreSQL.
+GUID = UUIDType(binary=True)
+
+# Feed indexes only cover videos that are not deleted; queries repeat the condition so the planner can use them.
+LIVE_VIDEOS = text("deleted_at IS NULL")
+DELETED_VIDEOS = text("deleted_at IS NOT NULL")
 
 
 class User(Base):
     __tablename__ = "users"
 
-    # Primary key and GUID type
-    id = Column(UUIDType(binary=False), primary_key=True, default=uuid.uuid4)
+    # Time-ordered primary key
+    id = Column(GUID, primary_key=True, default=uuid7)
     email = Column(String(255), nullable=False, index=True, unique=True)
     password = Column(String(255), nullable=False)
+    # Embedded in issued tokens; bumping it revokes every token issued before.
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
+    # Kept in step with inserts and deletes of the user's videos, so profiles never count the table.
+    video_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # Granted with `python -m app.cli grant-admin`; nothing a user can do through the API sets it.
+    is_admin = Column(Boolean, nullable=False, default=False, server_default=false())
     videos = relationship("Video", back_populates="user")
 
 
 class Video(Base):
     __tablename__ = "videos"
-    id = Column(UUIDType(binary=False), primary_key=True, default=uuid.uuid4)
+    id = Column(GUID, primary_key=True, default=uuid7)
     title = Column(String(255), nullable=False)
     description = Column(String(255), nullable=True)
     video_url = Column(String(255), nullable=False)
     image_url = Column(String(255), nullable=False)
     tags = Column(String(255), nullable=True)
-    shared_by = Column(UUIDType(binary=False), ForeignKey('users.id'), nullable=False)
+    # NULL once the user is deleted; their videos are soft-deleted along with them.
+    shared_by = Column(GUID, ForeignKey('users.id'), nullable=True)
     likes = Column(Integer, nullable=False, default=0)
     dislikes = Column(Integer, nullable=False, default=0)
     shared_at = Column(DateTime, nullable=False, default=datetime.utcnow)
-    user = relationship("User", back_populates="videos")
\ No newline at end of file
+    # Precomputed by app.utils.trending; (trending_score, id) is the trending feed's keyset.
+    trending_score = Column(Float, nullable=False, default=0.0, server_default="0")
+    # Set by app.utils.transcoding for uploaded videos: pending, processing, ready or failed.
+    processing_status = Column(String(16), nullable=True)
+    # HLS master playlist, once the renditions are ready.
+    manifest_key = Column(String(255), nullable=True)
+    # Soft delete: hidden from every endpoint at once, purged with its storage objects by app.utils.reaper.
+    deleted_at = Column(DateTime, nullable=True)
+    user = relationship("User", back_populates="videos")
+
+    __table_args__ = (
+        Index("ix_videos_shared_at", "shared_at", sqlite_where=LIVE_VIDEOS, postgresql_where=LIVE_VIDEOS),
+        Index("ix_videos_trending", "trending_score", "id", sqlite_where=LIVE_VIDEOS, postgresql_where=LIVE_VIDEOS),
+        # Per-user feed keyset; also serves lookups by shared_by alone.
+        Index(
+            "ix_videos_shared_by_shared_at", "shared_by", "shared_at", "id",
+            sqlite_where=LIVE_VIDEOS, postgresql_where=LIVE_VIDEOS,
+        ),
+        # The reaper's queue; stays as small as the backlog of deleted videos.
+        Index("ix_videos_deleted_at", "deleted_at", sqlite_where=DELETED_VIDEOS, postgresql_where=DELETED_VIDEOS),
+        # Trigram index on Postgres, so the `tag` filter's LIKE patterns do not scan the table.
+        Index("ix_videos_tags", "tags", postgresql_using="gin", postgresql_ops={"tags": "gin_trgm_ops"}),
+    )
+
+
+class Vote(Base):
+    """One user's like (1) or dislike (-1) of a video; `likes`/`dislikes` on the video are the totals."""
+    __tablename__ = "votes"
+    user_id = Column(GUID, ForeignKey('users.id'), primary_key=True)
+    video_id = Column(GUID, ForeignKey('videos.id'), primary_key=True)
+    value = Column(SmallInteger, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class Thumbnail(Base):
+    """Resized WebP variants generated from an uploaded image or a video frame."""
+    __tablename__ = "thumbnails"
+    source_key = Column(String(255), primary_key=True)
+    width = Column(Integer, primary_key=True)
+    key = Column(String(255), nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class Upload(Base):
+    """Content-hash index of stored uploads, used to skip re-sending duplicates to S3."""
+    __tablename__ = "uploads"
+    sha256 = Column(String(64), primary_key=True)
+    key = Column(String(255), nullable=False)
+    size = Column(Integer, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    # Last time an upload was deduplicated onto this key; the reaper leaves recently seen keys alone.
+    last_seen_at = Column(DateTime, nullable=True)
+
+
+class UploadSession(Base):
+    """A resumable upload in progress, backed by an S3 multipart upload."""
+    __tablename__ = "upload_sessions"
+    id = Column(GUID, primary_key=True, default=uuid7)
+    user_id = Column(GUID, ForeignKey('users.id'), nullable=False)
+    filename = Column(String(255), nullable=False)
+    key = Column(String(255), nullable=False)
+    s3_upload_id = Column(String(1024), nullable=False)
+    length = Column(BigInteger, nullable=False)
+    upload_offset = Column(BigInteger, nullable=False, default=0)
+    # JSON list of {"PartNumber": n, "ETag": "..."} for the parts already stored in S3.
+    parts = Column(Text, nullable=False, default="[]")
+    completed = Column(Boolean, nullable=False, default=False)
+    # Set while a PATCH uploads the next part, so two PATCHes at one offset never write the same part.
+    claimed_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+
+class RateLimitBucket(Base):
+    """Token bucket state shared by every worker when RATE_LIMIT_BACKEND=database."""
+    __tablename__ = "rate_limit_buckets"
+    key = Column(String(255), primary_key=True)
+    tokens = Column(Float, nullable=False)
+    # Unix timestamp of the last refill.
+    updated_at = Column(Float, nullable=False)
+
+
+class RefreshToken(Base):
+    """An issued refresh token. Each refresh rotates it; tokens rotated from one login share a family."""
+    __tablename__ = "refresh_tokens"
+    id = Column(GUID, primary_key=True, default=uuid7)
+    user_id = Column(GUID, ForeignKey('users.id', ondelete="CASCADE"), nullable=False, index=True)
+    family_id = Column(GUID, nullable=False, index=True)
+    expires_at = Column(DateTime, nullable=False)
+    used_at = Column(DateTime, nullable=True)
+    revoked = Column(Boolean, nullable=False, default=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class TokenRevocation(Base):
+    """Users whose access tokens below `min_version` must be rejected.
+
+    Only rows younger than the access token lifetime matter, which keeps the list small enough to
+    cache in every worker.
+    """
+    __tablename__ = "token_revocations"
+    user_id = Column(GUID, primary_key=True)
+    min_version = Column(Integer, nullable=False)
+    revoked_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
@@ -1,11 +1,12 @@
 from enum import Enum
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Literal, Optional
 
-from decouple import config
 from pydantic import BaseModel, Field, EmailStr, field_serializer
 from uuid import UUID
 
+from app.utils.storage import media_url
+
 
 class UserBaseSchema(BaseModel):
     email: EmailStr = Field(..., description="The email of the user", example="test@gmail.com")
@@ -31,6 +32,7 @@ class UserUpdateSchema(BaseModel):
 
 class UserResponseSchema(UserBaseSchema):
     id: UUID
+    video_count: int = 0
 
 
 class Status(Enum):
@@ -59,10 +61,28 @@ class DeleteUserResponse(BaseModel):
     Message: str
 
 
+class ImportRowError(BaseModel):
+    line: int
+    error: str
+
+
+class ImportResponse(BaseModel):
+    Status: Status
+    Imported: int
+    Skipped: int = Field(..., description="Rows whose email already exists")
+    Failed: int = Field(..., description="Rows that are not valid users")
+    Errors: List[ImportRowError] = Field(..., description="The first invalid rows")
+
+
 class Token(BaseModel):
     access_token: str
     token_type: str
     email: str | None = None
+    refresh_token: str | None = None
+
+
+class RefreshTokenSchema(BaseModel):
+    refresh_token: str
 
 
 class TokenData(BaseModel):
@@ -98,17 +118,24 @@ class VideoSchema(VideoBase):
     likes: int
     dislikes: int
     shared_at: datetime
+    # Uploaded videos are transcoded to HLS; play `manifest_url` once it is set, `video_url` until then.
+    processing_status: Optional[str] = None
+    manifest_url: Optional[str] = Field(None, validation_alias="manifest_key")
 
     class Config:
         from_attributes = True
 
     @field_serializer("video_url")
     def serialize_video_url(self, video_url: str, _info):
-        return f"https://{config('S3_BUCKET')}.s3.{config('AWS_REGION')}.amazonaws.com/{video_url}"
+        return media_url(video_url)
 
     @field_serializer("image_url")
     def serialize_image_url(self, image_url: str, _info):
-        return f"https://{config('S3_BUCKET')}.s3.{config('AWS_REGION')}.amazonaws.com/{image_url}"
+        return media_url(image_url)
+
+    @field_serializer("manifest_url")
+    def serialize_manifest_url(self, manifest_url: Optional[str], _info):
+        return media_url(manifest_url) if manifest_url else None
 
 
 class VideoListSchema(VideoSchema):
@@ -123,3 +150,20 @@ class VideoResponse(BaseModel):
 class ListVideoResponse(BaseModel):
     Status: Status
     Videos: List[VideoListSchema]
+
+
+class TrendingVideoResponse(ListVideoResponse):
+    NextCursor: Optional[str] = None
+
+
+class UserVideoResponse(TrendingVideoResponse):
+    VideoCount: int
+
+
+class VoteCreate(BaseModel):
+    value: Literal[-1, 0, 1] = Field(..., description="1 to like, -1 to dislike, 0 to withdraw the vote")
+
+
+class ResumableUploadCreate(BaseModel):
+    filename: str = Field(..., description="Original file name, used for the extension", example="holiday.mov")
+    length: int = Field(..., description="Total size of the upload in bytes", gt=0)
@@ -0,0 +1,85 @@
+"""Production entry point: `python -m app.server`.
+
+Runs `WEB_CONCURRENCY` uvicorn worker processes (one by default) sharing one listening socket.
+uvicorn picks uvloop and httptools when they are installed. Websocket and event-stream
+notifications only reach the clients of the worker that published them, so keep one worker
+while clients rely on them. With several workers, Prometheus metrics are collected across all
+of them through `PROMETHEUS_MULTIPROC_DIR`.
+
+On SIGTERM/SIGINT every worker stops accepting connections, tells its websocket clients to
+reconnect (close code 1012), then waits up to `GRACEFUL_SHUTDOWN_TIMEOUT` seconds for in-flight
+requests such as uploads before running the application shutdown.
+"""
+import argparse
+import glob
+import os
+import tempfile
+from typing import List, Optional
+
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+
+from app.config import settings
+
+
+class DrainingServer(uvicorn.Server):
+    async def shutdown(self, sockets=None):
+        from app.api.websockets import websocketsManager
+
+        # Websockets never finish on their own; release them before uvicorn waits for connections to close.
+        await websocketsManager.drain()
+        await super().shutdown(sockets=sockets)
+
+
+def build_config(
+        host: Optional[str] = None, port: Optional[int] = None, workers: Optional[int] = None
+) -> uvicorn.Config:
+    return uvicorn.Config(
+        "app.main:app",
+        host=host or settings.HOST,
+        port=port or settings.PORT,
+        workers=workers or settings.WEB_CONCURRENCY,
+        loop="auto",
+        http="auto",
+        proxy_headers=True,
+        timeout_graceful_shutdown=settings.GRACEFUL_SHUTDOWN_TIMEOUT,
+    )
+
+
+def prepare_metrics_dir() -> str:
+    """The directory workers write their metrics to: `PROMETHEUS_MULTIPROC_DIR`, emptied, or a new one.
+
+    Exported before the workers start, since prometheus_client reads it when it is first imported.
+    """
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if not path:
+        path = os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="prometheus-")
+    # Samples left by a previous run would be added to this one's.
+    for stale in glob.glob(os.path.join(path, "*.db")):
+        os.remove(stale)
+    return path
+
+
+def run(config: uvicorn.Config):
+    server = DrainingServer(config)
+    if config.workers > 1:
+        if settings.METRICS_ENABLED:
+            prepare_metrics_dir()
+        sock = config.bind_socket()
+        Multiprocess(config, target=server.run, sockets=[sock]).run()
+    else:
+        server.run()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(prog="python -m app.server", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host")
+    parser.add_argument("--port", type=int)
+    parser.add_argument("--workers", type=int, help="Worker processes (default: WEB_CONCURRENCY or 1)")
+    args = parser.parse_args(argv)
+    run(build_config(args.host, args.port, args.workers))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import IO, Dict, Iterator, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from pydantic import ValidationError
+from sqlalchemy import Select, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app import models, schemas
+from app.auth import hash_password
+from app.config import settings
+from app.utils.ids import uuid7
+from app.utils.pools import get_process_pool
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+# Errors listed in an import report; the counts cover every row.
+MAX_REPORTED_ERRORS = 100
+
+
+def _plain(value):
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def serialize(rows: Sequence[Sequence], columns: Sequence[str], format: str) -> str:
+    if format == "csv":
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows([_plain(value) for value in row] for row in rows)
+        return buffer.getvalue()
+    return "".join(json.dumps(dict(zip(columns, map(_plain, row)))) + "\n" for row in rows)
+
+
+def export_rows(db: Session, statement: Select, columns: Sequence[str], format: str) -> Iterator[str]:
+    """Stream the rows of `statement` as NDJSON or CSV, one database batch per chunk.
+
+    Rows come from a server-side cursor `EXPORT_BATCH_SIZE` at a time and the statement selects
+    columns, not entities, so memory does not grow with the table. Closes `db` when done: the
+    response outlives the request's dependencies.
+    """
+    try:
+        if format == "csv":
+            yield serialize([columns], columns, format)
+        result = db.execute(statement.execution_options(yield_per=settings.EXPORT_BATCH_SIZE))
+        for rows in result.partitions():
+            yield serialize(rows, columns, format)
+    finally:
+        db.close()
+
+
+def read_records(file: IO[bytes], format: str) -> Iterator[Tuple[int, Optional[dict]]]:
+    """(line number, record) for each row of an NDJSON or CSV file; the record is None when it does not parse."""
+    text = io.TextIOWrapper(file, encoding="utf-8", newline="")
+    if format == "csv":
+        reader = csv.DictReader(text)
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for line_number, line in enumerate(text, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield line_number, record if isinstance(record, dict) else None
+
+
+def insert_users(db: Session, passwords: Dict[str, str]) -> int:
+    """Hash and insert one batch in one transaction, skipping emails already taken; returns the rows inserted."""
+    existing = set(db.scalars(select(models.User.email).where(models.User.email.in_(passwords))))
+    emails = [email for email in passwords if email not in existing]
+    if not emails:
+        return 0
+    pool = get_process_pool()
+    hashes = pool.map(hash_password, [passwords[email] for email in emails],
+                      chunksize=max(1, len(emails) // (settings.WORKER_PROCESSES * 4)))
+    rows = [{"id": uuid7(), "email": email, "password": hashed} for email, hashed in zip(emails, hashes)]
+    while rows:
+        try:
+            db.execute(insert(models.User), rows)
+            db.commit()
+            return len(rows)
+        except IntegrityError:
+            # Someone signed up with one of the emails meanwhile; drop those and retry the rest.
+            db.rollback()
+            taken = set(db.scalars(select(models.User.email).where(models.User.email.in_(
+                [row["email"] for row in rows]
+            ))))
+            if not taken:
+                raise
+            rows = [row for row in rows if row["email"] not in taken]
+    return 0
+
+
+def import_users(db: Session, file: IO[bytes], format: str) -> schemas.ImportResponse:
+    """Create users from `{"email", "password"}` records, `IMPORT_BATCH_SIZE` per transaction.
+
+    Passwords are hashed on the process pool. Existing emails are skipped, invalid rows reported.
+    """
+    imported = skipped = failed = 0
+    errors: List[schemas.ImportRowError] = []
+    batch: Dict[str, str] = {}
+    for line, record in read_records(file, format):
+        try:
+            user = schemas.UserCreateSchema.model_validate(record)
+        except ValidationError as e:
+            failed += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                error = e.errors()[0]
+                field = ".".join(str(part) for part in error["loc"])
+                message = f"{field}: {error['msg']}" if field else error["msg"]
+                errors.append(schemas.ImportRowError(line=line, error=message))
+            continue
+        if user.email in batch:
+            skipped += 1
+            continue
+        batch[user.email] = user.password
+        if len(batch) >= settings.IMPORT_BATCH_SIZE:
+            inserted = insert_users(db, batch)
+            imported, skipped = imported + inserted, skipped + len(batch) - inserted
+            batch = {}
+    if batch:
+        inserted = insert_users(db, batch)
+        imported, skipped = imported + inserted, skipped + len(batch) - inserted
+    return schemas.ImportResponse(
+        Status=schemas.Status.Success, Imported=imported, Skipped=skipped, Failed=failed, Errors=errors
+    )
@@ -0,0 +1,123 @@
+import json
+import os
+import shutil
+import subprocess
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+MASTER_PLAYLIST = "master.m3u8"
+# mimetypes guesses a Qt translation file for .ts on many systems.
+CONTENT_TYPES = {".m3u8": "application/vnd.apple.mpegurl", ".ts": "video/mp2t"}
+AUDIO_BITRATE_KBPS = 128
+
+
+class Rendition(NamedTuple):
+    height: int
+    video_kbps: int
+
+    @property
+    def name(self) -> str:
+        return f"{self.height}p"
+
+    @property
+    def bandwidth(self) -> int:
+        """Peak bits per second, as HLS players expect in BANDWIDTH."""
+        return (self.video_kbps + AUDIO_BITRATE_KBPS) * 1000 * 11 // 10
+
+
+def parse_renditions(specs: Iterable[str]) -> List[Rendition]:
+    """`["360:800", "720:2800"]` -> 360p at 800 kb/s and 720p at 2800 kb/s, lowest first."""
+    renditions = []
+    for spec in specs:
+        height, _, kbps = spec.partition(":")
+        renditions.append(Rendition(int(height), int(kbps)))
+    return sorted(set(renditions))
+
+
+def probe_size(source: str, timeout: int = 60) -> Optional[Tuple[int, int]]:
+    """Width and height of the first video stream, or None when ffprobe is unavailable or fails."""
+    ffprobe = shutil.which("ffprobe")
+    if ffprobe is None:
+        return None
+    result = subprocess.run(
+        [ffprobe, "-v", "error", "-select_streams", "v:0", "-show_entries", "stream=width,height",
+         "-of", "json", source],
+        capture_output=True, timeout=timeout, check=False, text=True,
+    )
+    try:
+        stream = json.loads(result.stdout)["streams"][0]
+        return int(stream["width"]), int(stream["height"])
+    except (ValueError, KeyError, IndexError):
+        return None
+
+
+def select_renditions(renditions: List[Rendition], source_height: Optional[int]) -> List[Rendition]:
+    """Drop renditions taller than the source; upscaling only adds bytes. Keeps at least the smallest."""
+    if source_height is None:
+        return renditions
+    return [rendition for rendition in renditions if rendition.height <= source_height] or renditions[:1]
+
+
+def ffmpeg_command(
+        ffmpeg: str, source: str, rendition: Rendition, output_dir: str, segment_seconds: int
+) -> List[str]:
+    playlist_dir = os.path.join(output_dir, rendition.name)
+    return [
+        ffmpeg, "-nostdin", "-loglevel", "error", "-y", "-i", source,
+        "-map", "0:v:0", "-map", "0:a:0?",
+        "-vf", f"scale=-2:{rendition.height}",
+        "-c:v", "libx264", "-preset", "veryfast", "-profile:v", "main",
+        "-b:v", f"{rendition.video_kbps}k", "-maxrate", f"{rendition.video_kbps * 11 // 10}k",
+        "-bufsize", f"{rendition.video_kbps * 2}k",
+        # Keyframes on segment boundaries, so every segment starts playable and renditions can switch.
+        "-force_key_frames", f"expr:gte(t,n_forced*{segment_seconds})", "-sc_threshold", "0",
+        "-c:a", "aac", "-b:a", f"{AUDIO_BITRATE_KBPS}k", "-ac", "2",
+        "-f", "hls", "-hls_time", str(segment_seconds), "-hls_playlist_type", "vod",
+        "-hls_segment_filename", os.path.join(playlist_dir, "segment_%05d.ts"),
+        os.path.join(playlist_dir, "index.m3u8"),
+    ]
+
+
+def master_playlist(renditions: List[Rendition], widths: Dict[Rendition, int]) -> str:
+    lines = ["#EXTM3U", "#EXT-X-VERSION:3"]
+    for rendition in renditions:
+        resolution = f",RESOLUTION={widths[rendition]}x{rendition.height}" if rendition in widths else ""
+        lines.append(f"#EXT-X-STREAM-INF:BANDWIDTH={rendition.bandwidth}{resolution}")
+        lines.append(f"{rendition.name}/index.m3u8")
+    return "\n".join(lines) + "\n"
+
+
+def transcode_hls(source: str, output_dir: str, renditions: List[Rendition], segment_seconds: int = 4,
+                  timeout: int = 3600) -> List[str]:
+    """Transcode `source` (a path or URL) into HLS renditions under `output_dir`, plus a master playlist.
+
+    Runs in the process pool; returns the written files relative to `output_dir`, master playlist last.
+    Raises RuntimeError when ffmpeg is unavailable or fails.
+    """
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        raise RuntimeError("ffmpeg is not installed")
+    source_size = probe_size(source)
+    renditions = select_renditions(renditions, source_size[1] if source_size else None)
+    widths = {}
+    for rendition in renditions:
+        os.makedirs(os.path.join(output_dir, rendition.name), exist_ok=True)
+        result = subprocess.run(
+            ffmpeg_command(ffmpeg, source, rendition, output_dir, segment_seconds),
+            capture_output=True, timeout=timeout, check=False, text=True,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed for {rendition.name}: {result.stderr.strip()[-500:]}")
+        size = probe_size(os.path.join(output_dir, rendition.name, "segment_00000.ts"))
+        if size:
+            widths[rendition] = size[0]
+
+    with open(os.path.join(output_dir, MASTER_PLAYLIST), "w") as master:
+        master.write(master_playlist(renditions, widths))
+
+    files = []
+    for rendition in renditions:
+        files += sorted(
+            os.path.join(rendition.name, name) for name in os.listdir(os.path.join(output_dir, rendition.name))
+        )
+    return files + [MASTER_PLAYLIST]
+
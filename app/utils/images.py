@@ -0,0 +1,43 @@
+import io
+import shutil
+import subprocess
+from typing import Dict, Iterable, Optional
+
+from PIL import Image, ImageOps
+
+
+def render_thumbnails(data: bytes, widths: Iterable[int], quality: int = 80) -> Dict[int, bytes]:
+    """Resize an image to each width (never upscaling) and re-encode it as WebP.
+
+    Runs in the process pool, so it only depends on Pillow.
+    """
+    with Image.open(io.BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source)
+        image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+
+    variants = {}
+    for width in sorted(set(widths)):
+        target_width = min(width, image.width)
+        target_height = max(1, round(image.height * target_width / image.width))
+        resized = image.resize((target_width, target_height), Image.LANCZOS)
+        output = io.BytesIO()
+        resized.save(output, format="WEBP", quality=quality, method=4)
+        variants[width] = output.getvalue()
+    return variants
+
+
+def extract_video_frame(source: str, at_seconds: float = 1.0, timeout: int = 60) -> Optional[bytes]:
+    """Grab a single PNG frame from a video file or URL with ffmpeg; None when ffmpeg is unavailable."""
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        return None
+    result = subprocess.run(
+        [
+            ffmpeg, "-nostdin", "-loglevel", "error", "-ss", str(at_seconds), "-i", source,
+            "-frames:v", "1", "-f", "image2pipe", "-vcodec", "png", "pipe:1",
+        ],
+        capture_output=True, timeout=timeout, check=False,
+    )
+    if result.returncode != 0 or not result.stdout:
+        return None
+    return result.stdout
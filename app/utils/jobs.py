@@ -0,0 +1,336 @@
+import logging
+import pickle
+import queue
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from app.config import settings
+from app.utils.metrics import observe_job, observe_queue_depth
+from app.utils.pools import get_process_pool
+
+logger = logging.getLogger(__name__)
+
+
+# Lane of every job registered without one; other lanes get their own threads (`JobRunner(lanes=...)`).
+DEFAULT_LANE = "default"
+
+
+class Job(NamedTuple):
+    func: Callable
+    # None uses JOB_MAX_ATTEMPTS.
+    max_attempts: Optional[int]
+    # Run `func` itself on the process pool; it and its arguments must be picklable.
+    process: bool
+    # Written to the job store when there is one; off for jobs that only make sense in this process.
+    persist: bool
+    # Jobs in a lane of their own cannot hold up the rest, however long they take.
+    lane: str
+
+
+JOBS: Dict[str, Job] = {}
+
+
+def register(
+    name: str, func: Callable, max_attempts: Optional[int] = None, process: bool = False, persist: bool = True,
+    lane: str = DEFAULT_LANE,
+) -> Callable:
+    """Make `func` runnable as job `name`. Names, not functions, are queued and persisted."""
+    JOBS[name] = Job(func, max_attempts, process, persist, lane)
+    return func
+
+
+class QueuedJob(NamedTuple):
+    id: str
+    name: str
+    args: Tuple
+    attempt: int
+    # time.monotonic() at which the job became due, for the wait metric.
+    due: float
+
+
+class JobStore:
+    """Unfinished jobs in a SQLite file, so a restart runs them again.
+
+    Several worker processes can share the file. Each row is leased to the process that queued or
+    claimed it, which renews its leases while it runs; only rows whose lease expired (their owner
+    crashed or stopped) are claimed by another process, so no job is run by two at once.
+    """
+
+    def __init__(self, path: str):
+        self.owner = uuid.uuid4().hex
+        self.lease_seconds = settings.JOB_LEASE_SECONDS
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.lock = threading.Lock()
+        with self.lock:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, name TEXT NOT NULL, args BLOB NOT NULL, "
+                "attempt INTEGER NOT NULL, owner TEXT, lease_until REAL NOT NULL DEFAULT 0)"
+            )
+            columns = {row[1] for row in self.connection.execute("PRAGMA table_info(jobs)")}
+            if "owner" not in columns:
+                # Written before leases existed: its rows are free to claim.
+                self.connection.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+                self.connection.execute("ALTER TABLE jobs ADD COLUMN lease_until REAL NOT NULL DEFAULT 0")
+
+    def save(self, job: QueuedJob):
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO jobs (id, name, args, attempt, owner, lease_until) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (job.id, job.name, pickle.dumps(job.args), job.attempt, self.owner,
+                 time.time() + self.lease_seconds),
+            )
+
+    def remove(self, job_id: str):
+        with self.lock:
+            self.connection.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def claim_expired(self) -> List[QueuedJob]:
+        """Take over the rows whose lease expired, oldest first.
+
+        The write lock is taken before reading, so two processes can never claim the same row.
+        """
+        now = time.time()
+        expired = "lease_until < ? AND owner IS NOT ?"
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self.connection.execute(
+                    f"SELECT id, name, args, attempt FROM jobs WHERE {expired} ORDER BY rowid", (now, self.owner)
+                ).fetchall()
+                self.connection.execute(
+                    f"UPDATE jobs SET owner = ?, lease_until = ? WHERE {expired}",
+                    (self.owner, now + self.lease_seconds, now, self.owner),
+                )
+                self.connection.execute("COMMIT")
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+        started = time.monotonic()
+        return [QueuedJob(job_id, name, pickle.loads(args), attempt, started) for job_id, name, args, attempt in rows]
+
+    def renew(self):
+        with self.lock:
+            self.connection.execute(
+                "UPDATE jobs SET lease_until = ? WHERE owner = ?", (time.time() + self.lease_seconds, self.owner)
+            )
+
+    def release(self, job_ids: List[str]):
+        """Give up these jobs, so the next claim takes them, this process's own included."""
+        with self.lock:
+            self.connection.executemany(
+                "UPDATE jobs SET owner = NULL, lease_until = 0 WHERE id = ? AND owner = ?",
+                [(job_id, self.owner) for job_id in job_ids],
+            )
+
+    def pending(self) -> List[QueuedJob]:
+        """Every unfinished job, whoever holds it."""
+        with self.lock:
+            rows = self.connection.execute("SELECT id, name, args, attempt FROM jobs ORDER BY rowid").fetchall()
+        now = time.monotonic()
+        return [QueuedJob(job_id, name, pickle.loads(args), attempt, now) for job_id, name, args, attempt in rows]
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+class JobRunner:
+    """Post-commit work off the request path: bounded queues drained by worker threads.
+
+    `workers` threads serve the default lane and `lanes` maps other lanes to their thread counts.
+    A job that raises is retried with jittered exponential backoff, up to its attempt limit. With a
+    `store`, queued and retrying jobs are written to disk and picked up again after a restart, or by
+    another process once this one stops renewing their leases.
+    """
+
+    def __init__(
+            self, workers: int, queue_size: int, store: Optional[JobStore] = None,
+            lanes: Optional[Dict[str, int]] = None,
+    ):
+        self.lanes = {DEFAULT_LANE: workers, **(lanes or {})}
+        self.queues: Dict[str, "queue.Queue[Optional[QueuedJob]]"] = {
+            lane: queue.Queue(queue_size) for lane in self.lanes
+        }
+        self.store = store
+        self.closed = False
+        self._timers: Dict[str, threading.Timer] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=sum(self.lanes.values()), thread_name_prefix="jobs")
+        for lane, count in self.lanes.items():
+            for _ in range(count):
+                self._executor.submit(self._work, self.queues[lane])
+        if store is not None:
+            self._recover()
+            self._heartbeat = threading.Thread(target=self._renew_leases, name="jobs-lease", daemon=True)
+            self._heartbeat.start()
+
+    def enqueue(self, name: str, *args) -> bool:
+        """Queue job `name`; False when its lane's queue is full and the job was dropped."""
+        if name not in JOBS:
+            raise KeyError(f"Unknown job: {name}")
+        job = QueuedJob(uuid.uuid4().hex, name, args, 1, time.monotonic())
+        self._save(job)
+        return self._put(job)
+
+    def _save(self, job: QueuedJob):
+        if self.store is not None and JOBS[job.name].persist:
+            self.store.save(job)
+
+    def _queue(self, job: QueuedJob) -> "queue.Queue[Optional[QueuedJob]]":
+        spec = JOBS.get(job.name)
+        return self.queues.get(spec.lane if spec else DEFAULT_LANE, self.queues[DEFAULT_LANE])
+
+    def _put(self, job: QueuedJob) -> bool:
+        try:
+            self._queue(job).put_nowait(job)
+            observe_queue_depth(self.depth())
+            return True
+        except queue.Full:
+            logger.warning("Job queue full, dropping %s job", job.name)
+            observe_job(job.name, "dropped")
+            if self.store is not None:
+                # A persisted job stays in the store, unowned: the next lease check, here or in another process, queues it again.
+                self.store.release([job.id])
+            return False
+
+    def _recover(self):
+        for job in self.store.claim_expired():
+            self._put(job)
+
+    def _renew_leases(self):
+        # Renewed well before they expire; the same tick picks up jobs a stopped process left behind.
+        while not self._stopped.wait(self.store.lease_seconds / 3):
+            try:
+                self.store.renew()
+                self._recover()
+            except Exception:
+                logger.exception("Could not renew job leases")
+
+    def _work(self, jobs_queue: "queue.Queue[Optional[QueuedJob]]"):
+        while not self.closed:
+            job = jobs_queue.get()
+            if job is None:
+                return
+            observe_queue_depth(self.depth())
+            self._run(job)
+
+    def _run(self, job: QueuedJob):
+        spec = JOBS.get(job.name)
+        if spec is None:
+            logger.error("Dropping job %s: no such job is registered", job.name)
+            self._finish(job)
+            return
+        start = time.monotonic()
+        try:
+            if spec.process:
+                get_process_pool().submit(spec.func, *job.args).result()
+            else:
+                spec.func(*job.args)
+        except Exception:
+            duration = time.monotonic() - start
+            if job.attempt >= (spec.max_attempts or settings.JOB_MAX_ATTEMPTS):
+                logger.exception("Job %s failed after %d attempts", job.name, job.attempt)
+                observe_job(job.name, "failed", start - job.due, duration)
+                self._finish(job)
+                return
+            delay = settings.JOB_RETRY_BACKOFF_SECONDS * 2 ** (job.attempt - 1) * random.uniform(0.5, 1.5)
+            logger.warning("Job %s failed, retrying in %.1fs", job.name, delay, exc_info=True)
+            observe_job(job.name, "retried", start - job.due, duration)
+            self._retry(job._replace(attempt=job.attempt + 1, due=time.monotonic() + delay), delay)
+            return
+        observe_job(job.name, "succeeded", start - job.due, time.monotonic() - start)
+        self._finish(job)
+
+    def _retry(self, job: QueuedJob, delay: float):
+        self._save(job)
+
+        def fire():
+            with self._lock:
+                self._timers.pop(job.id, None)
+            if not self.closed:
+                self._put(job)
+
+        timer = threading.Timer(delay, fire)
+        timer.daemon = True
+        with self._lock:
+            self._timers[job.id] = timer
+        timer.start()
+
+    def _finish(self, job: QueuedJob):
+        if self.store is not None:
+            self.store.remove(job.id)
+
+    def depth(self) -> int:
+        return sum(jobs_queue.qsize() for jobs_queue in self.queues.values())
+
+    def shutdown(self, wait: bool = True):
+        """Stop the workers. With `wait`, jobs already queued run first. Pending retries, and without
+        `wait` queued jobs, are dropped; a store releases them for the next process to claim.
+        """
+        self._stopped.set()
+        if self.store is not None:
+            self._heartbeat.join()
+        with self._lock:
+            timers, self._timers = self._timers, {}
+        for timer in timers.values():
+            timer.cancel()
+        released = list(timers)
+        if not wait:
+            self.closed = True
+            for jobs_queue in self.queues.values():
+                while True:
+                    try:
+                        job = jobs_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if job is not None:
+                        released.append(job.id)
+        if self.store is not None and released:
+            self.store.release(released)
+        for lane, count in self.lanes.items():
+            for _ in range(count):
+                try:
+                    self.queues[lane].put(None, block=wait)
+                except queue.Full:
+                    # Every worker is busy and will see `closed` after its current job.
+                    break
+        self._executor.shutdown(wait=wait)
+        self.closed = True
+        if self.store is not None and wait:
+            self.store.close()
+
+
+_runner: Optional[JobRunner] = None
+_runner_lock = threading.Lock()
+
+
+def get_job_runner() -> JobRunner:
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            store = JobStore(settings.JOB_STORE_PATH) if settings.JOB_STORE_PATH else None
+            # Transcodes hold a thread for a whole encode, so they get threads of their own.
+            lanes = {"transcode": settings.TRANSCODE_CONCURRENCY}
+            _runner = JobRunner(settings.WORKER_THREADS, settings.JOB_QUEUE_SIZE, store, lanes)
+        return _runner
+
+
+def enqueue(name: str, *args) -> bool:
+    """Queue job `name` on the shared runner."""
+    return get_job_runner().enqueue(name, *args)
+
+
+def shutdown_jobs(wait: bool = True):
+    global _runner
+    with _runner_lock:
+        if _runner is not None:
+            _runner.shutdown(wait=wait)
+            _runner = None
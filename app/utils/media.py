@@ -0,0 +1,184 @@
+import asyncio
+import functools
+import hashlib
+import mimetypes
+import os
+import re
+import uuid
+from typing import Dict, Optional, Tuple
+
+import anyio
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from app.config import settings
+from app.utils import hls
+from app.utils.storage import AsyncStorage, get_async_storage
+
+RANGE_PATTERN = re.compile(r"bytes=(\d*)-(\d*)$")
+
+
+def content_type(key: str) -> str:
+    extension = os.path.splitext(key)[1].lower()
+    return hls.CONTENT_TYPES.get(extension) or mimetypes.guess_type(key)[0] or "application/octet-stream"
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """The first and last byte a `Range` header asks for, or None to send the whole object.
+
+    Malformed and multi-range headers are ignored, as RFC 9110 allows. Raises ValueError when the
+    range starts past the end of the object.
+    """
+    match = RANGE_PATTERN.match(header.strip()) if header else None
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if not first:
+        # "bytes=-500": the last 500 bytes.
+        if int(last) == 0 or size == 0:
+            raise ValueError(header)
+        return max(size - int(last), 0), size - 1
+    start = int(first)
+    if start >= size:
+        raise ValueError(header)
+    end = min(int(last), size - 1) if last else size - 1
+    return (start, end) if end >= start else None
+
+
+class MediaCache:
+    """Storage objects kept on local disk up to about `max_bytes`, evicting the least recently used first.
+
+    Every worker on a host can share the directory: recency is each file's mtime, bumped on every
+    hit, and eviction rescans the directory. Concurrent misses for a key within a worker share one
+    download.
+    """
+
+    def __init__(self, root: str, max_bytes: int, storage: Optional[AsyncStorage] = None):
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        self._storage = storage
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # Bytes on disk as far as this worker knows; rescanned whenever it crosses max_bytes.
+        self._used: Optional[int] = None
+
+    @property
+    def storage(self) -> AsyncStorage:
+        return self._storage or get_async_storage()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, hashlib.sha256(key.encode()).hexdigest())
+
+    async def open(self, key: str):
+        """An open file with the object's bytes, downloaded first on a miss. Raises ObjectNotFound."""
+        path = self.path(key)
+        try:
+            return await anyio.to_thread.run_sync(self._open, path)
+        except FileNotFoundError:
+            await self._download(key)
+        return await anyio.to_thread.run_sync(self._open, path)
+
+    @staticmethod
+    def _open(path: str):
+        file = open(path, "rb")
+        os.utime(path)
+        return file
+
+    async def _download(self, key: str):
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._fetch(key))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # A client that disconnects must not cancel the download other requests are waiting for.
+        await asyncio.shield(future)
+
+    async def _fetch(self, key: str):
+        os.makedirs(self.root, exist_ok=True)
+        path = self.path(key)
+        # Download then rename, so readers never open a partial object.
+        partial = f"{path}.{uuid.uuid4().hex}.partial"
+        try:
+            with open(partial, "wb") as target:
+                await self.storage.download_fileobj(key, target)
+            os.replace(partial, path)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+        await anyio.to_thread.run_sync(self._admit, path)
+
+    def _admit(self, path: str):
+        if self._used is None:
+            self._used = self._evict(keep=path)
+        else:
+            self._used += os.path.getsize(path)
+        if self._used > self.max_bytes:
+            self._used = self._evict(keep=path)
+
+    def _evict(self, keep: str) -> int:
+        """Remove the least recently used files until the cache fits; returns the bytes left."""
+        entries = []
+        with os.scandir(self.root) as scan:
+            for entry in scan:
+                if entry.is_file() and not entry.name.endswith(".partial"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        used = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if used <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            used -= size
+        return used
+
+
+@functools.lru_cache(maxsize=None)
+def get_media_cache() -> MediaCache:
+    return MediaCache(settings.MEDIA_CACHE_DIR, settings.MEDIA_CACHE_MAX_BYTES)
+
+
+class MediaResponse(Response):
+    """Sends `length` bytes of an open file from `offset`, then closes it.
+
+    Uses the ASGI zero-copy send extension (sendfile) when the server offers it, and reads the file
+    in chunks on a worker thread otherwise. uvicorn, which app.server runs, never offers it, so
+    under the shipped server every response takes the chunked path.
+    """
+
+    chunk_size = 256 * 1024
+
+    def __init__(self, file, offset: int, length: int, status_code: int = 200,
+                 headers: Optional[Dict[str, str]] = None, media_type: Optional[str] = None):
+        self.file = file
+        self.offset = offset
+        self.length = length
+        self.status_code = status_code
+        self.media_type = media_type
+        self.background = None
+        self.init_headers({**(headers or {}), "content-length": str(length)})
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+            if scope["method"].upper() == "HEAD" or not self.length:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+            elif "http.response.zerocopysend" in scope.get("extensions", {}):
+                await send({
+                    "type": "http.response.zerocopysend", "file": self.file,
+                    "offset": self.offset, "count": self.length, "more_body": False,
+                })
+            else:
+                await anyio.to_thread.run_sync(self.file.seek, self.offset)
+                remaining = self.length
+                while remaining:
+                    chunk = await anyio.to_thread.run_sync(self.file.read, min(self.chunk_size, remaining))
+                    if not chunk:
+                        raise RuntimeError(f"{self.file.name} is shorter than expected")
+                    remaining -= len(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        finally:
+            self.file.close()
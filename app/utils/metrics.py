@@ -0,0 +1,200 @@
+import os
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi import FastAPI, Response
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, \
+    multiprocess
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.config import settings
+
+registry = CollectorRegistry(auto_describe=True)
+# Set for every worker by `app.server` when it runs more than one: each process writes its samples to
+# files there and `/metrics` adds them up, so a scrape sees the whole server rather than one worker.
+MULTIPROCESS = bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route",
+    ["method", "route", "status"], registry=registry,
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "HTTP requests currently being served",
+    ["method"], multiprocess_mode="livesum", registry=registry,
+)
+REQUEST_SQL_STATEMENTS = Histogram(
+    "http_request_sql_statements", "SQL statements executed per request",
+    ["route"], buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100), registry=registry,
+)
+REQUEST_SQL_DURATION = Histogram(
+    "http_request_sql_duration_seconds", "Time spent in SQL per request",
+    ["route"], registry=registry,
+)
+S3_UPLOAD_BYTES = Counter(
+    "s3_upload_bytes_total", "Bytes uploaded to S3", ["folder"], registry=registry,
+)
+S3_UPLOAD_DURATION = Histogram(
+    "s3_upload_duration_seconds", "S3 upload duration", ["folder"], registry=registry,
+)
+UPLOAD_DEDUP_HITS = Counter(
+    "upload_dedup_hits_total", "Uploads answered from the content-hash index", ["folder"], registry=registry,
+)
+REQUESTS_REJECTED = Counter(
+    "http_requests_rejected_total", "Requests shed by rate or concurrency limits",
+    ["scope", "reason"], registry=registry,
+)
+JOBS_FINISHED = Counter(
+    "jobs_total", "Background job runs by outcome: succeeded, retried, failed or dropped",
+    ["name", "status"], registry=registry,
+)
+JOB_WAIT = Histogram(
+    "job_wait_seconds", "Time a background job spent queued before it started", ["name"], registry=registry,
+)
+JOB_DURATION = Histogram(
+    "job_duration_seconds", "Background job run time", ["name"], registry=registry,
+)
+JOB_QUEUE_DEPTH = Gauge(
+    "job_queue_depth", "Background jobs waiting for a worker", multiprocess_mode="livesum", registry=registry,
+)
+WEBSOCKET_CONNECTIONS = Gauge(
+    "websocket_active_connections", "Open websocket connections", multiprocess_mode="livesum", registry=registry,
+)
+
+
+class RequestStats:
+    __slots__ = ("sql_statements", "sql_duration")
+
+    def __init__(self):
+        self.sql_statements = 0
+        self.sql_duration = 0.0
+
+
+# Shared with the threadpool that runs sync endpoints, so SQL executed there is
+# attributed to the request that started it.
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def _route_label(scope) -> str:
+    route = scope.get("route")
+    return route.path if route is not None else "unmatched"
+
+
+class PrometheusMiddleware:
+    """Pure ASGI middleware recording latency, in-flight requests and SQL usage per route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        in_progress = REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            in_progress.dec()
+            _request_stats.reset(token)
+            route = _route_label(scope)
+            REQUEST_LATENCY.labels(method, route, str(status_code)).observe(elapsed)
+            REQUEST_SQL_STATEMENTS.labels(route).observe(stats.sql_statements)
+            REQUEST_SQL_DURATION.labels(route).observe(stats.sql_duration)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = conn.info["metrics_query_start"].pop()
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.sql_statements += 1
+        stats.sql_duration += time.perf_counter() - start
+
+
+def instrument_engine(engine: Engine):
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def observe_s3_upload(folder: str, size: Optional[int], seconds: float):
+    if not settings.METRICS_ENABLED:
+        return
+    S3_UPLOAD_DURATION.labels(folder).observe(seconds)
+    if size:
+        S3_UPLOAD_BYTES.labels(folder).inc(size)
+
+
+def observe_upload_dedup(folder: str):
+    if settings.METRICS_ENABLED:
+        UPLOAD_DEDUP_HITS.labels(folder).inc()
+
+
+def observe_rejection(scope: str, reason: str):
+    if settings.METRICS_ENABLED:
+        REQUESTS_REJECTED.labels(scope, reason).inc()
+
+
+def observe_job(name: str, status: str, wait: Optional[float] = None, duration: Optional[float] = None):
+    if settings.METRICS_ENABLED:
+        JOBS_FINISHED.labels(name, status).inc()
+        if wait is not None:
+            JOB_WAIT.labels(name).observe(max(wait, 0.0))
+        if duration is not None:
+            JOB_DURATION.labels(name).observe(duration)
+
+
+def observe_connections(count: int):
+    if settings.METRICS_ENABLED:
+        WEBSOCKET_CONNECTIONS.set(count)
+
+
+def observe_queue_depth(depth: int):
+    if settings.METRICS_ENABLED:
+        JOB_QUEUE_DEPTH.set(depth)
+
+
+def mark_worker_stopped():
+    """Drop this worker's live gauges from the totals; its counters and histograms are kept."""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+def metrics_endpoint():
+    if MULTIPROCESS:
+        collected = CollectorRegistry()
+        multiprocess.MultiProcessCollector(collected)
+        return Response(generate_latest(collected), media_type=CONTENT_TYPE_LATEST)
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+
+def setup_metrics(app: FastAPI, engine: Optional[Engine] = None):
+    """Install the middleware and the `/metrics` endpoint.
+
+    Only called when METRICS_ENABLED is set, so a disabled deployment pays nothing beyond the
+    flag check in `observe_s3_upload`. The application engine is instrumented by `get_engine()`
+    when it is first built; pass `engine` to instrument another one.
+    """
+    if engine is not None:
+        instrument_engine(engine)
+    app.add_middleware(PrometheusMiddleware)
+    app.add_api_route("/metrics", metrics_endpoint, methods=["GET"], include_in_schema=False)
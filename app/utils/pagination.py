@@ -0,0 +1,47 @@
+import base64
+import binascii
+import json
+import uuid
+from datetime import datetime
+from typing import Callable, Sequence
+
+from fastapi import HTTPException, status
+
+
+def encode_cursor(*values) -> str:
+    """Opaque keyset cursor for the last row of a page, e.g. `encode_cursor(video.shared_at, video.id)`."""
+    raw = json.dumps([_dump(value) for value in values]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *types: Callable) -> Sequence:
+    """Inverse of `encode_cursor`; `types` parse each value back (`float`, `uuid.UUID`, `datetime`...).
+
+    Raises 400 for cursors that were not issued by `encode_cursor` with the same layout.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError(cursor)
+        return [_load(kind, value) for kind, value in zip(types, values)]
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def _dump(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return value.hex
+    return value
+
+
+def _load(kind, value):
+    # Only the JSON types `_dump` produces, so a well-formed cursor with a swapped layout is still rejected.
+    if kind in (datetime, uuid.UUID):
+        if not isinstance(value, str):
+            raise TypeError(value)
+        return datetime.fromisoformat(value) if kind is datetime else uuid.UUID(value)
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise TypeError(value)
+    return kind(value)
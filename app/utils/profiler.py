@@ -0,0 +1,168 @@
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import List, Optional
+
+from fastapi import FastAPI, HTTPException, status
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.config import settings
+
+logger = logging.getLogger("app.sql.slow")
+
+
+class QueryRecord:
+    __slots__ = ("statement", "parameters", "duration_ms", "plan")
+
+    def __init__(self, statement, parameters, duration_ms, plan=None):
+        self.statement = statement
+        self.parameters = parameters
+        self.duration_ms = duration_ms
+        self.plan = plan
+
+    def as_dict(self):
+        return {
+            "statement": self.statement,
+            "parameters": repr(self.parameters),
+            "duration_ms": round(self.duration_ms, 3),
+            "plan": self.plan,
+        }
+
+
+class RequestProfile:
+    def __init__(self, scope):
+        self.request_id = uuid.uuid4().hex
+        self.scope = scope
+        self.queries: List[QueryRecord] = []
+
+    @property
+    def route(self) -> str:
+        route = self.scope.get("route")
+        path = route.path if route is not None else self.scope.get("path", "-")
+        return f"{self.scope.get('method', '-')} {path}"
+
+    @property
+    def total_ms(self) -> float:
+        return sum(query.duration_ms for query in self.queries)
+
+    def as_dict(self):
+        return {
+            "request_id": self.request_id,
+            "route": self.route,
+            "query_count": len(self.queries),
+            "total_ms": round(self.total_ms, 3),
+            "queries": [query.as_dict() for query in self.queries],
+        }
+
+
+_current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("query_profile", default=None)
+
+# Most recent request profiles, served by the debug endpoint.
+_history: "OrderedDict[str, RequestProfile]" = OrderedDict()
+
+
+def _remember(profile: RequestProfile):
+    _history[profile.request_id] = profile
+    while len(_history) > settings.QUERY_PROFILER_HISTORY:
+        _history.popitem(last=False)
+
+
+def _explain(conn, statement, parameters) -> Optional[List[str]]:
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        prefix = "EXPLAIN QUERY PLAN "
+    elif dialect == "postgresql":
+        prefix = "EXPLAIN "
+    else:
+        return None
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return [" ".join(str(column) for column in row) for row in cursor.fetchall()]
+    except Exception as e:
+        return [f"EXPLAIN failed: {e}"]
+    finally:
+        cursor.close()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("profiler_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration_ms = (time.perf_counter() - conn.info["profiler_query_start"].pop()) * 1000
+    profile = _current_profile.get()
+    plan = None
+    if duration_ms >= settings.SLOW_QUERY_THRESHOLD_MS:
+        if settings.QUERY_PROFILER_EXPLAIN and not executemany and statement.lstrip().upper().startswith("SELECT"):
+            plan = _explain(conn, statement, parameters)
+        logger.warning(
+            "Slow query (%.1f ms) on %s: %s | params=%r | plan=%s",
+            duration_ms, profile.route if profile else "-", statement, parameters, plan,
+        )
+    if profile is not None:
+        profile.queries.append(QueryRecord(statement, parameters, duration_ms, plan))
+
+
+def instrument_engine(engine: Engine):
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class QueryProfilerMiddleware:
+    """Collect the queries of each HTTP request and summarise them in response headers."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope)
+        token = _current_profile.set(profile)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                total_ms = profile.total_ms
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-request-id", profile.request_id.encode()),
+                    (b"x-query-count", str(len(profile.queries)).encode()),
+                    (b"x-query-time-ms", f"{total_ms:.3f}".encode()),
+                    (b"server-timing", f"db;dur={total_ms:.3f}".encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_profile.reset(token)
+            _remember(profile)
+
+
+def get_query_profile(request_id: str):
+    profile = _history.get(request_id)
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No query profile for request: {request_id}",
+        )
+    return profile.as_dict()
+
+
+def setup_profiler(app: FastAPI, engine: Optional[Engine] = None):
+    """Install the query profiler. Only meant for debugging: profiles include bound parameters.
+
+    The application engine is instrumented by `get_engine()`; pass `engine` to instrument another one.
+    """
+    if engine is not None:
+        instrument_engine(engine)
+    app.add_middleware(QueryProfilerMiddleware)
+    app.add_api_route(
+        "/api/debug/queries/{request_id}", get_query_profile, methods=["GET"], include_in_schema=False
+    )
@@ -0,0 +1,188 @@
+import functools
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional, Tuple
+
+from fastapi import Depends, HTTPException, Request, status
+from sqlalchemy import case, update
+from sqlalchemy.exc import IntegrityError
+
+from app import models
+from app.auth import get_current_user
+from app.config import settings
+from app.database import SessionLocal
+from app.utils.metrics import observe_rejection
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+@functools.lru_cache(maxsize=None)
+def parse_rate(rate: str) -> Tuple[int, float]:
+    """`"10/minute"` -> bucket capacity 10, refilled at 10/60 tokens per second."""
+    count, _, period = rate.partition("/")
+    capacity = int(count)
+    if capacity < 1 or period.strip().lower() not in PERIODS:
+        raise ValueError(f"Invalid rate: {rate!r}")
+    return capacity, capacity / PERIODS[period.strip().lower()]
+
+
+class MemoryBackend:
+    """Token buckets in this worker's memory. Cheap, but each worker enforces the limit separately."""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, capacity: int, refill: float, now: Optional[float] = None) -> float:
+        """Take one token. Returns 0 when allowed, otherwise the seconds until a token is available."""
+        now = time.time() if now is None else now
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * refill)
+            retry_after = 0.0 if tokens >= 1 else (1 - tokens) / refill
+            if not retry_after:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            # Least recently used buckets go first; an evicted client simply starts with a full bucket.
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return retry_after
+
+
+class DatabaseBackend:
+    """Token buckets in the `rate_limit_buckets` table, shared by all workers and hosts.
+
+    Refill and take happen in a single conditional UPDATE, so concurrent workers cannot both
+    spend the last token.
+    """
+
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+
+    def hit(self, key: str, capacity: int, refill: float, now: Optional[float] = None) -> float:
+        now = time.time() if now is None else now
+        bucket = models.RateLimitBucket
+        refilled = bucket.tokens + (now - bucket.updated_at) * refill
+        available = case((refilled > capacity, capacity), else_=refilled)
+        db = self.session_factory()
+        try:
+            for _ in range(2):
+                taken = db.execute(
+                    update(bucket)
+                    .where(bucket.key == key, available >= 1)
+                    .values(tokens=available - 1, updated_at=now)
+                    .execution_options(synchronize_session=False)
+                ).rowcount
+                if taken:
+                    db.commit()
+                    return 0.0
+                row = db.get(bucket, key)
+                if row is not None:
+                    db.rollback()
+                    # Another worker may have written the bucket since the UPDATE; refused is refused.
+                    tokens = min(capacity, row.tokens + (now - row.updated_at) * refill)
+                    return max(1, math.ceil((1 - tokens) / refill))
+                db.add(bucket(key=key, tokens=capacity - 1, updated_at=now))
+                try:
+                    db.commit()
+                    return 0.0
+                except IntegrityError:
+                    # Another worker created the bucket first; take from it instead.
+                    db.rollback()
+            return 0.0
+        finally:
+            db.close()
+
+
+@functools.lru_cache(maxsize=None)
+def get_rate_limit_backend():
+    if settings.RATE_LIMIT_BACKEND == "memory":
+        return MemoryBackend(settings.RATE_LIMIT_MAX_KEYS)
+    if settings.RATE_LIMIT_BACKEND == "database":
+        return DatabaseBackend()
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {settings.RATE_LIMIT_BACKEND}")
+
+
+def client_ip(request: Request) -> str:
+    # Behind a proxy, app.server's proxy_headers puts the X-Forwarded-For client here.
+    return request.client.host if request.client else "unknown"
+
+
+def check_rate(scope: str, rate: str, *identities: str):
+    """Take a token from the `scope` bucket of every identity, or raise 429."""
+    if not settings.RATE_LIMIT_ENABLED:
+        return
+    capacity, refill = parse_rate(rate)
+    backend = get_rate_limit_backend()
+    for identity in identities:
+        retry_after = backend.hit(f"{scope}:{identity}", capacity, refill)
+        if retry_after:
+            observe_rejection(scope, "rate_limited")
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests, please retry later",
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+
+
+def rate_limit(scope: str, setting: str):
+    """Dependency limiting an endpoint per client IP. `setting` names the rate in `settings`."""
+
+    def dependency(request: Request):
+        check_rate(scope, getattr(settings, setting), f"ip:{client_ip(request)}")
+
+    return dependency
+
+
+def user_rate_limit(scope: str, setting: str):
+    """Dependency limiting an authenticated endpoint per client IP and per user."""
+
+    def dependency(request: Request, current_user: models.User = Depends(get_current_user)):
+        check_rate(scope, getattr(settings, setting), f"ip:{client_ip(request)}", f"user:{current_user.id}")
+
+    return dependency
+
+
+class ConcurrencyLimiter:
+    """Caps concurrent runs of an expensive section in this worker; callers beyond the cap get 503.
+
+    Shedding early keeps latency bounded for everyone else instead of queueing without limit.
+    """
+
+    def __init__(self, name: str, limit: int, timeout: float = 0.0):
+        self.name = name
+        self.timeout = timeout
+        self._semaphore = threading.BoundedSemaphore(limit)
+
+    @contextmanager
+    def slot(self):
+        if self.timeout > 0:
+            acquired = self._semaphore.acquire(timeout=self.timeout)
+        else:
+            acquired = self._semaphore.acquire(blocking=False)
+        if not acquired:
+            observe_rejection(self.name, "saturated")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please retry shortly",
+                headers={"Retry-After": "1"},
+            )
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+
+# bcrypt is deliberately slow; a few waiting callers are fine, an unbounded queue is not.
+bcrypt_limiter = ConcurrencyLimiter("bcrypt", settings.BCRYPT_CONCURRENCY, settings.BCRYPT_QUEUE_TIMEOUT)
+upload_limiter = ConcurrencyLimiter("upload", settings.UPLOAD_CONCURRENCY)
+
+
+def upload_slot():
+    """Dependency holding an upload slot for the duration of the request."""
+    with upload_limiter.slot():
+        yield
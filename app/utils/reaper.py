@@ -0,0 +1,157 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Set
+
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from app import models
+from app.config import settings
+from app.database import SessionLocal
+from app.utils import jobs
+from app.utils.storage import DELETE_BATCH_SIZE, get_storage
+from app.utils.transcoding import hls_prefix, is_transcodable
+
+logger = logging.getLogger(__name__)
+
+# Keys of objects the application stored; `video_url` and `image_url` may also point elsewhere.
+STORED_PREFIXES = ("videos/", "images/")
+
+
+def delete_keys(keys: Iterable[str]) -> List[str]:
+    """Delete `keys` from storage, DELETE_BATCH_SIZE per call; returns the keys that failed."""
+    keys = sorted(set(keys))
+    storage = get_storage()
+    failed = []
+    for start in range(0, len(keys), DELETE_BATCH_SIZE):
+        failed += storage.delete_objects(keys[start:start + DELETE_BATCH_SIZE])
+    return failed
+
+
+def orphaned_sources(db: Session, videos, seen_before: datetime) -> Set[str]:
+    """Stored keys `videos` reference that no other video, live or awaiting purge, still uses.
+
+    Uploads are content-addressed, so the same key can back several videos. An upload deduplicated
+    onto a key after `seen_before` may be shared again any moment, so such keys are left alone.
+    """
+    keys = {key for video in videos for key in (video.video_url, video.image_url) if key.startswith(STORED_PREFIXES)}
+    if not keys:
+        return set()
+    used = db.execute(
+        select(models.Video.video_url, models.Video.image_url)
+        .where(models.Video.id.not_in([video.id for video in videos]))
+        .where(or_(models.Video.video_url.in_(keys), models.Video.image_url.in_(keys)))
+    ).all()
+    seen = db.scalars(
+        select(models.Upload.key).where(models.Upload.key.in_(keys), models.Upload.last_seen_at > seen_before)
+    )
+    return keys - {key for row in used for key in row} - set(seen)
+
+
+def reap_videos(db: Session, now: Optional[datetime] = None) -> int:
+    """Purge videos deleted more than VIDEO_PURGE_DELAY_HOURS ago, `REAPER_BATCH_SIZE` per transaction.
+
+    The storage objects only they used (uploads, thumbnails, HLS renditions) are deleted first, then the
+    rows with their votes, thumbnails and upload index entries. When objects fail to delete, the batch
+    keeps its rows and the next run tries again. Objects an upload was deduplicated onto within the
+    same delay are kept. Returns the number of videos purged.
+    """
+    cutoff = (now or datetime.utcnow()) - timedelta(hours=settings.VIDEO_PURGE_DELAY_HOURS)
+    storage = get_storage()
+    purged = 0
+    while True:
+        videos = db.execute(
+            select(models.Video.id, models.Video.video_url, models.Video.image_url)
+            .where(models.Video.deleted_at.is_not(None), models.Video.deleted_at <= cutoff)
+            .order_by(models.Video.deleted_at)
+            .limit(settings.REAPER_BATCH_SIZE)
+        ).all()
+        if not videos:
+            return purged
+        sources = orphaned_sources(db, videos, cutoff)
+        keys = set(sources)
+        if sources:
+            keys.update(db.scalars(select(models.Thumbnail.key).where(models.Thumbnail.source_key.in_(sources))))
+        for source in sources:
+            if is_transcodable(source):
+                keys.update(storage.list_keys(f"{hls_prefix(source)}/"))
+        failed = delete_keys(keys)
+        if failed:
+            logger.error("Could not delete %d storage objects, e.g. %s; will retry", len(failed), failed[0])
+            return purged
+
+        ids = [video.id for video in videos]
+        db.query(models.Vote).filter(models.Vote.video_id.in_(ids)).delete(synchronize_session=False)
+        if sources:
+            thumbnails = db.query(models.Thumbnail).filter(models.Thumbnail.source_key.in_(sources))
+            thumbnails.delete(synchronize_session=False)
+            db.query(models.Upload).filter(models.Upload.key.in_(sources)).delete(synchronize_session=False)
+        db.query(models.Video).filter(models.Video.id.in_(ids)).delete(synchronize_session=False)
+        db.commit()
+        purged += len(ids)
+        if len(videos) < settings.REAPER_BATCH_SIZE:
+            return purged
+
+
+def run_reaper():
+    db = SessionLocal()
+    try:
+        purged = reap_videos(db)
+        if purged:
+            logger.info("Purged %d deleted videos", purged)
+    finally:
+        db.close()
+
+
+_last_scheduled: Optional[float] = None
+_lock = threading.Lock()
+_stopped = threading.Event()
+_timer: Optional[threading.Thread] = None
+
+
+def schedule_reaper():
+    """Queue a reaper run, unless one was queued in the last REAPER_INTERVAL_SECONDS."""
+    global _last_scheduled
+    if not settings.REAPER_ENABLED:
+        return
+    with _lock:
+        now = time.monotonic()
+        if _last_scheduled is not None and now - _last_scheduled < settings.REAPER_INTERVAL_SECONDS:
+            return
+        _last_scheduled = now
+    jobs.enqueue("reaper")
+
+
+def _tick():
+    global _last_scheduled
+    while not _stopped.wait(settings.REAPER_INTERVAL_SECONDS):
+        with _lock:
+            _last_scheduled = time.monotonic()
+        jobs.enqueue("reaper")
+
+
+def start_reaper():
+    """Queue a reaper run every REAPER_INTERVAL_SECONDS, so deleted videos are purged without waiting for
+    the next delete to schedule one.
+    """
+    global _timer
+    if not settings.REAPER_ENABLED or _timer is not None:
+        return
+    _stopped.clear()
+    _timer = threading.Thread(target=_tick, name="reaper", daemon=True)
+    _timer.start()
+
+
+def stop_reaper():
+    global _timer
+    if _timer is None:
+        return
+    _stopped.set()
+    _timer.join()
+    _timer = None
+
+
+# A failed run changes nothing the next one cannot redo.
+jobs.register("reaper", run_reaper, max_attempts=1, persist=False)
@@ -1,31 +1,114 @@
+import io
 import os
 import time
+from datetime import datetime
+from typing import Optional
 
-import boto3
-from botocore.exceptions import ClientError
 from fastapi import HTTPException
-from decouple import config
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
-# S3 configuration
-AWS_ACCESS_KEY_ID = config("AWS_ACCESS_KEY_ID")
-AWS_SECRET_ACCESS_KEY = config("AWS_SECRET_ACCESS_KEY")
-AWS_REGION = config("AWS_REGION")
-S3_BUCKET = config("S3_BUCKET")
+from app import models
+from app.utils.metrics import observe_s3_upload, observe_upload_dedup
+from app.utils.storage import StorageError, get_async_storage, get_storage
 
-s3_client = boto3.client(
-    's3',
-    aws_access_key_id=AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-    region_name=AWS_REGION
-)
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
 
 
-def upload_file_to_s3(file, folder):
+def seen_upload_key(db: Session, sha256: str) -> Optional[str]:
+    """Key of the stored upload with this digest, marked as just seen; None for new content."""
+    existing = db.get(models.Upload, sha256)
+    if existing is None:
+        return None
+    # Keeps the reaper off the key while the video about to share it is created.
+    existing.last_seen_at = datetime.utcnow()
+    db.commit()
+    return existing.key
+
+
+def record_upload(db: Session, sha256: str, key: str, size: int) -> str:
+    """Add a stored upload to the index; returns the key to use for its content."""
+    try:
+        db.add(models.Upload(sha256=sha256, key=key, size=size))
+        db.commit()
+    except IntegrityError:
+        # A concurrent upload of the same content won the race; keep its key.
+        db.rollback()
+        return db.get(models.Upload, sha256).key
+    return key
+
+
+async def upload_file_to_s3(file, folder, db: Session, sha256: str):
+    """Store an upload under a content-addressed key: `{folder}/{sha256}{ext}`.
+
+    `sha256` is the digest computed while the upload streamed in. Content already in the upload
+    index is not sent to storage again; the existing key is returned and marked as just seen.
+    The index is queried in the threadpool, like storage, so the event loop never waits on it.
+    """
+    _, file_extension = os.path.splitext(file.filename)
+    size = file.size
+    existing = await run_in_threadpool(seen_upload_key, db, sha256)
+    if existing:
+        observe_upload_dedup(folder)
+        return existing
+
+    file_name = f"{folder}/{sha256}{file_extension.lower()}"
     try:
-        filename, file_extension = os.path.splitext(file.filename)
-        time_random = str(int(time.time()))
-        file_name = f"{folder}/{filename}_{time_random}{file_extension}"
-        s3_client.upload_fileobj(file.file, S3_BUCKET, file_name)
-        return file_name
-    except ClientError as e:
+        start = time.perf_counter()
+        await get_async_storage().upload_fileobj(file.file, file_name, file.content_type)
+        observe_s3_upload(folder, size, time.perf_counter() - start)
+    except StorageError as e:
         raise HTTPException(status_code=500, detail=f"S3 upload failed: {str(e)}")
+
+    return await run_in_threadpool(record_upload, db, sha256, file_name, size)
+
+
+def upload_bytes_to_s3(data: bytes, key: str, content_type: str):
+    """Blocking upload, for background workers."""
+    start = time.perf_counter()
+    get_storage().put_bytes(data, key, content_type, IMMUTABLE_CACHE_CONTROL)
+    observe_s3_upload(key.split("/", 1)[0], len(data), time.perf_counter() - start)
+    return key
+
+
+def download_bytes(key: str) -> bytes:
+    """Blocking download, for background workers."""
+    buffer = io.BytesIO()
+    get_storage().download_fileobj(key, buffer)
+    return buffer.getvalue()
+
+
+def presigned_get_url(key: str, expires_in: int = 600) -> str:
+    return get_storage().source_url(key, expires_in)
+
+
+def create_multipart_upload(key: str) -> str:
+    try:
+        return get_storage().create_multipart_upload(key)
+    except StorageError as e:
+        raise HTTPException(status_code=500, detail=f"S3 upload failed: {str(e)}")
+
+
+async def upload_part(key: str, upload_id: str, part_number: int, body, size: int) -> str:
+    try:
+        start = time.perf_counter()
+        etag = await get_async_storage().upload_part(key, upload_id, part_number, body, size)
+        observe_s3_upload(key.split("/", 1)[0], size, time.perf_counter() - start)
+        return etag
+    except StorageError as e:
+        raise HTTPException(status_code=500, detail=f"S3 upload failed: {str(e)}")
+
+
+async def complete_multipart_upload(key: str, upload_id: str, parts):
+    try:
+        await get_async_storage().complete_multipart_upload(key, upload_id, parts)
+    except StorageError as e:
+        raise HTTPException(status_code=500, detail=f"S3 upload failed: {str(e)}")
+
+
+def abort_multipart_upload(key: str, upload_id: str):
+    try:
+        get_storage().abort_multipart_upload(key, upload_id)
+    except StorageError as e:
+        raise HTTPException(status_code=500, detail=f"S3 abort failed: {str(e)}")
@@ -0,0 +1,169 @@
+import hashlib
+from typing import Callable, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+from PIL import Image, ImageFile
+from starlette.datastructures import UploadFile
+from starlette.formparsers import MultiPartException, MultiPartParser
+
+from app.config import settings
+
+# Boundaries, part headers and the closing delimiter around the file in a multipart body.
+MULTIPART_OVERHEAD = 16 * 1024
+
+ASF_GUID = bytes.fromhex("3026b2758e66cf11a6d900aa0062ce6c")
+# Top-level atoms an MP4 or QuickTime file can start with; ftyp is the usual one.
+ISO_BMFF_ATOMS = {b"ftyp", b"moov", b"mdat", b"wide", b"free", b"skip", b"pnot"}
+IMAGE_SIGNATURES = {
+    b"\x89PNG\r\n\x1a\n": "PNG",
+    b"\xff\xd8\xff": "JPEG",
+    b"GIF87a": "GIF",
+    b"GIF89a": "GIF",
+}
+
+
+def sniff_video(head: bytes) -> Optional[str]:
+    """The container format of a video from its first bytes, or None when it is not one we accept."""
+    if head[4:8] in ISO_BMFF_ATOMS:
+        return "mp4"
+    if head[:4] == b"RIFF" and head[8:12] == b"AVI ":
+        return "avi"
+    if head[:16] == ASF_GUID:
+        return "asf"
+    return None
+
+
+def sniff_image(head: bytes) -> Tuple[Optional[str], Optional[Tuple[int, int]]]:
+    """Format and size of an image from its first bytes.
+
+    The size is None when the header does not fit in `head` (a JPEG with large metadata segments).
+    Raises DecompressionBombError for sizes Pillow refuses to open.
+    """
+    image_format = next((name for magic, name in IMAGE_SIGNATURES.items() if head.startswith(magic)), None)
+    if image_format is None:
+        return None, None
+    parser = ImageFile.Parser()
+    try:
+        parser.feed(head)
+    except Image.DecompressionBombError:
+        raise
+    except Exception:
+        return image_format, None
+    return image_format, parser.image.size if parser.image else None
+
+
+def check_video(head: bytes):
+    if sniff_video(head) is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid video file format")
+
+
+def check_image(head: bytes):
+    too_many_pixels = HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Image exceeds {settings.UPLOAD_MAX_IMAGE_PIXELS} pixels",
+    )
+    try:
+        image_format, size = sniff_image(head)
+    except Image.DecompressionBombError:
+        raise too_many_pixels
+    if image_format is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid image file format")
+    if size and size[0] * size[1] > settings.UPLOAD_MAX_IMAGE_PIXELS:
+        raise too_many_pixels
+
+
+class UploadRule(NamedTuple):
+    extensions: Tuple[str, ...]
+    # Name of the setting, read per request so it can be changed at runtime.
+    max_size_setting: str
+    check: Callable[[bytes], None]
+    invalid_detail: str
+
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.wmv')
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif')
+VIDEO_UPLOAD = UploadRule(VIDEO_EXTENSIONS, "UPLOAD_MAX_VIDEO_SIZE", check_video, "Invalid video file format")
+IMAGE_UPLOAD = UploadRule(IMAGE_EXTENSIONS, "UPLOAD_MAX_IMAGE_SIZE", check_image, "Invalid image file format")
+
+
+def too_large(max_size: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"File exceeds the {max_size} bytes allowed"
+    )
+
+
+class SniffingMultiPartParser(MultiPartParser):
+    """Starlette's multipart parser, validating the file part while it streams in.
+
+    The extension is checked as soon as the part headers arrive, the first `UPLOAD_SNIFF_BYTES`
+    are passed to `check`, and the upload is stopped the moment it crosses `max_size`. A bad file
+    is rejected before the rest of it is received or written to disk. The SHA-256 of the file is
+    computed on the same pass, so the spooled copy is never read back to hash it.
+    """
+
+    def __init__(self, request: Request, rule: UploadRule):
+        super().__init__(request.headers, request.stream(), max_files=1, max_fields=10)
+        self.rule = rule
+        self.max_size = getattr(settings, rule.max_size_setting)
+        self.head = b""
+        self.size = 0
+        self.checked = False
+        self.digest = hashlib.sha256()
+
+    def on_headers_finished(self) -> None:
+        super().on_headers_finished()
+        file = self._current_part.file
+        if file is not None and not file.filename.lower().endswith(self.rule.extensions):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=self.rule.invalid_detail)
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._current_part.file is not None:
+            self.size += end - start
+            if self.size > self.max_size:
+                raise too_large(self.max_size)
+            if not self.checked:
+                self.head += data[start:min(end, start + settings.UPLOAD_SNIFF_BYTES - len(self.head))]
+                if len(self.head) >= settings.UPLOAD_SNIFF_BYTES:
+                    self.checked = True
+                    self.rule.check(self.head)
+            self.digest.update(data[start:end])
+        super().on_part_data(data, start, end)
+
+    def on_part_end(self) -> None:
+        if self._current_part.file is not None and not self.checked:
+            self.checked = True
+            self.rule.check(self.head)
+        super().on_part_end()
+
+    async def parse(self):
+        try:
+            return await super().parse()
+        except BaseException:
+            for file in self._files_to_close_on_error:
+                file.close()
+            raise
+
+
+class ReceivedUpload(NamedTuple):
+    file: UploadFile
+    sha256: str
+
+
+async def receive_upload(request: Request, rule: UploadRule) -> ReceivedUpload:
+    """Parse the `file` field of a multipart upload, validating and hashing it while the body streams in."""
+    max_size = getattr(settings, rule.max_size_setting)
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_size + MULTIPART_OVERHEAD:
+        raise too_large(max_size)
+    if not request.headers.get("content-type", "").startswith("multipart/form-data"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Expected a multipart/form-data upload")
+    parser = SniffingMultiPartParser(request, rule)
+    try:
+        form = await parser.parse()
+    except MultiPartException as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=e.message)
+    file = form.get("file")
+    if not isinstance(file, UploadFile):
+        await form.close()
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Field required: file")
+    return ReceivedUpload(file, parser.digest.hexdigest())
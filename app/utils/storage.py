@@ -0,0 +1,371 @@
+import asyncio
+import functools
+import hashlib
+import io
+import os
+import shutil
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, List, Optional
+
+from app.config import settings
+
+COPY_CHUNK_SIZE = 1024 * 1024
+# Most keys S3's DeleteObjects accepts per call.
+DELETE_BATCH_SIZE = 1000
+
+
+class StorageError(Exception):
+    pass
+
+
+class ObjectNotFound(StorageError):
+    pass
+
+
+class StorageBackend(ABC):
+    """Blocking object storage operations. Request handlers go through `AsyncStorage`."""
+
+    @abstractmethod
+    def upload_fileobj(self, fileobj, key: str, content_type: Optional[str] = None):
+        ...
+
+    @abstractmethod
+    def put_bytes(self, data: bytes, key: str, content_type: str, cache_control: Optional[str] = None):
+        ...
+
+    @abstractmethod
+    def create_multipart_upload(self, key: str) -> str:
+        ...
+
+    @abstractmethod
+    def upload_part(self, key: str, upload_id: str, part_number: int, body, size: int) -> str:
+        ...
+
+    @abstractmethod
+    def complete_multipart_upload(self, key: str, upload_id: str, parts: List[dict]):
+        ...
+
+    @abstractmethod
+    def abort_multipart_upload(self, key: str, upload_id: str):
+        ...
+
+    @abstractmethod
+    def download_fileobj(self, key: str, fileobj):
+        """Write the object to `fileobj`; raises ObjectNotFound when there is none."""
+
+    @abstractmethod
+    def delete_objects(self, keys: List[str]) -> List[str]:
+        """Delete up to DELETE_BATCH_SIZE objects in one call; missing keys are not an error.
+
+        Returns the keys that could not be deleted.
+        """
+
+    @abstractmethod
+    def list_keys(self, prefix: str) -> Iterator[str]:
+        ...
+
+    @abstractmethod
+    def source_url(self, key: str, expires_in: int = 600) -> str:
+        """A location tools like ffmpeg can read the object from."""
+
+    @abstractmethod
+    def public_url(self, key: str) -> str:
+        ...
+
+
+class S3Storage(StorageBackend):
+    def __init__(
+            self, bucket: str, region: Optional[str] = None,
+            access_key_id: Optional[str] = None, secret_access_key: Optional[str] = None,
+            endpoint_url: Optional[str] = None,
+            max_pool_connections: int = 32,
+            max_attempts: int = 5,
+            connect_timeout: float = 5.0,
+            read_timeout: float = 60.0,
+    ):
+        self.bucket = bucket
+        self.region = region
+        self._client_kwargs = {
+            "region_name": region,
+            "aws_access_key_id": access_key_id,
+            "aws_secret_access_key": secret_access_key,
+            "endpoint_url": endpoint_url,
+        }
+        self._config_kwargs = {
+            "max_pool_connections": max_pool_connections,
+            "retries": {"total_max_attempts": max_attempts, "mode": "adaptive"},
+            "connect_timeout": connect_timeout,
+            "read_timeout": read_timeout,
+        }
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        # boto3 is slow to import and build; only pay for it on first use.
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import boto3
+                    from botocore.config import Config
+
+                    self._client = boto3.client("s3", config=Config(**self._config_kwargs), **self._client_kwargs)
+        return self._client
+
+    def _call(self, method: str, **kwargs):
+        from botocore.exceptions import BotoCoreError, ClientError
+
+        try:
+            return getattr(self.client, method)(Bucket=self.bucket, **kwargs)
+        except (ClientError, BotoCoreError) as e:
+            raise StorageError(str(e)) from e
+
+    def upload_fileobj(self, fileobj, key, content_type=None):
+        from boto3.s3.transfer import TransferConfig
+        from botocore.exceptions import BotoCoreError, ClientError
+
+        extra_args = {"ContentType": content_type} if content_type else None
+        try:
+            self.client.upload_fileobj(
+                fileobj, self.bucket, key, ExtraArgs=extra_args,
+                Config=TransferConfig(max_concurrency=4, use_threads=True),
+            )
+        except (ClientError, BotoCoreError) as e:
+            raise StorageError(str(e)) from e
+
+    def put_bytes(self, data, key, content_type, cache_control=None):
+        kwargs = {"CacheControl": cache_control} if cache_control else {}
+        self._call("put_object", Key=key, Body=data, ContentType=content_type, **kwargs)
+
+    def create_multipart_upload(self, key):
+        return self._call("create_multipart_upload", Key=key)["UploadId"]
+
+    def upload_part(self, key, upload_id, part_number, body, size):
+        response = self._call(
+            "upload_part", Key=key, UploadId=upload_id, PartNumber=part_number, Body=body, ContentLength=size
+        )
+        return response["ETag"]
+
+    def complete_multipart_upload(self, key, upload_id, parts):
+        self._call("complete_multipart_upload", Key=key, UploadId=upload_id, MultipartUpload={"Parts": parts})
+
+    def abort_multipart_upload(self, key, upload_id):
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") != "NoSuchUpload":
+                raise StorageError(str(e)) from e
+
+    def download_fileobj(self, key, fileobj):
+        from botocore.exceptions import BotoCoreError, ClientError
+
+        try:
+            self.client.download_fileobj(self.bucket, key, fileobj)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+                raise ObjectNotFound(key) from e
+            raise StorageError(str(e)) from e
+        except BotoCoreError as e:
+            raise StorageError(str(e)) from e
+
+    def delete_objects(self, keys):
+        response = self._call("delete_objects", Delete={"Objects": [{"Key": key} for key in keys], "Quiet": True})
+        return [error["Key"] for error in response.get("Errors", [])]
+
+    def list_keys(self, prefix):
+        from botocore.exceptions import BotoCoreError, ClientError
+
+        try:
+            for page in self.client.get_paginator("list_objects_v2").paginate(Bucket=self.bucket, Prefix=prefix):
+                for item in page.get("Contents", []):
+                    yield item["Key"]
+        except (ClientError, BotoCoreError) as e:
+            raise StorageError(str(e)) from e
+
+    def source_url(self, key, expires_in=600):
+        return self.client.generate_presigned_url(
+            "get_object", Params={"Bucket": self.bucket, "Key": key}, ExpiresIn=expires_in
+        )
+
+    def public_url(self, key):
+        return f"https://{self.bucket}.s3.{self.region}.amazonaws.com/{key}"
+
+
+class LocalStorage(StorageBackend):
+    """Filesystem stand-in for S3, used in development, tests and benchmarks."""
+
+    def __init__(self, root: str, base_url: str = "/media"):
+        self.root = os.path.abspath(root)
+        self.base_url = base_url.rstrip("/")
+
+    def path(self, key: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise StorageError(f"Invalid key: {key}")
+        return path
+
+    def _multipart_dir(self, upload_id: str) -> str:
+        return os.path.join(self.root, ".multipart", upload_id)
+
+    def _write(self, key: str, fileobj):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so readers never observe a partial object.
+        partial = f"{path}.{uuid.uuid4().hex}.partial"
+        with open(partial, "wb") as target:
+            shutil.copyfileobj(fileobj, target, COPY_CHUNK_SIZE)
+        os.replace(partial, path)
+
+    def upload_fileobj(self, fileobj, key, content_type=None):
+        self._write(key, fileobj)
+
+    def put_bytes(self, data, key, content_type, cache_control=None):
+        self._write(key, io.BytesIO(data))
+
+    def create_multipart_upload(self, key):
+        upload_id = uuid.uuid4().hex
+        os.makedirs(self._multipart_dir(upload_id))
+        return upload_id
+
+    def upload_part(self, key, upload_id, part_number, body, size):
+        directory = self._multipart_dir(upload_id)
+        if not os.path.isdir(directory):
+            raise StorageError(f"No such upload: {upload_id}")
+        digest = hashlib.md5()
+        with open(os.path.join(directory, str(part_number)), "wb") as target:
+            while chunk := body.read(COPY_CHUNK_SIZE):
+                digest.update(chunk)
+                target.write(chunk)
+        return f'"{digest.hexdigest()}"'
+
+    def complete_multipart_upload(self, key, upload_id, parts):
+        directory = self._multipart_dir(upload_id)
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as target:
+            for part in sorted(parts, key=lambda part: part["PartNumber"]):
+                with open(os.path.join(directory, str(part["PartNumber"])), "rb") as source:
+                    shutil.copyfileobj(source, target, COPY_CHUNK_SIZE)
+        shutil.rmtree(directory, ignore_errors=True)
+
+    def abort_multipart_upload(self, key, upload_id):
+        shutil.rmtree(self._multipart_dir(upload_id), ignore_errors=True)
+
+    def download_fileobj(self, key, fileobj):
+        try:
+            with open(self.path(key), "rb") as source:
+                shutil.copyfileobj(source, fileobj, COPY_CHUNK_SIZE)
+        except (FileNotFoundError, IsADirectoryError) as e:
+            raise ObjectNotFound(key) from e
+
+    def delete_objects(self, keys):
+        failed = []
+        for key in keys:
+            try:
+                os.remove(self.path(key))
+            except FileNotFoundError:
+                pass
+            except (OSError, StorageError):
+                failed.append(key)
+        return failed
+
+    def list_keys(self, prefix):
+        # The deepest directory the prefix names; a partial last segment is matched below.
+        directory = os.path.dirname(os.path.join(self.root, prefix))
+        for parent, _, files in os.walk(directory):
+            for name in files:
+                key = os.path.relpath(os.path.join(parent, name), self.root).replace(os.sep, "/")
+                if key.startswith(prefix) and not name.endswith(".partial"):
+                    yield key
+
+    def source_url(self, key, expires_in=600):
+        return self.path(key)
+
+    def public_url(self, key):
+        return f"{self.base_url}/{key}"
+
+
+class AsyncStorage:
+    """Runs a blocking backend on a dedicated thread pool so handlers never block the event loop.
+
+    The pool is sized like the backend's connection pool: calls beyond that queue here instead of
+    waiting inside botocore for a free connection.
+    """
+
+    def __init__(self, backend: StorageBackend, max_workers: int = 32):
+        self.backend = backend
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="storage")
+
+    async def _run(self, method: str, *args, **kwargs):
+        func = functools.partial(getattr(self.backend, method), *args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func)
+
+    async def upload_fileobj(self, fileobj, key: str, content_type: Optional[str] = None):
+        return await self._run("upload_fileobj", fileobj, key, content_type)
+
+    async def put_bytes(self, data: bytes, key: str, content_type: str, cache_control: Optional[str] = None):
+        return await self._run("put_bytes", data, key, content_type, cache_control)
+
+    async def create_multipart_upload(self, key: str) -> str:
+        return await self._run("create_multipart_upload", key)
+
+    async def upload_part(self, key: str, upload_id: str, part_number: int, body, size: int) -> str:
+        return await self._run("upload_part", key, upload_id, part_number, body, size)
+
+    async def complete_multipart_upload(self, key: str, upload_id: str, parts: Iterable[dict]):
+        return await self._run("complete_multipart_upload", key, upload_id, list(parts))
+
+    async def abort_multipart_upload(self, key: str, upload_id: str):
+        return await self._run("abort_multipart_upload", key, upload_id)
+
+    async def download_fileobj(self, key: str, fileobj):
+        return await self._run("download_fileobj", key, fileobj)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+def build_storage() -> StorageBackend:
+    if settings.STORAGE_BACKEND == "local":
+        return LocalStorage(settings.LOCAL_STORAGE_ROOT, settings.LOCAL_STORAGE_BASE_URL)
+    if settings.STORAGE_BACKEND == "s3":
+        return S3Storage(
+            bucket=settings.S3_BUCKET,
+            region=settings.AWS_REGION,
+            access_key_id=settings.AWS_ACCESS_KEY_ID,
+            secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+            endpoint_url=settings.S3_ENDPOINT_URL,
+            max_pool_connections=settings.STORAGE_MAX_POOL_CONNECTIONS,
+            max_attempts=settings.STORAGE_MAX_ATTEMPTS,
+            connect_timeout=settings.STORAGE_CONNECT_TIMEOUT,
+            read_timeout=settings.STORAGE_READ_TIMEOUT,
+        )
+    raise ValueError(f"Unknown STORAGE_BACKEND: {settings.STORAGE_BACKEND}")
+
+
+def media_url(key: str) -> str:
+    """The URL clients fetch an object from: the media proxy when it is enabled, the backend otherwise."""
+    if settings.MEDIA_PROXY_ENABLED:
+        return f"{settings.MEDIA_PROXY_BASE_URL.rstrip('/')}/{key}"
+    return get_storage().public_url(key)
+
+
+@functools.lru_cache(maxsize=None)
+def get_storage() -> StorageBackend:
+    return build_storage()
+
+
+@functools.lru_cache(maxsize=None)
+def get_async_storage() -> AsyncStorage:
+    return AsyncStorage(get_storage(), max_workers=settings.STORAGE_MAX_POOL_CONNECTIONS)
+
+
+def shutdown_storage():
+    if get_async_storage.cache_info().currsize:
+        get_async_storage().shutdown()
+        get_async_storage.cache_clear()
@@ -0,0 +1,89 @@
+import logging
+import os
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app import models
+from app.config import settings
+from app.database import SessionLocal
+from app.utils import images, jobs, s3
+from app.utils.pools import get_process_pool
+from app.utils.sniffing import IMAGE_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+
+def thumbnail_key(source_key: str, width: int) -> str:
+    """`images/cat_1700000000.jpg` -> `thumbnails/images/cat_1700000000_320w.webp`."""
+    stem, _ = os.path.splitext(source_key)
+    return f"thumbnails/{stem}_{width}w.webp"
+
+
+def thumbnail_keys(source_key: str) -> List[str]:
+    return [thumbnail_key(source_key, width) for width in sorted(settings.THUMBNAIL_WIDTHS)]
+
+
+def store_thumbnails(db: Session, source_key: str, variants: Dict[int, bytes]):
+    for width, data in variants.items():
+        key = s3.upload_bytes_to_s3(data, thumbnail_key(source_key, width), "image/webp")
+        db.merge(models.Thumbnail(source_key=source_key, width=width, key=key))
+    db.commit()
+
+
+def generate_thumbnails(source_key: str):
+    """Render and store the variants of `source_key`. Runs as a background job, retried when it raises.
+
+    Images are read back from storage, so only the key is queued; for videos a frame is extracted
+    by ffmpeg straight from S3.
+    """
+    db = SessionLocal()
+    try:
+        # Content-addressed uploads can be re-shared; their variants only need rendering once.
+        done = db.query(models.Thumbnail).filter(models.Thumbnail.source_key == source_key).count()
+        if done >= len(set(settings.THUMBNAIL_WIDTHS)):
+            return
+        if source_key.lower().endswith(IMAGE_EXTENSIONS):
+            data = s3.download_bytes(source_key)
+        else:
+            data = images.extract_video_frame(s3.presigned_get_url(source_key))
+            if data is None:
+                logger.info("No frame extracted for %s, skipping poster generation", source_key)
+                return
+        variants = get_process_pool().submit(
+            images.render_thumbnails, data, settings.THUMBNAIL_WIDTHS, settings.THUMBNAIL_QUALITY
+        ).result()
+        store_thumbnails(db, source_key, variants)
+    finally:
+        db.close()
+
+
+def schedule_thumbnails(source_key: str) -> List[str]:
+    """Queue thumbnail generation off the request path and return the keys the variants will have."""
+    if not settings.THUMBNAILS_ENABLED:
+        return []
+    jobs.enqueue("thumbnails", source_key)
+    return thumbnail_keys(source_key)
+
+
+jobs.register("thumbnails", generate_thumbnails)
+
+
+def pick_variant(variants: Dict[int, str], width: int) -> Optional[str]:
+    """Smallest variant at least `width` wide, else the largest one available."""
+    if not variants:
+        return None
+    suitable = [candidate for candidate in variants if candidate >= width]
+    return variants[min(suitable)] if suitable else variants[max(variants)]
+
+
+def resolve_images(db: Session, source_keys: Iterable[str], width: int) -> Dict[str, str]:
+    """Map each source key to its best thumbnail for `width`, in a single query."""
+    source_keys = set(source_keys)
+    if not source_keys:
+        return {}
+    by_source: Dict[str, Dict[int, str]] = {}
+    rows = db.query(models.Thumbnail).filter(models.Thumbnail.source_key.in_(source_keys)).all()
+    for row in rows:
+        by_source.setdefault(row.source_key, {})[row.width] = row.key
+    return {source: pick_variant(variants, width) for source, variants in by_source.items()}
@@ -0,0 +1,107 @@
+import logging
+import mimetypes
+import os
+import tempfile
+
+from sqlalchemy.orm import Session
+
+from app import models
+from app.config import settings
+from app.database import SessionLocal
+from app.utils import hls, jobs, s3
+from app.utils.pools import get_process_pool
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+PROCESSING = "processing"
+READY = "ready"
+FAILED = "failed"
+
+
+def hls_prefix(source_key: str) -> str:
+    """`videos/abc.mp4` -> `hls/videos/abc`; renditions and the master playlist live under it."""
+    stem, _ = os.path.splitext(source_key)
+    return f"hls/{stem}"
+
+
+def is_transcodable(video_url: str) -> bool:
+    """Only our own uploads can be transcoded; links to other sites are played as they are."""
+    return video_url.startswith("videos/")
+
+
+def set_status(db: Session, source_key: str, status: str, manifest_key=None):
+    """Update every video sharing `source_key`; content-addressed uploads can be shared more than once."""
+    db.query(models.Video).filter(models.Video.video_url == source_key).update(
+        {models.Video.processing_status: status, models.Video.manifest_key: manifest_key},
+        synchronize_session=False,
+    )
+    db.commit()
+
+
+def store_renditions(output_dir: str, files, prefix: str) -> str:
+    """Upload the transcoded files; the master playlist comes last, so players never see a partial stream."""
+    key = None
+    for name in files:
+        with open(os.path.join(output_dir, name), "rb") as file:
+            data = file.read()
+        extension = os.path.splitext(name)[1]
+        content_type = hls.CONTENT_TYPES.get(extension) or mimetypes.guess_type(name)[0] or "application/octet-stream"
+        key = s3.upload_bytes_to_s3(data, f"{prefix}/{name.replace(os.sep, '/')}", content_type)
+    return key
+
+
+def transcode_video(source_key: str):
+    """Transcode `source_key` into HLS renditions and record the manifest. Runs as a background job."""
+    db = SessionLocal()
+    try:
+        set_status(db, source_key, PROCESSING)
+        renditions = hls.parse_renditions(settings.TRANSCODE_RENDITIONS)
+        # ffmpeg reads the source once per rendition; the link has to outlive all of them.
+        source = s3.presigned_get_url(source_key, expires_in=settings.TRANSCODE_TIMEOUT * len(renditions))
+        with tempfile.TemporaryDirectory(prefix="transcode-") as output_dir:
+            files = get_process_pool().submit(
+                hls.transcode_hls, source, output_dir, renditions, settings.HLS_SEGMENT_SECONDS,
+                settings.TRANSCODE_TIMEOUT,
+            ).result()
+            manifest_key = store_renditions(output_dir, files, hls_prefix(source_key))
+        set_status(db, source_key, READY, manifest_key)
+    except Exception:
+        logger.exception("Transcoding failed for %s", source_key)
+        db.rollback()
+        set_status(db, source_key, FAILED)
+    finally:
+        db.close()
+
+
+def prepare_transcode(db: Session, video: models.Video) -> bool:
+    """Set `video`'s processing status before it is committed.
+
+    Returns True when a transcode job has to be queued (with `schedule_transcode`) after the commit.
+    """
+    video.processing_status, video.manifest_key = None, None
+    if not is_transcodable(video.video_url):
+        return False
+    done = (
+        db.query(models.Video.processing_status, models.Video.manifest_key)
+        .filter(models.Video.video_url == video.video_url)
+        .filter(models.Video.processing_status.in_([PENDING, PROCESSING, READY]))
+        .first()
+    )
+    if done:
+        # Already transcoded, or in flight: the running job updates every row with this source.
+        video.processing_status, video.manifest_key = done
+        return False
+    if not settings.TRANSCODING_ENABLED:
+        return False
+    video.processing_status = PENDING
+    return True
+
+
+def schedule_transcode(source_key: str):
+    """Queue transcoding off the request path."""
+    jobs.enqueue("transcode", source_key)
+
+
+# Failures are recorded on the video (`failed`) rather than retried; ffmpeg errors do not go away on their own.
+jobs.register("transcode", transcode_video, max_attempts=1, lane="transcode")
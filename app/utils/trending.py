@@ -0,0 +1,119 @@
+import logging
+import math
+import threading
+import uuid
+from datetime import datetime
+from typing import Iterable, Set
+
+from sqlalchemy import bindparam, update
+from sqlalchemy.orm import Session
+
+from app import models
+from app.config import settings
+from app.database import SessionLocal
+from app.utils import jobs
+
+logger = logging.getLogger(__name__)
+
+# Scores count age from here; any fixed instant works, moving it shifts every score equally.
+TRENDING_EPOCH = datetime(2024, 1, 1)
+REFRESH_BATCH_SIZE = 500
+
+
+def trending_score(likes: int, dislikes: int, shared_at: datetime) -> float:
+    """Time-decayed rank ("hot" ranking): every TRENDING_DECAY_SECONDS of age is worth 10x the net votes.
+
+    The age term is relative to a fixed epoch, so a score only changes when the votes do: newer
+    videos outrank older ones without anything being recomputed as time passes.
+    """
+    net = (likes or 0) - (dislikes or 0)
+    order = math.log10(max(abs(net), 1))
+    sign = (net > 0) - (net < 0)
+    age = (shared_at - TRENDING_EPOCH).total_seconds()
+    return round(sign * order + age / settings.TRENDING_DECAY_SECONDS, 7)
+
+
+def refresh_scores(db: Session, video_ids: Iterable[uuid.UUID]) -> int:
+    """Recompute the stored score of the given videos. Commits; returns the number updated."""
+    video_ids = list(video_ids)
+    updated = 0
+    for offset in range(0, len(video_ids), REFRESH_BATCH_SIZE):
+        rows = (
+            db.query(models.Video.id, models.Video.likes, models.Video.dislikes, models.Video.shared_at)
+            .filter(models.Video.id.in_(video_ids[offset:offset + REFRESH_BATCH_SIZE]))
+            .all()
+        )
+        if not rows:
+            continue
+        db.execute(
+            update(models.Video.__table__)
+            .where(models.Video.__table__.c.id == bindparam("video_id"))
+            .values(trending_score=bindparam("score")),
+            [{"video_id": row.id, "score": trending_score(row.likes, row.dislikes, row.shared_at)} for row in rows],
+        )
+        updated += len(rows)
+    db.commit()
+    return updated
+
+
+def refresh_all_scores(db: Session) -> int:
+    """Recompute every score, in batches. For backfills and TRENDING_DECAY_SECONDS changes, never per request."""
+    updated, last_id = 0, None
+    while True:
+        query = db.query(models.Video.id).order_by(models.Video.id)
+        if last_id is not None:
+            query = query.filter(models.Video.id > last_id)
+        batch = [video_id for video_id, in query.limit(REFRESH_BATCH_SIZE).all()]
+        if not batch:
+            return updated
+        updated += refresh_scores(db, batch)
+        last_id = batch[-1]
+
+
+class TrendingRefresher:
+    """Collects videos whose votes changed and rescores them in the background, in batches.
+
+    Bursts of votes on the same video collapse into one recomputation.
+    """
+
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+        self._dirty: Set[uuid.UUID] = set()
+        self._scheduled = False
+        self._lock = threading.Lock()
+
+    def mark_dirty(self, video_id: uuid.UUID):
+        with self._lock:
+            self._dirty.add(video_id)
+            if self._scheduled or not settings.TRENDING_REFRESH_ENABLED:
+                return
+            self._scheduled = True
+        if not jobs.enqueue("trending"):
+            with self._lock:
+                # The ids stay dirty; the next vote tries again.
+                self._scheduled = False
+
+    def run(self):
+        db = self.session_factory()
+        try:
+            self.flush(db)
+        except Exception:
+            logger.exception("Trending score refresh failed")
+        finally:
+            db.close()
+
+    def flush(self, db: Session) -> int:
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            self._scheduled = False
+        try:
+            return refresh_scores(db, dirty)
+        except Exception:
+            with self._lock:
+                self._dirty |= dirty
+            raise
+
+
+refresher = TrendingRefresher()
+# Not worth retrying: a failed refresh puts its ids back for the next one.
+jobs.register("trending", lambda: refresher.run(), max_attempts=1, persist=False)
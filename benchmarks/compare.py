@@ -0,0 +1,57 @@
+"""Compare two benchmark result files and flag regressions.
+
+    python -m benchmarks.compare baseline.json candidate.json --threshold 10
+
+Exits with status 1 when any latency metric got slower (or throughput metric got lower) by more
+than `--threshold` percent.
+"""
+import argparse
+import json
+import sys
+
+# Metrics where a larger value is better; every other metric is a latency.
+THROUGHPUT_METRICS = {"ops_per_second", "mb_per_second"}
+COMPARED_METRICS = {"p50_ms", "p95_ms", "mean_ms"} | THROUGHPUT_METRICS
+
+
+def flatten(results, prefix=""):
+    for key, value in results.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            yield from flatten(value, path)
+        elif key in COMPARED_METRICS:
+            yield path, key, value
+
+
+def compare(baseline, candidate, threshold):
+    base = {path: value for path, _, value in flatten(baseline["results"])}
+    rows, regressions = [], []
+    for path, metric, value in flatten(candidate["results"]):
+        if path not in base or not base[path]:
+            continue
+        change = (value - base[path]) / base[path] * 100
+        worse = -change if metric in THROUGHPUT_METRICS else change
+        rows.append((path, base[path], value, change))
+        if worse > threshold:
+            regressions.append(path)
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed regression in percent")
+    args = parser.parse_args()
+
+    with open(args.baseline) as baseline, open(args.candidate) as candidate:
+        rows, regressions = compare(json.load(baseline), json.load(candidate), args.threshold)
+
+    for path, old, new, change in rows:
+        flag = "  REGRESSION" if path in regressions else ""
+        print(f"{path:60} {old:>12} -> {new:>12} ({change:+.1f}%){flag}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
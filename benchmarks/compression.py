@@ -0,0 +1,135 @@
+"""Bytes on the wire and CPU cost of compressing feed pages with gzip and brotli.
+
+Seeds (or reuses) a SQLite database, fetches feed pages of several sizes uncompressed, then compresses
+each page at every gzip level and brotli quality listed, recording the compressed size, the ratio and
+the CPU time per page.
+
+    python -m benchmarks.compression --output compression.json
+    python -m benchmarks.compression --users 1000 --videos 10000 --limits 10 50 --output quick.json
+"""
+import argparse
+import gzip
+import json
+import os
+import platform
+import tempfile
+import time
+from datetime import datetime
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("THUMBNAILS_ENABLED", "false")
+# Background jobs would open the default database rather than the benchmark's, and their CPU would
+# show up in the latencies.
+os.environ.setdefault("TRANSCODING_ENABLED", "false")
+os.environ.setdefault("REAPER_ENABLED", "false")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ["STORAGE_BACKEND"] = "local"
+os.environ["LOCAL_STORAGE_ROOT"] = tempfile.mkdtemp(prefix="bench-storage-")
+
+import brotli  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.database import get_db, get_read_db  # noqa: E402
+from app.main import app  # noqa: E402
+from benchmarks.run import check  # noqa: E402
+from benchmarks.seed import ensure_seeded, make_engine, make_sessionmaker  # noqa: E402
+from benchmarks.stats import git_commit, summarize  # noqa: E402
+
+CODECS = {
+    "gzip": lambda data, level: gzip.compress(data, compresslevel=level, mtime=0),
+    "br": lambda data, level: brotli.compress(data, quality=level),
+}
+
+
+def cpu_timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.process_time()
+        func()
+        samples.append(time.process_time() - start)
+    return samples
+
+
+def bench_codec(pages, codec, level, repeat):
+    compress = CODECS[codec]
+    raw = sum(len(page) for page in pages)
+    compressed = sum(len(compress(page, level)) for page in pages)
+    summary = summarize(cpu_timed(lambda: [compress(page, level) for page in pages], repeat))
+    # CPU per page, not per batch of pages.
+    summary = {key: round(value / len(pages), 3) if key.endswith("_ms") else value for key, value in summary.items()}
+    return {"bytes_per_page": compressed // len(pages), "ratio": round(raw / compressed, 2), **summary}
+
+
+def run(args):
+    seeding = ensure_seeded(args.db, args.users, args.videos)
+    engine = make_engine(args.db)
+    BenchSession = make_sessionmaker(engine)
+
+    def override_get_db():
+        db = BenchSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
+    results = {}
+    try:
+        with TestClient(app) as client:
+            for limit in args.limits:
+                pages = [
+                    check(client.get(
+                        "/api/videos", params={"skip": page * limit, "limit": limit},
+                        headers={"Accept-Encoding": "identity"},
+                    )).content
+                    for page in range(args.pages)
+                ]
+                result = {"raw_bytes_per_page": sum(len(page) for page in pages) // len(pages)}
+                for level in args.gzip_levels:
+                    result[f"gzip_{level}"] = bench_codec(pages, "gzip", level, args.repeat)
+                for quality in args.brotli_qualities:
+                    result[f"br_{quality}"] = bench_codec(pages, "br", quality, args.repeat)
+                results[str(limit)] = result
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+        app.dependency_overrides.pop(get_read_db, None)
+        engine.dispose()
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "users": args.users,
+            "videos": args.videos,
+            "seeding": seeding,
+        },
+        "results": {"feed_compression": results},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="./bench.db")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--videos", type=int, default=100_000)
+    parser.add_argument("--limits", type=int, nargs="+", default=[10, 50, 100], help="Feed page sizes")
+    parser.add_argument("--pages", type=int, default=10, help="Pages fetched per page size")
+    parser.add_argument("--gzip-levels", type=int, nargs="+", default=[1, 6, 9])
+    parser.add_argument("--brotli-qualities", type=int, nargs="+", default=[1, 4, 11])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", default="compression.json", help="JSON output path, '-' for stdout")
+    args = parser.parse_args()
+
+    report = json.dumps(run(args), indent=2)
+    if args.output == "-":
+        print(report)
+    else:
+        with open(args.output, "w") as output:
+            output.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""Offline benchmark suite for the API and the websocket hub.
+
+Seeds (or reuses) a SQLite database, drives the app in-process and writes machine readable
+results so two commits can be compared with `python -m benchmarks.compare`.
+
+    python -m benchmarks.run --output baseline.json
+    python -m benchmarks.run --users 1000 --videos 10000 --output quick.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+from datetime import datetime
+
+# The app reads its configuration at import time. The benchmark never talks to AWS: objects go to a
+# throwaway directory through the local filesystem backend.
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("THUMBNAILS_ENABLED", "false")
+# Background jobs would open the default database rather than the benchmark's, and their CPU would
+# show up in the latencies.
+os.environ.setdefault("TRANSCODING_ENABLED", "false")
+os.environ.setdefault("REAPER_ENABLED", "false")
+# The benchmark is one client hammering the API; per-IP limits would measure the limiter, not the endpoints.
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ["STORAGE_BACKEND"] = "local"
+os.environ["LOCAL_STORAGE_ROOT"] = BENCH_STORAGE_ROOT = tempfile.mkdtemp(prefix="bench-storage-")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.api.websockets import websocketsManager  # noqa: E402
+from app.database import get_db, get_read_db  # noqa: E402
+from app.main import app  # noqa: E402
+from benchmarks.stats import git_commit, summarize  # noqa: E402
+from benchmarks.seed import BENCH_PASSWORD, ensure_seeded, make_engine, make_sessionmaker, user_email  # noqa: E402
+
+
+# An ISO base media `ftyp` box, as at the start of every MP4 file.
+MP4_HEADER = b"\x00\x00\x00\x18ftypmp42\x00\x00\x00\x00mp42isom"
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def check(response, expected=200):
+    if response.status_code != expected:
+        request = response.request
+        raise RuntimeError(f"{request.method} {request.url} -> {response.status_code}: {response.text}")
+    return response
+
+
+def bench_feed_pagination(client, n_videos, depths, repeat):
+    results = {}
+    for depth in depths:
+        if depth >= n_videos:
+            continue
+        samples = timed(lambda: check(client.get("/api/videos", params={"skip": depth, "limit": 10})), repeat)
+        results[str(depth)] = summarize(samples)
+    return results
+
+
+def bench_login(client, n_users, repeat):
+    emails = [user_email(index % n_users) for index in range(repeat)]
+    iterator = iter(emails)
+    start = time.perf_counter()
+    samples = timed(
+        lambda: check(client.post("/api/users/login", json={"email": next(iterator), "password": BENCH_PASSWORD})),
+        repeat,
+    )
+    elapsed = time.perf_counter() - start
+    return {**summarize(samples), "ops_per_second": round(repeat / elapsed, 3)}
+
+
+def bench_create_video(client, subscriber_counts, repeat):
+    payload = {
+        "title": "Benchmark video",
+        "description": "Created by the benchmark suite",
+        "video_url": "videos/bench.mp4",
+        "image_url": "images/bench.jpg",
+        "tags": "bench",
+    }
+    results = {}
+    for subscribers in subscriber_counts:
+        sessions = []
+        try:
+            for _ in range(subscribers):
+                session = client.websocket_connect("/ws")
+                websocket = session.__enter__()
+                websocket.receive_text()
+                sessions.append((session, websocket))
+            samples = timed(lambda: check(client.post("/api/videos", json=payload), 201), repeat)
+            # Every subscriber must have received every notification.
+            for _, websocket in sessions:
+                for _ in range(repeat):
+                    websocket.receive_text()
+            results[str(subscribers)] = summarize(samples)
+        finally:
+            for session, _ in sessions:
+                session.__exit__(None, None, None)
+    return results
+
+
+def bench_upload(client, sizes_mb, repeat):
+    results = {}
+    try:
+        for size_mb in sizes_mb:
+            body = bytearray(os.urandom(size_mb * 1024 * 1024))
+            # Uploads are sniffed, so the payload starts like an MP4 file.
+            body[:len(MP4_HEADER)] = MP4_HEADER
+            counter = iter(range(repeat))
+
+            def upload():
+                # Unique content per request, otherwise the content-hash index answers every repeat.
+                body[len(MP4_HEADER):len(MP4_HEADER) + 8] = next(counter).to_bytes(8, "big")
+                check(client.post(
+                    "/api/uploads/video", files={"file": ("bench.mp4", io.BytesIO(bytes(body)), "video/mp4")}
+                ))
+
+            samples = timed(upload, repeat)
+            summary = summarize(samples)
+            summary["mb_per_second"] = round(size_mb * repeat / sum(samples), 3)
+            results[f"{size_mb}MB"] = summary
+    finally:
+        shutil.rmtree(BENCH_STORAGE_ROOT, ignore_errors=True)
+    return results
+
+
+def run(args):
+    seeding = ensure_seeded(args.db, args.users, args.videos)
+    engine = make_engine(args.db)
+    BenchSession = make_sessionmaker(engine)
+
+    def override_get_db():
+        db = BenchSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
+    results = {}
+    try:
+        with TestClient(app) as client:
+            login = check(client.post("/api/users/login", json={"email": user_email(0), "password": BENCH_PASSWORD}))
+            client.headers["Authorization"] = f"Bearer {login.json()['access_token']}"
+            results["feed_pagination"] = bench_feed_pagination(client, args.videos, args.depths, args.repeat)
+            results["login"] = bench_login(client, args.users, args.login_repeat)
+            results["create_video"] = bench_create_video(client, args.subscribers, args.repeat)
+            results["upload"] = bench_upload(client, args.upload_sizes, args.upload_repeat)
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+        app.dependency_overrides.pop(get_read_db, None)
+        websocketsManager.active_connections.clear()
+        engine.dispose()
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "users": args.users,
+            "videos": args.videos,
+            "seeding": seeding,
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="./bench.db")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--videos", type=int, default=1_000_000)
+    parser.add_argument("--depths", type=int, nargs="+", default=[0, 100, 1_000, 10_000, 100_000, 500_000, 999_000])
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[0, 10, 100])
+    parser.add_argument("--upload-sizes", type=int, nargs="+", default=[1, 16], help="Upload sizes in MB")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--login-repeat", type=int, default=10)
+    parser.add_argument("--upload-repeat", type=int, default=5)
+    parser.add_argument("--output", default="benchmark-results.json", help="JSON output path, '-' for stdout")
+    args = parser.parse_args()
+
+    report = json.dumps(run(args), indent=2)
+    if args.output == "-":
+        print(report)
+    else:
+        with open(args.output, "w") as output:
+            output.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Seed a SQLite database with synthetic users and videos for the benchmark suite.
+
+    python -m benchmarks.seed --db ./bench.db --users 100000 --videos 1000000
+"""
+import argparse
+import os
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.auth import hash_password
+from app.database import Base
+from app.utils.trending import trending_score
+
+BENCH_PASSWORD = "benchpassword"
+BATCH_SIZE = 10_000
+TAGS = ["music", "news", "gaming", "sport", "travel", "food", "tech", "comedy"]
+
+
+def user_email(index: int) -> str:
+    return f"bench.user{index}@example.com"
+
+
+def make_engine(db_path: str):
+    return create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
+
+
+def make_sessionmaker(engine):
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def counts(engine):
+    with engine.connect() as connection:
+        users = connection.execute(select(func.count()).select_from(models.User)).scalar_one()
+        videos = connection.execute(select(func.count()).select_from(models.Video)).scalar_one()
+    return users, videos
+
+
+def seed(engine, n_users: int, n_videos: int, seed_value: int = 42) -> dict:
+    """Insert `n_users` users and `n_videos` videos in batches; deterministic for a given seed."""
+    rng = random.Random(seed_value)
+    Base.metadata.create_all(bind=engine)
+    # Hashing 100k passwords would dominate seeding; every user shares one bcrypt hash.
+    password = hash_password(BENCH_PASSWORD)
+    user_ids = [uuid.UUID(int=rng.getrandbits(128), version=4) for _ in range(n_users)]
+    started = time.perf_counter()
+
+    with engine.begin() as connection:
+        for offset in range(0, n_users, BATCH_SIZE):
+            connection.execute(models.User.__table__.insert(), [
+                {"id": user_ids[index], "email": user_email(index), "password": password}
+                for index in range(offset, min(offset + BATCH_SIZE, n_users))
+            ])
+
+    now = datetime.utcnow()
+    with engine.begin() as connection:
+        for offset in range(0, n_videos, BATCH_SIZE):
+            rows = [
+                {
+                    "id": uuid.UUID(int=rng.getrandbits(128), version=4),
+                    "title": f"Bench video {index}",
+                    "description": "Synthetic benchmark video",
+                    "video_url": f"videos/bench_{index}.mp4",
+                    "image_url": f"images/bench_{index}.jpg",
+                    "tags": ",".join(rng.sample(TAGS, 2)),
+                    "shared_by": user_ids[rng.randrange(n_users)],
+                    "likes": rng.randrange(1000),
+                    "dislikes": rng.randrange(100),
+                    "shared_at": now - timedelta(seconds=index),
+                }
+                for index in range(offset, min(offset + BATCH_SIZE, n_videos))
+            ]
+            for row in rows:
+                row["trending_score"] = trending_score(row["likes"], row["dislikes"], row["shared_at"])
+            connection.execute(models.Video.__table__.insert(), rows)
+        users, videos = models.User.__table__, models.Video.__table__
+        connection.execute(users.update().values(video_count=(
+            select(func.count()).where(videos.c.shared_by == users.c.id).scalar_subquery()
+        )))
+
+    return {"users": n_users, "videos": n_videos, "seconds": round(time.perf_counter() - started, 3)}
+
+
+def ensure_seeded(db_path: str, n_users: int, n_videos: int) -> dict:
+    """Reuse an existing database with the expected row counts, otherwise rebuild it."""
+    if os.path.exists(db_path):
+        engine = make_engine(db_path)
+        try:
+            if counts(engine) == (n_users, n_videos):
+                return {"users": n_users, "videos": n_videos, "seconds": 0.0, "reused": True}
+        except Exception:
+            pass
+        engine.dispose()
+        os.remove(db_path)
+    return seed(make_engine(db_path), n_users, n_videos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="./bench.db")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--videos", type=int, default=1_000_000)
+    args = parser.parse_args()
+    print(ensure_seeded(args.db, args.users, args.videos))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""Throughput of the production server (`python -m app.server`) by worker count.
+
+Starts the server against a seeded SQLite database once per worker count, drives it over
+keep-alive HTTP connections from separate load-generator processes for a fixed duration and
+reports requests per second and latency per endpoint.
+
+    python -m benchmarks.throughput --workers 1 2 4 --duration 10 --output throughput.json
+
+Results use the same layout as `benchmarks.run`, so `python -m benchmarks.compare` works on them.
+Run the load generator on another machine (`--url`) when the server host has few cores; otherwise
+both compete for the same CPUs.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from benchmarks.seed import ensure_seeded
+from benchmarks.stats import git_commit, summarize
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENDPOINTS = {
+    "healthcheck": "/api/healthchecker",
+    "feed": "/api/videos?skip=0&limit=10",
+}
+
+
+async def _get(reader, writer, request):
+    writer.write(request)
+    await writer.drain()
+    head = await reader.readuntil(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    length = 0
+    for line in head.split(b"\r\n"):
+        if line.lower().startswith(b"content-length:"):
+            length = int(line.split(b":", 1)[1])
+    await reader.readexactly(length)
+    return status
+
+
+async def _connection(host, port, path, deadline, samples, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    request = f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode()
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            if await _get(reader, writer, request) == 200:
+                samples.append(time.perf_counter() - start)
+            else:
+                errors.append(1)
+    finally:
+        writer.close()
+
+
+def _load_worker(url, path, connections, duration, queue):
+    """One load-generator process: `connections` keep-alive connections sending GETs back to back."""
+    parts = urlsplit(url)
+    samples, errors = [], []
+
+    async def main():
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(
+            _connection(parts.hostname, parts.port or 80, path, deadline, samples, errors)
+            for _ in range(connections)
+        ))
+
+    asyncio.run(main())
+    queue.put((samples, len(errors)))
+
+
+def measure(url, path, connections, clients, duration):
+    queue = multiprocessing.Queue()
+    per_client = max(1, connections // clients)
+    processes = [
+        multiprocessing.Process(target=_load_worker, args=(url, path, per_client, duration, queue))
+        for _ in range(clients)
+    ]
+    for process in processes:
+        process.start()
+    samples, errors = [], 0
+    for _ in processes:
+        client_samples, client_errors = queue.get()
+        samples.extend(client_samples)
+        errors += client_errors
+    for process in processes:
+        process.join()
+    if not samples:
+        raise RuntimeError(f"No successful requests to {path}")
+    return {**summarize(samples), "errors": errors, "ops_per_second": round(len(samples) / duration, 3)}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(url, timeout=60):
+    parts = urlsplit(url)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((parts.hostname, parts.port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError(f"Server at {url} did not start")
+
+
+def start_server(db_path, workers, port, storage_root):
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{os.path.abspath(db_path)}",
+        "SECRET_KEY": os.environ.get("SECRET_KEY", "benchmark-secret"),
+        "STORAGE_BACKEND": "local",
+        "LOCAL_STORAGE_ROOT": storage_root,
+        "THUMBNAILS_ENABLED": "false",
+        "TRANSCODING_ENABLED": "false",
+        "REAPER_ENABLED": "false",
+        "RATE_LIMIT_ENABLED": "false",
+    }
+    return subprocess.Popen(
+        [sys.executable, "-m", "app.server", "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers)],
+        cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+def stop_server(server):
+    server.send_signal(signal.SIGTERM)
+    try:
+        server.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        server.kill()
+        server.wait()
+
+
+def run(args):
+    results = {endpoint: {} for endpoint in ENDPOINTS}
+    seeding = None
+    if args.url:
+        for endpoint, path in ENDPOINTS.items():
+            results[endpoint]["external"] = measure(args.url, path, args.connections, args.clients, args.duration)
+    else:
+        seeding = ensure_seeded(args.db, args.users, args.videos)
+        storage_root = tempfile.mkdtemp(prefix="bench-storage-")
+        try:
+            for workers in args.workers:
+                port = free_port()
+                url = f"http://127.0.0.1:{port}"
+                server = start_server(args.db, workers, port, storage_root)
+                try:
+                    wait_until_ready(url)
+                    for endpoint, path in ENDPOINTS.items():
+                        # Warm up imports, connection pools and SQLite's page cache in every worker.
+                        measure(url, path, args.connections, args.clients, 1)
+                        results[endpoint][str(workers)] = measure(
+                            url, path, args.connections, args.clients, args.duration
+                        )
+                finally:
+                    stop_server(server)
+        finally:
+            shutil.rmtree(storage_root, ignore_errors=True)
+        for endpoint_results in results.values():
+            base = endpoint_results.get(str(args.workers[0]), {}).get("ops_per_second")
+            for result in endpoint_results.values():
+                if base:
+                    result["speedup"] = round(result["ops_per_second"] / base, 2)
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "connections": args.connections,
+            "clients": args.clients,
+            "duration": args.duration,
+            "users": args.users,
+            "videos": args.videos,
+            "seeding": seeding,
+        },
+        "results": {"throughput": results},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="./bench-throughput.db")
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--videos", type=int, default=10_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--connections", type=int, default=64, help="Concurrent keep-alive connections")
+    parser.add_argument("--clients", type=int, default=2, help="Load-generator processes")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per measurement")
+    parser.add_argument("--url", help="Measure an already running server instead of starting one")
+    parser.add_argument("--output", default="benchmark-throughput.json")
+    args = parser.parse_args()
+
+    report = run(args)
+    with open(args.output, "w") as output:
+        json.dump(report, output, indent=2)
+    for endpoint, endpoint_results in report["results"]["throughput"].items():
+        for workers, result in endpoint_results.items():
+            print(f"{endpoint:12} workers={workers:>8} {result['ops_per_second']:>10} req/s  "
+                  f"p50={result['p50_ms']}ms p99={result['p99_ms']}ms errors={result['errors']}")
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
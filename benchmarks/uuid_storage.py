@@ -0,0 +1,131 @@
+"""Index size and query time of UUID keys stored as 32 hex characters versus 16 bytes.
+
+Builds a SQLite database with the migrations, seeds it, and measures table and index sizes and the
+feed queries with binary keys (the current schema). It then downgrades the keys to hex text with the
+same migration that converts production databases and measures again.
+
+    python -m benchmarks.uuid_storage --users 10000 --videos 100000 --output uuid-storage.json
+"""
+import argparse
+import json
+import os
+import platform
+import tempfile
+import time
+from datetime import datetime
+
+from alembic import command
+from sqlalchemy import create_engine, text
+
+from app.cli import alembic_config
+from benchmarks.seed import seed
+from benchmarks.stats import git_commit, summarize
+
+OBJECTS = ["users", "videos", "ix_users_email", "ix_videos_shared_by_shared_at", "ix_videos_trending",
+           "sqlite_autoindex_users_1", "sqlite_autoindex_videos_1"]
+QUERIES = {
+    # The feed: newest videos joined to their sharer.
+    "feed": "SELECT videos.id, users.email FROM videos JOIN users ON videos.shared_by = users.id "
+            "ORDER BY videos.shared_at DESC LIMIT 10 OFFSET :offset",
+    "video_by_id": "SELECT videos.id, users.email FROM videos JOIN users ON videos.shared_by = users.id "
+                   "WHERE videos.id = :video_id",
+    "user_feed": "SELECT id FROM videos WHERE shared_by = :user_id ORDER BY shared_at DESC, id DESC LIMIT 10",
+}
+
+
+def migrate(url, revision, downgrade=False):
+    config = alembic_config()
+    config.set_main_option("sqlalchemy.url", url.replace("%", "%%"))
+    (command.downgrade if downgrade else command.upgrade)(config, revision)
+
+
+def object_sizes(engine):
+    with engine.connect() as connection:
+        rows = connection.execute(text("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name")).all()
+    sizes = dict(rows)
+    return {name: sizes.get(name, 0) for name in OBJECTS}
+
+
+def time_queries(engine, repeat):
+    results = {}
+    with engine.connect() as connection:
+        sample = "SELECT id FROM {} ORDER BY random() LIMIT :n"
+        video_ids = connection.execute(text(sample.format("videos")), {"n": repeat}).scalars()
+        user_ids = connection.execute(text(sample.format("users")), {"n": repeat}).scalars()
+        params = {
+            "feed": [{"offset": offset * 10} for offset in range(repeat)],
+            "video_by_id": [{"video_id": video_id} for video_id in video_ids],
+            "user_feed": [{"user_id": user_id} for user_id in user_ids],
+        }
+        for name, sql in QUERIES.items():
+            statement, samples = text(sql), []
+            for bound in params[name]:
+                start = time.perf_counter()
+                connection.execute(statement, bound).all()
+                samples.append(time.perf_counter() - start)
+            results[name] = summarize(samples)
+    return results
+
+
+def measure(url, repeat):
+    engine = create_engine(url)
+    try:
+        with engine.connect() as connection:
+            connection.exec_driver_sql("VACUUM")
+        return {"bytes": object_sizes(engine), "queries": time_queries(engine, repeat)}
+    finally:
+        engine.dispose()
+
+
+def run(args):
+    directory = tempfile.mkdtemp(prefix="bench-uuid-")
+    url = f"sqlite:///{os.path.join(directory, 'uuid.db')}"
+    migrate(url, "head")
+    engine = create_engine(url)
+    seeding = seed(engine, args.users, args.videos)
+    engine.dispose()
+
+    results = {"binary": measure(url, args.repeat)}
+    migrate(url, "0003", downgrade=True)
+    results["hex"] = measure(url, args.repeat)
+    os.remove(url[len("sqlite:///"):])
+    os.rmdir(directory)
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "users": args.users,
+            "videos": args.videos,
+            "repeat": args.repeat,
+            "seeding": seeding,
+        },
+        "results": {"uuid_storage": results},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--videos", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--output", default="benchmark-uuid-storage.json")
+    args = parser.parse_args()
+
+    report = run(args)
+    with open(args.output, "w") as output:
+        json.dump(report, output, indent=2)
+    results = report["results"]["uuid_storage"]
+    for name in OBJECTS:
+        hex_size, binary_size = results["hex"]["bytes"][name], results["binary"]["bytes"][name]
+        print(f"{name:32} hex={hex_size:>12,} B  binary={binary_size:>12,} B")
+    for name in QUERIES:
+        print(f"{name:32} hex p50={results['hex']['queries'][name]['p50_ms']}ms  "
+              f"binary p50={results['binary']['queries'][name]['p50_ms']}ms")
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import CHAR, NUMERIC, create_engine, pool
+from sqlalchemy_utils import UUIDType
+
+from app import models
+from app.config import settings
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = models.Base.metadata
+
+
+def database_url() -> str:
+    return config.get_main_option("sqlalchemy.url") or settings.DATABASE_URL
+
+
+def compare_type(context, inspected_column, metadata_column, inspected_type, metadata_type):
+    """SQLite reflects UUIDType's BINARY(16) as NUMERIC(16); compare UUID columns by storage instead."""
+    if context.dialect.name != "sqlite" or not isinstance(metadata_type, UUIDType):
+        return None
+    if metadata_type.binary:
+        return not (isinstance(inspected_type, NUMERIC) and inspected_type.precision == 16)
+    return not (isinstance(inspected_type, CHAR) and inspected_type.length == 32)
+
+
+def run_migrations_offline():
+    """Print the SQL instead of running it (`alembic upgrade head --sql`)."""
+    url = database_url()
+    context.configure(
+        url=url,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        compare_type=compare_type,
+        render_as_batch=url.startswith("sqlite"),
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    url = database_url()
+    # A private engine: the app's one may be instrumented for metrics and would outlive the command.
+    engine = create_engine(url, poolclass=pool.NullPool)
+    with engine.connect() as connection:
+        # One transaction per migration, so a migration can step out of it for CREATE INDEX CONCURRENTLY.
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            transaction_per_migration=True,
+            compare_type=compare_type,
+            render_as_batch=connection.dialect.name == "sqlite",
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+    engine.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
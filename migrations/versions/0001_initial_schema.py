@@ -0,0 +1,51 @@
+"""Initial schema: users and videos, as created by the original `create_all`
+
+Revision ID: 0001
+Revises:
+Create Date: 2024-09-01 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlalchemy_utils
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'users',
+        sa.Column('id', sqlalchemy_utils.UUIDType(binary=False), nullable=False),
+        sa.Column('email', sa.String(length=255), nullable=False),
+        sa.Column('password', sa.String(length=255), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+    op.create_table(
+        'videos',
+        sa.Column('id', sqlalchemy_utils.UUIDType(binary=False), nullable=False),
+        sa.Column('title', sa.String(length=255), nullable=False),
+        sa.Column('description', sa.String(length=255), nullable=True),
+        sa.Column('video_url', sa.String(length=255), nullable=False),
+        sa.Column('image_url', sa.String(length=255), nullable=False),
+        sa.Column('tags', sa.String(length=255), nullable=True),
+        sa.Column('shared_by', sqlalchemy_utils.UUIDType(binary=False), nullable=False),
+        sa.Column('likes', sa.Integer(), nullable=False),
+        sa.Column('dislikes', sa.Integer(), nullable=False),
+        sa.Column('shared_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['shared_by'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('videos')
+    op.drop_index('ix_users_email', table_name='users')
+    op.drop_table('users')
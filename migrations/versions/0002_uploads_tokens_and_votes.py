@@ -0,0 +1,121 @@
+"""Uploads, thumbnails, rate limits, refresh tokens, votes and their columns on users and videos
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2024-10-01 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlalchemy_utils
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Server defaults let existing rows take the new NOT NULL columns without a table rewrite.
+    op.add_column('users', sa.Column('token_version', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('users', sa.Column('video_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('videos', sa.Column('trending_score', sa.Float(), server_default='0', nullable=False))
+    op.execute(
+        'UPDATE users SET video_count = (SELECT count(*) FROM videos WHERE videos.shared_by = users.id)'
+    )
+
+    op.create_table(
+        'thumbnails',
+        sa.Column('source_key', sa.String(length=255), nullable=False),
+        sa.Column('width', sa.Integer(), nullable=False),
+        sa.Column('key', sa.String(length=255), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('source_key', 'width'),
+    )
+    op.create_table(
+        'uploads',
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('key', sa.String(length=255), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('sha256'),
+    )
+    op.create_table(
+        'upload_sessions',
+        sa.Column('id', sqlalchemy_utils.UUIDType(binary=False), nullable=False),
+        sa.Column('user_id', sqlalchemy_utils.UUIDType(binary=False), nullable=False),
+        sa.Column('filename', sa.String(length=255), nullable=False),
+        sa.Column('key', sa.String(length=255), nullable=False),
+        sa.Column('s3_upload_id', sa.String(length=1024), nullable=False),
+        sa.Column('length', sa.BigInteger(), nullable=False),
+        sa.Column('upload_offset', sa.BigInteger(), nullable=False),
+        sa.Column('parts', sa.Text(), nullable=False),
+        sa.Column('completed', sa.Boolean(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_upload_sessions_updated_at', 'upload_sessions', ['updated_at'])
+    op.create_table(
+        'rate_limit_buckets',
+        sa.Column('key', sa.String(length=255), nullable=False),
+        sa.Column('tokens', sa.Float(), nullable=False),
+        sa.Column('updated_at', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('key'),
+    )
+    op.create_table(
+        'refresh_tokens',
+        sa.Column('id', sqlalchemy_utils.UUIDType(binary=False), nullable=False),
+        sa.Column('user_id', sqlalchemy_utils.UUIDType(binary=False), nullable=False),
+        sa.Column('family_id', sqlalchemy_utils.UUIDType(binary=False), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.Column('used_at', sa.DateTime(), nullable=True),
+        sa.Column('revoked', sa.Boolean(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_refresh_tokens_family_id', 'refresh_tokens', ['family_id'])
+    op.create_index('ix_refresh_tokens_user_id', 'refresh_tokens', ['user_id'])
+    op.create_table(
+        'token_revocations',
+        sa.Column('user_id', sqlalchemy_utils.UUIDType(binary=False), nullable=False),
+        sa.Column('min_version', sa.Integer(), nullable=False),
+        sa.Column('revoked_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('user_id'),
+    )
+    op.create_index('ix_token_revocations_revoked_at', 'token_revocations', ['revoked_at'])
+    op.create_table(
+        'votes',
+        sa.Column('user_id', sqlalchemy_utils.UUIDType(binary=False), nullable=False),
+        sa.Column('video_id', sqlalchemy_utils.UUIDType(binary=False), nullable=False),
+        sa.Column('value', sa.SmallInteger(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.ForeignKeyConstraint(['video_id'], ['videos.id']),
+        sa.PrimaryKeyConstraint('user_id', 'video_id'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('votes')
+    op.drop_index('ix_token_revocations_revoked_at', table_name='token_revocations')
+    op.drop_table('token_revocations')
+    op.drop_index('ix_refresh_tokens_user_id', table_name='refresh_tokens')
+    op.drop_index('ix_refresh_tokens_family_id', table_name='refresh_tokens')
+    op.drop_table('refresh_tokens')
+    op.drop_table('rate_limit_buckets')
+    op.drop_index('ix_upload_sessions_updated_at', table_name='upload_sessions')
+    op.drop_table('upload_sessions')
+    op.drop_table('uploads')
+    op.drop_table('thumbnails')
+    with op.batch_alter_table('videos') as batch_op:
+        batch_op.drop_column('trending_score')
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('video_count')
+        batch_op.drop_column('token_version')
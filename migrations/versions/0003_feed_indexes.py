@@ -0,0 +1,54 @@
+"""Indexes for the feeds: videos by shared_at, by (shared_by, shared_at), by trending score and by tag
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2024-10-15 00:00:00
+
+On PostgreSQL the indexes are built with CREATE INDEX CONCURRENTLY, outside a transaction, so
+the videos table stays writable while they build. A concurrent build that fails leaves an
+INVALID index behind; drop it and rerun the migration.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ('ix_videos_shared_at', ['shared_at'], {}),
+    ('ix_videos_shared_by_shared_at', ['shared_by', 'shared_at', 'id'], {}),
+    ('ix_videos_trending', ['trending_score', 'id'], {}),
+    ('ix_videos_tags', ['tags'], {'postgresql_using': 'gin', 'postgresql_ops': {'tags': 'gin_trgm_ops'}}),
+]
+
+
+def is_postgresql() -> bool:
+    return op.get_context().dialect.name == 'postgresql'
+
+
+def upgrade() -> None:
+    if not is_postgresql():
+        for name, columns, options in INDEXES:
+            op.create_index(name, 'videos', columns, **options)
+        return
+
+    with op.get_context().autocommit_block():
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for name, columns, options in INDEXES:
+            op.create_index(name, 'videos', columns, postgresql_concurrently=True, if_not_exists=True, **options)
+
+
+def downgrade() -> None:
+    if not is_postgresql():
+        for name, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name='videos')
+        return
+
+    with op.get_context().autocommit_block():
+        for name, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name='videos', postgresql_concurrently=True, if_exists=True)
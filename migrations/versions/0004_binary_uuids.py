@@ -0,0 +1,85 @@
+"""Store UUID keys as 16 bytes instead of 32 hex characters
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2024-11-01 00:00:00
+
+PostgreSQL already stores these columns in its native uuid type, so this only changes SQLite
+databases. Rows are converted in place: each value is rewritten as bytes first, then the
+tables are rebuilt with BINARY(16) columns.
+"""
+import uuid
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy_utils
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+UUID_COLUMNS = {
+    'users': ['id'],
+    'videos': ['id', 'shared_by'],
+    'votes': ['user_id', 'video_id'],
+    'upload_sessions': ['id', 'user_id'],
+    'refresh_tokens': ['id', 'user_id', 'family_id'],
+    'token_revocations': ['user_id'],
+}
+NATIVE_DIALECTS = {'postgresql', 'cockroachdb', 'mssql'}
+
+
+def _hex_to_bytes(value):
+    return uuid.UUID(value).bytes if isinstance(value, str) else value
+
+
+def _bytes_to_hex(value):
+    return uuid.UUID(bytes=value).hex if isinstance(value, bytes) else value
+
+
+def _convert(function, table, columns):
+    assignments = ', '.join(f'{column} = {function}({column})' for column in columns)
+    op.execute(f'UPDATE {table} SET {assignments}')
+
+
+def _alter(table, columns, type_from, type_to):
+    # Alembic would CAST the copied values to the new type; SQLite gives BINARY(16) NUMERIC affinity,
+    # and the cast would turn the bytes into numbers. The values are already converted, copy them as is.
+    impl = op.get_context().impl
+    impl.cast_for_batch_migrate = lambda existing, existing_transfer, new_type: None
+    with op.batch_alter_table(table) as batch_op:
+        for column in columns:
+            batch_op.alter_column(column, existing_type=type_from, type_=type_to)
+
+
+def _check_dialect() -> bool:
+    """True when the columns need converting; raises for dialects this migration does not handle."""
+    dialect = op.get_context().dialect.name
+    if dialect in NATIVE_DIALECTS:
+        return False
+    if dialect != 'sqlite':
+        raise NotImplementedError(f'Converting UUID columns on {dialect} is not supported')
+    connection = op.get_bind().connection.driver_connection
+    connection.create_function('uuid_hex_to_bytes', 1, _hex_to_bytes, deterministic=True)
+    connection.create_function('uuid_bytes_to_hex', 1, _bytes_to_hex, deterministic=True)
+    return True
+
+
+def upgrade() -> None:
+    if not _check_dialect():
+        return
+    # A TEXT-affinity column stores blobs unchanged, so converting before the rebuild is safe.
+    for table, columns in UUID_COLUMNS.items():
+        _convert('uuid_hex_to_bytes', table, columns)
+        _alter(table, columns, sqlalchemy_utils.UUIDType(binary=False), sqlalchemy_utils.UUIDType(binary=True))
+
+
+def downgrade() -> None:
+    if not _check_dialect():
+        return
+    for table, columns in UUID_COLUMNS.items():
+        _alter(table, columns, sqlalchemy_utils.UUIDType(binary=True), sqlalchemy_utils.UUIDType(binary=False))
+        _convert('uuid_bytes_to_hex', table, columns)
@@ -0,0 +1,30 @@
+"""Processing status and HLS manifest of transcoded videos
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2024-11-15 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Nullable: videos shared before transcoding existed keep playing their original file.
+    op.add_column('videos', sa.Column('processing_status', sa.String(length=16), nullable=True))
+    op.add_column('videos', sa.Column('manifest_key', sa.String(length=255), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('videos') as batch_op:
+        batch_op.drop_column('manifest_key')
+        batch_op.drop_column('processing_status')
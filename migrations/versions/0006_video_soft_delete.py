@@ -0,0 +1,85 @@
+"""Soft delete of videos: deleted_at, feed indexes limited to live videos, and the reaper's index
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2024-12-01 00:00:00
+
+The feed indexes are rebuilt as partial indexes (WHERE deleted_at IS NULL). On PostgreSQL each
+new index is built concurrently under a temporary name and swapped in, so the feeds keep an
+index throughout; the reaper's index is built concurrently too.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+LIVE = sa.text('deleted_at IS NULL')
+DELETED = sa.text('deleted_at IS NOT NULL')
+FEED_INDEXES = [
+    ('ix_videos_shared_at', ['shared_at']),
+    ('ix_videos_trending', ['trending_score', 'id']),
+    ('ix_videos_shared_by_shared_at', ['shared_by', 'shared_at', 'id']),
+]
+
+
+def is_postgresql() -> bool:
+    return op.get_context().dialect.name == 'postgresql'
+
+
+def rebuild_feed_indexes(where) -> None:
+    options = {'sqlite_where': where, 'postgresql_where': where} if where is not None else {}
+    if not is_postgresql():
+        for name, columns in FEED_INDEXES:
+            op.drop_index(name, table_name='videos')
+            op.create_index(name, 'videos', columns, **options)
+        return
+
+    with op.get_context().autocommit_block():
+        for name, columns in FEED_INDEXES:
+            op.create_index(f'{name}_new', 'videos', columns, postgresql_concurrently=True, **options)
+            op.drop_index(name, table_name='videos', postgresql_concurrently=True)
+            op.execute(f'ALTER INDEX {name}_new RENAME TO {name}')
+
+
+def create_deleted_at_index() -> None:
+    if not is_postgresql():
+        op.create_index('ix_videos_deleted_at', 'videos', ['deleted_at'], sqlite_where=DELETED)
+        return
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_videos_deleted_at', 'videos', ['deleted_at'], postgresql_where=DELETED,
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def drop_deleted_at_index() -> None:
+    if not is_postgresql():
+        op.drop_index('ix_videos_deleted_at', table_name='videos')
+        return
+
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_videos_deleted_at', table_name='videos', postgresql_concurrently=True, if_exists=True)
+
+
+def upgrade() -> None:
+    op.add_column('videos', sa.Column('deleted_at', sa.DateTime(), nullable=True))
+    rebuild_feed_indexes(LIVE)
+    create_deleted_at_index()
+
+
+def downgrade() -> None:
+    # Without the column, videos waiting for the reaper would reappear in the feeds.
+    op.execute('DELETE FROM votes WHERE video_id IN (SELECT id FROM videos WHERE deleted_at IS NOT NULL)')
+    op.execute('DELETE FROM videos WHERE deleted_at IS NOT NULL')
+    drop_deleted_at_index()
+    rebuild_feed_indexes(None)
+    with op.batch_alter_table('videos') as batch_op:
+        batch_op.drop_column('deleted_at')
@@ -0,0 +1,30 @@
+"""Admin flag on users, replacing the ADMIN_EMAILS setting
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2024-12-10 00:00:00
+
+Admin rights used to follow the email address, and logging in with an unused address creates
+the account, so anyone could claim a listed address. Admins are now granted per account with
+`python -m app.cli grant-admin <email>`.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('is_admin', sa.Boolean(), nullable=False, server_default=sa.false()))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('is_admin')
@@ -0,0 +1,41 @@
+"""Deleted users' videos go to the reaper, and dedup hits are recorded on uploads
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2024-12-15 00:00:00
+
+Deleting a user now soft-deletes their videos instead of removing the rows, so the reaper purges
+them with their storage objects. The rows outlive the user, so `videos.shared_by` becomes
+nullable. `uploads.last_seen_at` is set when an upload is deduplicated onto an existing key; the
+reaper keeps keys seen recently, since a video sharing them may be on its way.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlalchemy_utils
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+GUID = sqlalchemy_utils.UUIDType(binary=True)
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('videos') as batch_op:
+        batch_op.alter_column('shared_by', existing_type=GUID, nullable=True)
+    op.add_column('uploads', sa.Column('last_seen_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('uploads') as batch_op:
+        batch_op.drop_column('last_seen_at')
+    # Videos of deleted users have no owner to go back to; purge them without waiting for the reaper.
+    op.execute('DELETE FROM votes WHERE video_id IN (SELECT id FROM videos WHERE shared_by IS NULL)')
+    op.execute('DELETE FROM videos WHERE shared_by IS NULL')
+    with op.batch_alter_table('videos') as batch_op:
+        batch_op.alter_column('shared_by', existing_type=GUID, nullable=False)
@@ -0,0 +1,30 @@
+"""Claim of the part a resumable upload PATCH is sending
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2024-12-20 00:00:00
+
+Two PATCHes at the same offset used to upload the same part number, so the loser's bytes could
+replace the winner's in S3 after the winner recorded its ETag. A PATCH now claims the part in
+`upload_sessions.claimed_at` before sending it.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0009'
+down_revision: Union[str, None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('upload_sessions', sa.Column('claimed_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('upload_sessions') as batch_op:
+        batch_op.drop_column('claimed_at')
@@ -1,14 +1,34 @@
+import os
+import tempfile
+
 import pytest
 import uuid
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 from fastapi.testclient import TestClient
-from app.main import app
-from app.database import Base, get_db
-import io
 
-from app.auth import create_access_token
+# Thumbnail generation and transcoding run in background pools; tests opt in explicitly.
+os.environ.setdefault("THUMBNAILS_ENABLED", "false")
+os.environ.setdefault("TRANSCODING_ENABLED", "false")
+# Limits are per client IP and every test client shares one; tests opt in explicitly.
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+# Scores are refreshed in a background pool; tests flush the refresher themselves.
+os.environ.setdefault("TRENDING_REFRESH_ENABLED", "false")
+# Deleted videos are purged by a background job; tests run the reaper themselves.
+os.environ.setdefault("REAPER_ENABLED", "false")
+# Objects go to a throwaway directory instead of S3.
+os.environ.setdefault("STORAGE_BACKEND", "local")
+os.environ.setdefault("LOCAL_STORAGE_ROOT", tempfile.mkdtemp(prefix="shareytb-storage-"))
+
+from app.main import app  # noqa: E402
+from app.database import Base, get_db, get_read_db  # noqa: E402
+import io  # noqa: E402
+
+from PIL import Image  # noqa: E402
+
+from app import models  # noqa: E402
+from app.auth import create_token_pair  # noqa: E402
 
 # SQLite database URL for testing
 SQLITE_DATABASE_URL = "sqlite:///./test_db.db"
@@ -50,6 +70,7 @@ def test_client(db_session):
             db_session.close()
 
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
     with TestClient(app) as test_client:
         yield test_client
 
@@ -85,14 +106,14 @@ def websocket_client():
 
 
 @pytest.fixture()
-def auth_token(test_client, user_payload):
+def auth_token(test_client, db_session, user_payload):
     # Create a user
     response = test_client.post("/api/users/", json=user_payload)
     assert response.status_code == 201
 
     # Generate token
-    access_token = create_access_token(data={"sub": user_payload["email"]})
-    return access_token
+    user = db_session.query(models.User).filter(models.User.email == user_payload["email"]).one()
+    return create_token_pair(db_session, user)["access_token"]
 
 
 @pytest.fixture()
@@ -130,9 +151,13 @@ def video_payload_updated():
 
 @pytest.fixture
 def sample_image():
-    return io.BytesIO(b"fake image content")
+    # Uploads are sniffed, so fixtures need real headers.
+    output = io.BytesIO()
+    Image.new("RGB", (4, 4)).save(output, format="PNG")
+    output.seek(0)
+    return output
 
 
 @pytest.fixture
 def sample_video():
-    return io.BytesIO(b"fake video content")
+    return io.BytesIO(b"\x00\x00\x00\x18ftypmp42\x00\x00\x00\x00mp42isom" + b"fake video content")
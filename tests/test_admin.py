@@ -0,0 +1,106 @@
+import csv
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app import models
+from app.auth import verify_password
+from app.config import settings
+from app.utils import bulk
+
+
+@pytest.fixture
+def admin_client(auth_client, db_session, user_payload):
+    db_session.query(models.User).filter(models.User.email == user_payload["email"]).update({"is_admin": True})
+    db_session.commit()
+    return auth_client
+
+
+@pytest.fixture(autouse=True)
+def thread_pool(monkeypatch):
+    # bcrypt in the test process; spawning workers would import the app again.
+    pool = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(bulk, "get_process_pool", lambda: pool)
+    yield
+    pool.shutdown()
+
+
+def test_admin_endpoints_require_admin(auth_client):
+    assert auth_client.get("/api/admin/users/export").status_code == 403
+    assert auth_client.post("/api/admin/users/import", content=b"").status_code == 403
+
+
+def test_account_created_at_login_is_not_admin(test_client):
+    # Logging in with an unused email creates the account; that must not grant anything.
+    login = test_client.post("/api/users/login", json={"email": "admin@example.com", "password": "password123"})
+    assert login.status_code == 200
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    assert test_client.get("/api/admin/users/export", headers=headers).status_code == 403
+
+
+def test_revoking_admin_takes_effect_at_once(admin_client, db_session):
+    assert admin_client.get("/api/admin/users/export").status_code == 200
+    db_session.query(models.User).update({"is_admin": False})
+    db_session.commit()
+    assert admin_client.get("/api/admin/users/export").status_code == 403
+
+
+def test_export_users_streams_ndjson_and_csv(admin_client, user_payload, monkeypatch):
+    monkeypatch.setattr(settings, "EXPORT_BATCH_SIZE", 1)
+    admin_client.post("/api/users/", json={"email": "other@example.com", "password": "password123"})
+
+    response = admin_client.get("/api/admin/users/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    users = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(user["email"] for user in users) == ["john.doe@example.com", "other@example.com"]
+    assert set(users[0]) == {"id", "email", "video_count"}
+
+    response = admin_client.get("/api/admin/users/export", params={"format": "csv"})
+    assert response.headers["content-disposition"] == 'attachment; filename="users.csv"'
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["email"] for row in rows] == [user["email"] for user in users]
+
+
+def test_export_videos(admin_client, video_payload):
+    admin_client.post("/api/videos/", json=video_payload)
+    response = admin_client.get("/api/admin/videos/export")
+    [video] = [json.loads(line) for line in response.text.splitlines()]
+    assert video["title"] == video_payload["title"]
+    assert video["likes"] == 0
+    assert video["shared_at"]
+
+
+def test_import_users_in_batches(admin_client, db_session, monkeypatch):
+    monkeypatch.setattr(settings, "IMPORT_BATCH_SIZE", 2)
+    lines = [
+        {"email": "a@example.com", "password": "password-a"},
+        {"email": "b@example.com", "password": "password-b"},
+        {"email": "john.doe@example.com", "password": "already-there"},
+        {"email": "c@example.com", "password": "password-c"},
+        {"email": "a@example.com", "password": "password-a"},
+        {"email": "not-an-email", "password": "password-d"},
+        {"email": "e@example.com", "password": "short"},
+    ]
+    body = "\n".join(json.dumps(line) for line in lines) + "\n{broken\n"
+
+    response = admin_client.post("/api/admin/users/import", content=body)
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["Imported"], report["Skipped"], report["Failed"]) == (3, 2, 3)
+    assert [error["line"] for error in report["Errors"]] == [6, 7, 8]
+    assert report["Errors"][0]["error"].startswith("email:")
+
+    user = db_session.query(models.User).filter(models.User.email == "c@example.com").one()
+    assert verify_password("password-c", user.password)
+    login = admin_client.post("/api/users/login", json={"email": "a@example.com", "password": "password-a"})
+    assert login.status_code == 200
+
+
+def test_import_users_csv(admin_client, db_session):
+    body = "email,password\nx@example.com,password-x\ny@example.com,password-y\n"
+    response = admin_client.post("/api/admin/users/import", params={"format": "csv"}, content=body)
+    assert response.json()["Imported"] == 2
+    assert db_session.query(models.User).filter(models.User.email.in_(["x@example.com", "y@example.com"])).count() == 2
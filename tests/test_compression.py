@@ -0,0 +1,81 @@
+import json
+
+import pytest
+from fastapi import FastAPI, WebSocket
+from fastapi.responses import Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.utils.compression import CompressionMiddleware, choose_encoding
+
+FEED = {"Videos": [{"id": index, "video_url": f"https://bucket.s3.amazonaws.com/videos/{index}.mp4"}
+                   for index in range(100)]}
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware)
+
+    @app.get("/feed")
+    def feed():
+        return FEED
+
+    @app.get("/small")
+    def small():
+        return {"status": "success"}
+
+    @app.get("/video")
+    def video():
+        return Response(b"\x00" * 4096, media_type="video/mp4", headers={"etag": '"abc"'})
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse((f"{index}\n" for index in range(1000)), media_type="application/x-ndjson")
+
+    @app.websocket("/ws")
+    async def ws(websocket: WebSocket):
+        await websocket.accept()
+        await websocket.send_text("hello")
+        await websocket.close()
+
+    return TestClient(app)
+
+
+def test_choose_encoding():
+    assert choose_encoding("gzip, deflate, br") == "br"
+    assert choose_encoding("gzip, br;q=0.5") == "gzip"
+    assert choose_encoding("br;q=0, gzip") == "gzip"
+    assert choose_encoding("*") == "br"
+    assert choose_encoding("identity") is None
+    assert choose_encoding("") is None
+
+
+@pytest.mark.parametrize("accept, encoding", [("br, gzip", "br"), ("gzip", "gzip")])
+def test_json_is_compressed(client, accept, encoding):
+    response = client.get("/feed", headers={"Accept-Encoding": accept})
+    assert response.headers["content-encoding"] == encoding
+    assert "accept-encoding" in response.headers["vary"].lower()
+    assert int(response.headers["content-length"]) < len(json.dumps(FEED)) / 4
+    assert response.json() == FEED
+
+
+def test_small_and_binary_responses_pass_through(client):
+    small = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+    video = client.get("/video", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in video.headers
+    assert video.headers["etag"] == '"abc"'
+    identity = client.get("/feed", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in identity.headers
+
+
+def test_streamed_body_is_compressed_chunk_by_chunk(client):
+    response = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert response.text == "".join(f"{index}\n" for index in range(1000))
+
+
+def test_websockets_are_untouched(client):
+    with client.websocket_connect("/ws", headers={"Accept-Encoding": "gzip"}) as websocket:
+        assert websocket.receive_text() == "hello"
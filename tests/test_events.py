@@ -0,0 +1,86 @@
+import asyncio
+import json
+
+import pytest
+
+from app.api.events import format_event, stream_events
+from app.api.websockets import ConnectionManager, EventStream
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    manager = ConnectionManager()
+    monkeypatch.setattr("app.api.events.websocketsManager", manager)
+    return manager
+
+
+def test_format_event():
+    assert format_event('{"type": "newVideo"}', 7) == 'id: 7\ndata: {"type": "newVideo"}\n\n'
+    assert format_event("two\nlines") == "data: two\ndata: lines\n\n"
+
+
+def test_stream_replays_after_last_event_id_then_goes_live(manager):
+    async def run():
+        await manager.publish(["feed"], "first")
+        await manager.publish(["tag:music"], "other channel")
+        await manager.publish(["feed"], "second")
+        first_id = manager.history[0][0]
+
+        stream = EventStream()
+        events = stream_events(stream, ["feed"], first_id)
+        assert (await events.__anext__()).startswith("retry:")
+        assert await events.__anext__() == format_event("second", manager.history[2][0])
+        assert manager.presence("feed") == 1
+
+        await manager.publish(["feed"], "live")
+        assert await events.__anext__() == format_event("live", manager.last_event_id)
+        await events.aclose()
+        assert manager.presence("feed") == 0
+
+    asyncio.run(run())
+
+
+def test_stream_sends_heartbeat_when_idle(manager, monkeypatch):
+    monkeypatch.setattr("app.api.events.settings.SSE_HEARTBEAT_SECONDS", 0.01)
+
+    async def run():
+        events = stream_events(EventStream(), ["feed"], None)
+        await events.__anext__()
+        assert await events.__anext__() == ": ping\n\n"
+        await events.aclose()
+
+    asyncio.run(run())
+
+
+def test_slow_stream_is_dropped_and_ends(manager, monkeypatch):
+    monkeypatch.setattr("app.api.websockets.settings.SSE_QUEUE_SIZE", 1)
+
+    async def run():
+        stream = EventStream()
+        events = stream_events(stream, ["feed"], None)
+        await events.__anext__()
+        await manager.publish(["feed"], "kept")
+        await manager.publish(["feed"], "overflow")
+        assert manager.presence("feed") == 0
+        assert [event async for event in events] == [format_event("kept", manager.history[0][0])]
+
+    asyncio.run(run())
+
+
+def test_drain_ends_streams(manager):
+    async def run():
+        events = stream_events(EventStream(), ["feed"], None)
+        await events.__anext__()
+        await manager.drain()
+        remaining = [event async for event in events]
+        assert len(remaining) == 1
+        assert json.loads(remaining[0].removeprefix("data: "))["type"] == "reconnect"
+
+    asyncio.run(run())
+
+
+def test_event_stream_refused_while_draining(test_client, monkeypatch):
+    monkeypatch.setattr("app.api.events.websocketsManager.draining", True)
+    response = test_client.get("/api/events")
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
@@ -0,0 +1,171 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.utils import jobs
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(jobs, "JOBS", {})
+    monkeypatch.setattr(jobs.settings, "JOB_RETRY_BACKOFF_SECONDS", 0.01)
+    return jobs.JOBS
+
+
+def test_failed_job_is_retried_until_it_succeeds(registry):
+    calls, done = [], threading.Event()
+
+    def flaky(value):
+        calls.append(value)
+        if len(calls) < 3:
+            raise RuntimeError("try again")
+        done.set()
+
+    jobs.register("flaky", flaky, max_attempts=3)
+    runner = jobs.JobRunner(workers=2, queue_size=10)
+    try:
+        assert runner.enqueue("flaky", "x")
+        assert done.wait(5)
+    finally:
+        runner.shutdown()
+    assert calls == ["x", "x", "x"]
+
+
+def test_job_gives_up_after_max_attempts(registry, caplog):
+    calls = []
+    jobs.register("broken", lambda: calls.append(1) or 1 / 0, max_attempts=2)
+    runner = jobs.JobRunner(workers=1, queue_size=10)
+    try:
+        runner.enqueue("broken")
+        for _ in range(500):
+            if "failed after 2 attempts" in caplog.text:
+                break
+            threading.Event().wait(0.01)
+    finally:
+        runner.shutdown()
+    assert calls == [1, 1]
+    assert "failed after 2 attempts" in caplog.text
+
+
+def test_full_queue_drops_jobs(registry):
+    release = threading.Event()
+    jobs.register("block", release.wait)
+    runner = jobs.JobRunner(workers=1, queue_size=1)
+    try:
+        assert runner.enqueue("block")
+        # The worker may not have taken the first job yet; either way the queue fills up.
+        results = [runner.enqueue("block") for _ in range(3)]
+        assert False in results
+        with pytest.raises(KeyError):
+            runner.enqueue("missing")
+    finally:
+        release.set()
+        runner.shutdown()
+
+
+def test_process_jobs_run_on_the_process_pool(registry, monkeypatch):
+    pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fake-process")
+    monkeypatch.setattr(jobs, "get_process_pool", lambda: pool)
+    threads, done = [], threading.Event()
+    jobs.register("cpu", lambda: threads.append(threading.current_thread().name) or done.set(), process=True)
+    runner = jobs.JobRunner(workers=1, queue_size=10)
+    try:
+        runner.enqueue("cpu")
+        assert done.wait(5)
+    finally:
+        runner.shutdown()
+        pool.shutdown()
+    assert threads[0].startswith("fake-process")
+
+
+def test_store_keeps_unfinished_jobs_for_the_next_start(registry, tmp_path):
+    path = str(tmp_path / "jobs.db")
+    started, release = threading.Event(), threading.Event()
+    jobs.register("block", lambda: started.set() or release.wait(), persist=False)
+    jobs.register("later", lambda: None)
+    runner = jobs.JobRunner(workers=1, queue_size=10, store=jobs.JobStore(path))
+    runner.enqueue("block")
+    assert started.wait(5)
+    runner.enqueue("later")
+    runner.enqueue("later")
+    runner.shutdown(wait=False)
+    release.set()
+    runner._executor.shutdown(wait=True)
+
+    seen, done = [], threading.Event()
+    jobs.register("later", lambda: seen.append(1) or (len(seen) == 2 and done.set()))
+    store = jobs.JobStore(path)
+    assert [job.name for job in store.pending()] == ["later", "later"]
+    runner = jobs.JobRunner(workers=1, queue_size=10, store=store)
+    try:
+        assert done.wait(5)
+    finally:
+        runner.shutdown()
+    assert jobs.JobStore(path).pending() == []
+
+
+def test_jobs_in_their_own_lane_do_not_hold_up_the_rest(registry):
+    release, done = threading.Event(), threading.Event()
+    jobs.register("encode", release.wait, lane="encode")
+    jobs.register("quick", done.set)
+    runner = jobs.JobRunner(workers=1, queue_size=10, lanes={"encode": 1})
+    try:
+        runner.enqueue("encode")
+        runner.enqueue("encode")
+        assert runner.enqueue("quick")
+        assert done.wait(5)
+    finally:
+        release.set()
+        runner.shutdown()
+
+
+def test_leased_jobs_are_only_claimed_once_their_owner_stops(registry, tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs.settings, "JOB_LEASE_SECONDS", 0.3)
+    path = str(tmp_path / "jobs.db")
+    calls, release = [], threading.Event()
+    jobs.register("encode", lambda: calls.append(1) or release.wait())
+    first = jobs.JobRunner(workers=1, queue_size=10, store=jobs.JobStore(path))
+    first.enqueue("encode")
+    second = jobs.JobRunner(workers=1, queue_size=10, store=jobs.JobStore(path))
+    try:
+        # Several lease periods: the first runner keeps renewing, so the second leaves the job alone.
+        threading.Event().wait(1)
+        assert calls == [1]
+
+        # As if the first process died: its lease runs out and the second one takes the job over.
+        first._stopped.set()
+        for _ in range(300):
+            if len(calls) == 2:
+                break
+            threading.Event().wait(0.01)
+        assert calls == [1, 1]
+    finally:
+        release.set()
+        first.shutdown()
+        second.shutdown()
+
+
+def test_persisted_job_dropped_from_a_full_queue_runs_later(registry, tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs.settings, "JOB_LEASE_SECONDS", 0.3)
+    release, ran = threading.Event(), []
+    done = threading.Event()
+    jobs.register("block", release.wait)
+    jobs.register("record", lambda name: ran.append(name) or (len(ran) == 2 and done.set()))
+    runner = jobs.JobRunner(workers=1, queue_size=1, store=jobs.JobStore(str(tmp_path / "jobs.db")))
+    try:
+        runner.enqueue("block")
+        for _ in range(300):
+            if runner.depth() == 0:
+                break
+            threading.Event().wait(0.01)
+        assert runner.enqueue("record", "a")
+        assert not runner.enqueue("record", "b")
+
+        release.set()
+        assert done.wait(5)
+        assert sorted(ran) == ["a", "b"]
+        assert runner.store.pending() == []
+    finally:
+        release.set()
+        runner.shutdown()
@@ -0,0 +1,159 @@
+import asyncio
+import io
+import os
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import media
+from app.utils.media import MediaCache, MediaResponse, get_media_cache, parse_range
+from app.utils.storage import AsyncStorage, LocalStorage
+
+
+class CountingStorage(LocalStorage):
+    def __init__(self, root):
+        super().__init__(root)
+        self.downloads = []
+
+    def download_fileobj(self, key, fileobj):
+        self.downloads.append(key)
+        super().download_fileobj(key, fileobj)
+
+
+@pytest.fixture
+def upstream(tmp_path):
+    storage = CountingStorage(str(tmp_path / "bucket"))
+    storage.put_bytes(bytes(range(256)) * 4, "videos/a.mp4", "video/mp4")
+    return storage
+
+
+@pytest.fixture
+def cache(tmp_path, upstream):
+    return MediaCache(str(tmp_path / "cache"), 10_000, storage=AsyncStorage(upstream, max_workers=4))
+
+
+@pytest.fixture
+def client(cache):
+    app = FastAPI()
+    app.include_router(media.router, prefix="/media")
+    app.dependency_overrides[get_media_cache] = lambda: cache
+    with TestClient(app) as client:
+        yield client
+
+
+def test_parse_range():
+    assert parse_range(None, 100) is None
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=50-1000", 100) == (50, 99)
+    assert parse_range("bytes=0-1,5-6", 100) is None
+    assert parse_range("items=0-1", 100) is None
+    with pytest.raises(ValueError):
+        parse_range("bytes=100-", 100)
+
+
+def test_media_serves_ranges_from_cache(client, upstream):
+    body = bytes(range(256)) * 4
+
+    response = client.get("/media/videos/a.mp4")
+    assert response.status_code == 200
+    assert response.content == body
+    assert response.headers["content-type"] == "video/mp4"
+    assert response.headers["accept-ranges"] == "bytes"
+
+    response = client.get("/media/videos/a.mp4", headers={"Range": "bytes=10-19"})
+    assert response.status_code == 206
+    assert response.content == body[10:20]
+    assert response.headers["content-range"] == "bytes 10-19/1024"
+    assert response.headers["content-length"] == "10"
+
+    response = client.get("/media/videos/a.mp4", headers={"Range": "bytes=2000-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == "bytes */1024"
+
+    etag = client.head("/media/videos/a.mp4").headers["etag"]
+    assert client.get("/media/videos/a.mp4", headers={"If-None-Match": etag}).status_code == 304
+    assert upstream.downloads == ["videos/a.mp4"]
+
+
+def test_media_missing_object(client):
+    assert client.get("/media/videos/missing.mp4").status_code == 404
+    assert client.get("/media/videos/../secret").status_code == 404
+
+
+def test_concurrent_misses_share_one_download(cache, upstream):
+    async def read():
+        file = await cache.open("videos/a.mp4")
+        with file:
+            return file.read()
+
+    async def run():
+        return await asyncio.gather(*[read() for _ in range(10)])
+
+    assert len(set(asyncio.run(run()))) == 1
+    assert upstream.downloads == ["videos/a.mp4"]
+
+
+def test_cache_evicts_least_recently_used(tmp_path, upstream):
+    for name in ("b", "c"):
+        upstream.put_bytes(b"x" * 600, f"videos/{name}.mp4", "video/mp4")
+    cache = MediaCache(str(tmp_path / "cache"), 2000, storage=AsyncStorage(upstream, max_workers=1))
+
+    async def touch(key):
+        (await cache.open(key)).close()
+
+    async def run():
+        await touch("videos/b.mp4")
+        os.utime(cache.path("videos/b.mp4"), (1, 1))
+        await touch("videos/c.mp4")
+        os.utime(cache.path("videos/c.mp4"), (2, 2))
+        await touch("videos/b.mp4")
+        await touch("videos/a.mp4")
+
+    asyncio.run(run())
+    assert os.path.exists(cache.path("videos/a.mp4"))
+    assert os.path.exists(cache.path("videos/b.mp4"))
+    assert not os.path.exists(cache.path("videos/c.mp4"))
+
+
+def test_media_response_uses_zero_copy_send_when_the_server_offers_it(tmp_path):
+    path = tmp_path / "object"
+    path.write_bytes(b"0123456789")
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    file = open(path, "rb")
+    # A fake server; uvicorn never offers the extension.
+    scope = {"type": "http", "method": "GET", "extensions": {"http.response.zerocopysend": {}}}
+    asyncio.run(MediaResponse(file, 2, 5, status_code=206)(scope, None, send))
+
+    assert messages[1]["type"] == "http.response.zerocopysend"
+    assert (messages[1]["offset"], messages[1]["count"]) == (2, 5)
+    assert file.closed
+
+
+def test_media_response_reads_chunks_without_zero_copy_send(tmp_path, monkeypatch):
+    path = tmp_path / "object"
+    path.write_bytes(b"0123456789")
+    monkeypatch.setattr(MediaResponse, "chunk_size", 2)
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    file = open(path, "rb")
+    asyncio.run(MediaResponse(file, 2, 5, status_code=206)({"type": "http", "method": "GET"}, None, send))
+
+    assert [message["body"] for message in messages[1:]] == [b"23", b"45", b"6"]
+    assert [message["more_body"] for message in messages[1:]] == [True, True, False]
+    assert file.closed
+
+
+def test_local_storage_download_fileobj(upstream):
+    target = io.BytesIO()
+    upstream.download_fileobj("videos/a.mp4", target)
+    assert len(target.getvalue()) == 1024
@@ -0,0 +1,68 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app.api.websockets import websocketsManager
+from app.config import settings
+from app.utils import metrics
+from tests.conftest import engine
+
+
+def build_app():
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    def read_item(item_id: int):
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+            connection.execute(text("SELECT 2"))
+        return {"id": item_id}
+
+    metrics.setup_metrics(app, engine)
+    return app
+
+
+def sample(name, labels):
+    return metrics.registry.get_sample_value(name, labels)
+
+
+def test_metrics_endpoint_exposes_route_latency():
+    client = TestClient(build_app())
+    before = sample("http_request_duration_seconds_count",
+                    {"method": "GET", "route": "/items/{item_id}", "status": "200"}) or 0
+
+    assert client.get("/items/1").status_code == 200
+    assert client.get("/items/2").status_code == 200
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert 'route="/items/{item_id}"' in response.text
+    assert sample("http_request_duration_seconds_count",
+                  {"method": "GET", "route": "/items/{item_id}", "status": "200"}) == before + 2
+
+
+def test_metrics_counts_sql_statements_per_request():
+    client = TestClient(build_app())
+    before = sample("http_request_sql_statements_sum", {"route": "/items/{item_id}"}) or 0
+
+    client.get("/items/1")
+
+    assert sample("http_request_sql_statements_sum", {"route": "/items/{item_id}"}) == before + 2
+
+
+def test_metrics_unmatched_route_label():
+    client = TestClient(build_app())
+    assert client.get("/does-not-exist").status_code == 404
+    assert sample("http_request_duration_seconds_count",
+                  {"method": "GET", "route": "unmatched", "status": "404"}) >= 1
+
+
+def test_metrics_websocket_gauge(monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_ENABLED", True)
+    connection = object()
+    websocketsManager.attach(connection, [])
+    try:
+        assert sample("websocket_active_connections", {}) == len(websocketsManager.active_connections)
+    finally:
+        websocketsManager.disconnect(connection)
+    assert sample("websocket_active_connections", {}) == len(websocketsManager.active_connections)
@@ -0,0 +1,55 @@
+import logging
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app.config import settings
+from app.utils import profiler
+from tests.conftest import engine
+
+
+def build_app():
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    def read_item(item_id: int):
+        with engine.connect() as connection:
+            connection.execute(text("SELECT :item_id"), {"item_id": item_id})
+            connection.execute(text("SELECT 2"))
+        return {"id": item_id}
+
+    profiler.setup_profiler(app, engine)
+    return app
+
+
+def test_profiler_headers_and_breakdown():
+    client = TestClient(build_app())
+    response = client.get("/items/7")
+    assert response.status_code == 200
+    assert response.headers["x-query-count"] == "2"
+    assert float(response.headers["x-query-time-ms"]) >= 0
+    assert response.headers["server-timing"].startswith("db;dur=")
+
+    request_id = response.headers["x-request-id"]
+    breakdown = client.get(f"/api/debug/queries/{request_id}").json()
+    assert breakdown["route"] == "GET /items/{item_id}"
+    assert breakdown["query_count"] == 2
+    assert breakdown["queries"][0]["statement"] == "SELECT ?"
+    assert "7" in breakdown["queries"][0]["parameters"]
+
+
+def test_profiler_unknown_request_id():
+    client = TestClient(build_app())
+    assert client.get("/api/debug/queries/unknown").status_code == 404
+
+
+def test_profiler_logs_slow_queries_with_plan(monkeypatch, caplog):
+    monkeypatch.setattr(settings, "SLOW_QUERY_THRESHOLD_MS", 0.0)
+    client = TestClient(build_app())
+    with caplog.at_level(logging.WARNING, logger="app.sql.slow"):
+        client.get("/items/3")
+
+    slow = [record.getMessage() for record in caplog.records if record.name == "app.sql.slow"]
+    assert any("GET /items/{item_id}" in message and "SELECT ?" in message for message in slow)
+    assert all("plan=" in message for message in slow)
@@ -0,0 +1,154 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.api import user
+from app.config import settings
+from app.database import Base
+from app.utils import ratelimit
+
+PASSWORD = "securepassword123"
+
+
+def test_parse_rate():
+    assert ratelimit.parse_rate("10/minute") == (10, 10 / 60)
+    assert ratelimit.parse_rate("5/Second") == (5, 5.0)
+    with pytest.raises(ValueError):
+        ratelimit.parse_rate("10/fortnight")
+
+
+def test_memory_bucket_allows_burst_then_refills():
+    backend = ratelimit.MemoryBackend()
+    capacity, refill = ratelimit.parse_rate("2/minute")
+    assert backend.hit("k", capacity, refill, now=0) == 0
+    assert backend.hit("k", capacity, refill, now=0) == 0
+    assert backend.hit("k", capacity, refill, now=0) == pytest.approx(30)
+    assert backend.hit("k", capacity, refill, now=30) == 0
+    assert backend.hit("other", capacity, refill, now=30) == 0
+
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = ratelimit.MemoryBackend(max_keys=2)
+    for key in ("a", "b", "c"):
+        backend.hit(key, 1, 1.0, now=0)
+    assert backend.hit("a", 1, 1.0, now=0) == 0
+    assert backend.hit("c", 1, 1.0, now=0) > 0
+
+
+@pytest.fixture
+def database_backend(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'ratelimit.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    yield ratelimit.DatabaseBackend(sessionmaker(bind=engine))
+    engine.dispose()
+
+
+def test_database_bucket_allows_burst_then_refills(database_backend):
+    capacity, refill = ratelimit.parse_rate("2/minute")
+    assert database_backend.hit("k", capacity, refill, now=100) == 0
+    assert database_backend.hit("k", capacity, refill, now=100) == 0
+    assert database_backend.hit("k", capacity, refill, now=100) == pytest.approx(30)
+    assert database_backend.hit("k", capacity, refill, now=130) == 0
+    # Refill is capped at the bucket capacity.
+    assert database_backend.hit("k", capacity, refill, now=10_000) == 0
+    assert database_backend.hit("k", capacity, refill, now=10_000) == 0
+    assert database_backend.hit("k", capacity, refill, now=10_000) > 0
+
+
+def test_database_bucket_refusal_always_asks_to_wait(database_backend):
+    capacity, refill = ratelimit.parse_rate("2/minute")
+    database_backend.hit("k", capacity, refill, now=100)
+    database_backend.hit("k", capacity, refill, now=100)
+    factory = database_backend.session_factory
+
+    def refilled_meanwhile():
+        # Another worker writes a full bucket between this one's failed UPDATE and its read.
+        db = factory()
+        rollback = db.rollback
+
+        def rollback_then_refill():
+            rollback()
+            with factory() as other:
+                other.query(models.RateLimitBucket).update({models.RateLimitBucket.tokens: capacity})
+                other.commit()
+
+        db.rollback = rollback_then_refill
+        return db
+
+    database_backend.session_factory = refilled_meanwhile
+    assert database_backend.hit("k", capacity, refill, now=100) == 1
+
+
+def test_database_bucket_is_atomic_across_callers(database_backend):
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: database_backend.hit("shared", 5, 0.001, now=0), range(20)))
+    assert results.count(0) == 5
+
+
+@pytest.fixture
+def limits(monkeypatch):
+    backend = ratelimit.MemoryBackend()
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(ratelimit, "get_rate_limit_backend", lambda: backend)
+    return backend
+
+
+def test_login_rate_limited_per_ip(test_client, limits, monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_LOGIN", "2/minute")
+    for index in range(2):
+        response = test_client.post("/api/users/login", json={"email": f"u{index}@example.com", "password": PASSWORD})
+        assert response.status_code == 200
+
+    response = test_client.post("/api/users/login", json={"email": "u3@example.com", "password": PASSWORD})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+def test_login_rate_limited_per_account(test_client, limits, monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_LOGIN_ACCOUNT", "1/hour")
+    payload = {"email": "victim@example.com", "password": PASSWORD}
+    assert test_client.post("/api/users/login", json=payload).status_code == 200
+    assert test_client.post("/api/users/login", json=payload).status_code == 429
+
+
+def test_create_video_rate_limited_per_user(auth_client, video_payload, limits, monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_CREATE_VIDEO", "1/minute")
+    assert auth_client.post("/api/videos", json=video_payload).status_code == 201
+    assert auth_client.post("/api/videos", json=video_payload).status_code == 429
+
+
+def test_login_sheds_load_when_bcrypt_is_saturated(test_client, monkeypatch):
+    limiter = ratelimit.ConcurrencyLimiter("bcrypt", 1, timeout=0.01)
+    monkeypatch.setattr(user, "bcrypt_limiter", limiter)
+    holding, release = threading.Event(), threading.Event()
+
+    def hold_slot():
+        with limiter.slot():
+            holding.set()
+            release.wait(5)
+
+    worker = threading.Thread(target=hold_slot)
+    worker.start()
+    try:
+        holding.wait(5)
+        response = test_client.post("/api/users/login", json={"email": "busy@example.com", "password": PASSWORD})
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+    finally:
+        release.set()
+        worker.join()
+
+    response = test_client.post("/api/users/login", json={"email": "busy@example.com", "password": PASSWORD})
+    assert response.status_code == 200
+
+
+def test_upload_sheds_load_when_saturated(auth_client, sample_video, monkeypatch):
+    limiter = ratelimit.ConcurrencyLimiter("upload", 1)
+    monkeypatch.setattr(ratelimit, "upload_limiter", limiter)
+    with limiter.slot():
+        response = auth_client.post("/api/uploads/video", files={"file": ("a.mp4", sample_video, "video/mp4")})
+    assert response.status_code == 503
@@ -0,0 +1,122 @@
+import os
+import threading
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+
+from app import models
+from app.utils import reaper
+from app.utils.storage import LocalStorage
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    storage = LocalStorage(str(tmp_path))
+    monkeypatch.setattr(reaper, "get_storage", lambda: storage)
+    return storage
+
+
+def share(auth_client, video_payload, video_url, image_url):
+    video_payload.update(video_url=video_url, image_url=image_url)
+    response = auth_client.post("/api/videos/", json=video_payload)
+    assert response.status_code == 201
+    return response.json()["Video"]["id"]
+
+
+def test_deleted_video_is_hidden_everywhere(auth_client, db_session, video_payload):
+    video_id = share(auth_client, video_payload, "videos/a.mp4", "images/a.png")
+    user_id = db_session.query(models.User.id).scalar()
+    auth_client.post(f"/api/videos/{video_id}/vote", json={"value": 1})
+
+    assert auth_client.delete(f"/api/videos/{video_id}").status_code == 204
+
+    assert auth_client.get(f"/api/videos/{video_id}").status_code == 404
+    assert auth_client.delete(f"/api/videos/{video_id}").status_code == 404
+    assert auth_client.post(f"/api/videos/{video_id}/vote", json={"value": -1}).status_code == 404
+    assert auth_client.get("/api/videos").json()["Videos"] == []
+    assert auth_client.get("/api/videos/trending").json()["Videos"] == []
+    assert auth_client.get(f"/api/users/{user_id}/videos").json()["Videos"] == []
+    # Kept, with its votes, until the reaper purges it.
+    video = db_session.query(models.Video).one()
+    assert video.deleted_at is not None
+    assert db_session.query(models.Vote).count() == 1
+    assert db_session.get(models.User, video.shared_by).video_count == 0
+
+
+def test_reaper_purges_rows_and_orphaned_objects(auth_client, db_session, video_payload, storage):
+    for key in ("videos/a.mp4", "images/a.png", "images/shared.png", "thumbnails/images/a_160w.webp",
+                "hls/videos/a/master.m3u8", "hls/videos/a/360p/segment_000.ts"):
+        storage.put_bytes(b"data", key, "application/octet-stream")
+    db_session.add(models.Upload(sha256="a" * 64, key="videos/a.mp4", size=4))
+    db_session.add(models.Thumbnail(source_key="images/a.png", width=160, key="thumbnails/images/a_160w.webp"))
+    db_session.commit()
+    deleted = share(auth_client, video_payload, "videos/a.mp4", "images/a.png")
+    other = share(auth_client, video_payload, "videos/b.mp4", "images/shared.png")
+    shared = share(auth_client, video_payload, "https://example.com/c.mp4", "images/shared.png")
+    auth_client.post(f"/api/videos/{deleted}/vote", json={"value": 1})
+    for video_id in (deleted, shared):
+        auth_client.delete(f"/api/videos/{video_id}")
+
+    assert reaper.reap_videos(db_session) == 0
+    assert reaper.reap_videos(db_session, now=datetime.utcnow() + timedelta(days=2)) == 2
+
+    assert [str(video.id) for video in db_session.query(models.Video)] == [other]
+    assert db_session.query(models.Vote).count() == 0
+    assert db_session.query(models.Upload).count() == 0
+    assert db_session.query(models.Thumbnail).count() == 0
+    assert sorted(storage.list_keys("")) == ["images/shared.png"]
+
+
+def test_reaper_keeps_rows_when_objects_fail_to_delete(auth_client, db_session, video_payload, storage):
+    share(auth_client, video_payload, "videos/a.mp4", "images/a.png")
+    video_id = db_session.query(models.Video.id).scalar()
+    auth_client.delete(f"/api/videos/{video_id}")
+
+    with patch.object(storage, "delete_objects", return_value=["videos/a.mp4"]):
+        assert reaper.reap_videos(db_session, now=datetime.utcnow() + timedelta(days=2)) == 0
+    assert db_session.query(models.Video).count() == 1
+
+
+def test_reaper_keeps_objects_an_upload_was_just_deduplicated_onto(auth_client, db_session, video_payload, storage):
+    storage.put_bytes(b"data", "videos/a.mp4", "video/mp4")
+    db_session.add(models.Upload(sha256="a" * 64, key="videos/a.mp4", size=4, last_seen_at=datetime.utcnow()))
+    db_session.commit()
+    video_id = share(auth_client, video_payload, "videos/a.mp4", "https://example.com/a.png")
+    auth_client.delete(f"/api/videos/{video_id}")
+    db_session.query(models.Video).update({models.Video.deleted_at: datetime.utcnow() - timedelta(days=2)})
+    db_session.commit()
+
+    # The row goes; the object and its index entry stay for the video about to share them again.
+    assert reaper.reap_videos(db_session) == 1
+    assert db_session.query(models.Video).count() == 0
+    assert db_session.query(models.Upload).count() == 1
+    assert list(storage.list_keys("videos/")) == ["videos/a.mp4"]
+
+
+def test_reaper_runs_periodically(monkeypatch):
+    monkeypatch.setattr(reaper.settings, "REAPER_ENABLED", True)
+    monkeypatch.setattr(reaper.settings, "REAPER_INTERVAL_SECONDS", 0.01)
+    queued = threading.Semaphore(0)
+    monkeypatch.setattr(reaper.jobs, "enqueue", lambda name: queued.release())
+    reaper.start_reaper()
+    try:
+        assert queued.acquire(timeout=5)
+        assert queued.acquire(timeout=5)
+    finally:
+        reaper.stop_reaper()
+
+
+def test_delete_keys_batches_calls(storage):
+    calls = []
+    with patch.object(storage, "delete_objects", side_effect=lambda keys: calls.append(len(keys)) or []):
+        assert reaper.delete_keys(f"videos/{index}.mp4" for index in range(2500)) == []
+    assert calls == [1000, 1000, 500]
+
+
+def test_local_storage_lists_and_deletes(storage):
+    storage.put_bytes(b"x", "hls/videos/a/master.m3u8", "application/vnd.apple.mpegurl")
+    storage.put_bytes(b"x", "hls/videos/ab/master.m3u8", "application/vnd.apple.mpegurl")
+    assert list(storage.list_keys("hls/videos/a/")) == ["hls/videos/a/master.m3u8"]
+    assert storage.delete_objects(["hls/videos/a/master.m3u8", "videos/missing.mp4"]) == []
+    assert not os.path.exists(storage.path("hls/videos/a/master.m3u8"))
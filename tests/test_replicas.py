@@ -0,0 +1,100 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.auth import create_token_pair
+from app.config import settings
+from app.database import PRIMARY_COOKIE, Base, ReadSessionLocal, dispose_engine, get_engine, get_replica_engines
+from app.main import app
+
+
+def make_database(path):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+@pytest.fixture
+def databases(tmp_path, monkeypatch):
+    """A primary and a replica as two SQLite files; nothing replicates between them."""
+    primary, replica = make_database(tmp_path / "primary.db"), make_database(tmp_path / "replica.db")
+    dispose_engine()
+    monkeypatch.setattr(settings, "DATABASE_URL", str(primary.url))
+    monkeypatch.setattr(settings, "DATABASE_REPLICA_URLS", [str(replica.url)])
+    # Route through the real session dependencies instead of the shared test session.
+    monkeypatch.setattr(app, "dependency_overrides", {})
+    yield sessionmaker(bind=primary), sessionmaker(bind=replica)
+    dispose_engine()
+    primary.dispose()
+    replica.dispose()
+
+
+@pytest.fixture
+def client(databases):
+    primary, replica = databases
+    user = models.User(email="reader@example.com", password="x")
+    with primary() as db:
+        db.add(user)
+        db.commit()
+        token = create_token_pair(db, user)["access_token"]
+        with replica() as replica_db:
+            replica_db.add(models.User(id=user.id, email=user.email, password="x"))
+            replica_db.add(models.Video(
+                title="Only on the replica", video_url="v.mp4", image_url="i.jpg", shared_by=user.id
+            ))
+            replica_db.commit()
+    with TestClient(app) as client:
+        client.headers["Authorization"] = f"Bearer {token}"
+        yield client
+
+
+def feed_titles(client):
+    response = client.get("/api/videos")
+    assert response.status_code == 200
+    return [video["title"] for video in response.json()["Videos"]]
+
+
+def test_reads_go_to_replica(client):
+    assert feed_titles(client) == ["Only on the replica"]
+
+
+def test_client_reads_its_own_writes(client, video_payload):
+    response = client.post("/api/videos", json=video_payload)
+    assert response.status_code == 201
+    assert PRIMARY_COOKIE in response.cookies
+    video_id = response.json()["Video"]["id"]
+
+    assert feed_titles(client) == [video_payload["title"]]
+    assert client.get(f"/api/videos/{video_id}").status_code == 200
+
+    # Once the window has passed, or for any other client, reads are back on the replica.
+    client.cookies.clear()
+    assert feed_titles(client) == ["Only on the replica"]
+    assert client.get(f"/api/videos/{video_id}").status_code == 404
+
+
+def test_failed_writes_do_not_pin_reads(client):
+    response = client.post("/api/videos", json={"title": "missing fields"})
+    assert response.status_code == 422
+    assert PRIMARY_COOKIE not in response.cookies
+
+
+def test_replicas_are_used_in_turn(tmp_path, monkeypatch):
+    urls = [f"sqlite:///{tmp_path / name}" for name in ("a.db", "b.db")]
+    dispose_engine()
+    monkeypatch.setattr(settings, "DATABASE_REPLICA_URLS", urls)
+    try:
+        binds = {str(ReadSessionLocal().get_bind().url) for _ in range(4)}
+        assert binds == set(urls)
+    finally:
+        dispose_engine()
+
+
+def test_reads_use_primary_without_replicas(monkeypatch):
+    monkeypatch.setattr(settings, "DATABASE_REPLICA_URLS", [])
+    dispose_engine()
+    assert get_replica_engines() == []
+    assert ReadSessionLocal().get_bind() is get_engine()
+    dispose_engine()
@@ -0,0 +1,186 @@
+import os
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+from fastapi import HTTPException
+
+from app import models
+from app.api import resumable_uploads
+from app.config import settings
+from app.utils.storage import get_storage
+
+
+@pytest.fixture
+def storage():
+    return get_storage()
+
+
+def pending_uploads(storage):
+    directory = os.path.join(storage.root, ".multipart")
+    return set(os.listdir(directory)) if os.path.isdir(directory) else set()
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(settings, "RESUMABLE_MIN_CHUNK_SIZE", 4)
+    monkeypatch.setattr(settings, "RESUMABLE_MAX_CHUNK_SIZE", 8)
+
+
+def create(client, length=10, filename="holiday.mov"):
+    return client.post("/api/uploads/resumable", json={"filename": filename, "length": length})
+
+
+def patch_chunk(client, location, offset, body):
+    return client.patch(location, content=body, headers={
+        "Upload-Offset": str(offset), "Content-Type": "application/offset+octet-stream",
+    })
+
+
+def test_resumable_upload_flow(auth_client, storage):
+    response = create(auth_client)
+    assert response.status_code == 201
+    location = response.headers["Location"]
+    assert response.headers["Upload-Offset"] == "0"
+    assert response.json()["url"] is None
+
+    response = patch_chunk(auth_client, location, 0, b"\x00\x00\x00\x08wide")
+    assert response.status_code == 200
+    assert response.headers["Upload-Offset"] == "8"
+    assert not response.json()["completed"]
+
+    head = auth_client.head(location)
+    assert head.status_code == 200
+    assert head.headers["Upload-Offset"] == "8"
+    assert head.headers["Upload-Length"] == "10"
+
+    response = patch_chunk(auth_client, location, 8, b"ab")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["completed"]
+    assert body["url"].startswith("videos/") and body["url"].endswith(".mov")
+    with open(storage.path(body["url"]), "rb") as stored:
+        assert stored.read() == b"\x00\x00\x00\x08wideab"
+
+
+def test_resumable_upload_retries_failed_completion(auth_client):
+    location = create(auth_client).headers["Location"]
+    assert patch_chunk(auth_client, location, 0, b"\x00\x00\x00\x08wide").status_code == 200
+    failure = HTTPException(status_code=500, detail="S3 upload failed")
+    with patch("app.api.resumable_uploads.s3.complete_multipart_upload", side_effect=failure):
+        assert patch_chunk(auth_client, location, 8, b"ab").status_code == 500
+    assert auth_client.head(location).headers["Upload-Offset"] == "10"
+
+    response = patch_chunk(auth_client, location, 10, b"")
+    assert response.status_code == 200
+    assert response.json()["completed"]
+
+
+def test_resumable_upload_sniffs_first_chunk(auth_client):
+    location = create(auth_client).headers["Location"]
+    response = patch_chunk(auth_client, location, 0, b"MZ\x90\x00junk")
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid video file format"
+    assert auth_client.head(location).headers["Upload-Offset"] == "0"
+
+
+def test_resumable_upload_offset_mismatch(auth_client):
+    location = create(auth_client).headers["Location"]
+    response = patch_chunk(auth_client, location, 4, b"abcd")
+    assert response.status_code == 409
+    assert response.headers["Upload-Offset"] == "0"
+
+
+def test_concurrent_patches_at_one_offset_never_share_a_part(auth_client, db_session):
+    location = create(auth_client).headers["Location"]
+    sessions = db_session.query(models.UploadSession)
+    sessions.update({models.UploadSession.claimed_at: datetime.utcnow()})
+    db_session.commit()
+    with patch("app.api.resumable_uploads.s3.upload_part") as upload_part:
+        assert patch_chunk(auth_client, location, 0, b"\x00\x00\x00\x08wide").status_code == 409
+        upload_part.assert_not_called()
+
+    # The other request won the offset while this one's part was uploading: its ETag is not recorded.
+    def overtaken(*args):
+        sessions.update({models.UploadSession.claimed_at: datetime.utcnow() + timedelta(seconds=1)})
+        db_session.commit()
+        return "etag"
+
+    sessions.update({models.UploadSession.claimed_at: None})
+    db_session.commit()
+    with patch("app.api.resumable_uploads.s3.upload_part", side_effect=overtaken):
+        assert patch_chunk(auth_client, location, 0, b"\x00\x00\x00\x08wide").status_code == 409
+    db_session.expire_all()
+    assert sessions.one().parts == "[]"
+    assert auth_client.head(location).headers["Upload-Offset"] == "0"
+
+
+def test_part_claims_are_released_on_failure_and_expire(auth_client, db_session):
+    location = create(auth_client).headers["Location"]
+    failure = HTTPException(status_code=500, detail="S3 upload failed")
+    with patch("app.api.resumable_uploads.s3.upload_part", side_effect=failure):
+        assert patch_chunk(auth_client, location, 0, b"\x00\x00\x00\x08wide").status_code == 500
+    db_session.expire_all()
+    assert db_session.query(models.UploadSession).one().claimed_at is None
+
+    # Left behind by a request that died mid-upload.
+    stale = datetime.utcnow() - timedelta(seconds=settings.RESUMABLE_PART_CLAIM_SECONDS + 1)
+    db_session.query(models.UploadSession).update({models.UploadSession.claimed_at: stale})
+    db_session.commit()
+    response = patch_chunk(auth_client, location, 0, b"\x00\x00\x00\x08wide")
+    assert response.status_code == 200
+    assert response.headers["Upload-Offset"] == "8"
+
+
+def test_resumable_upload_rejects_small_and_large_chunks(auth_client):
+    location = create(auth_client, length=20).headers["Location"]
+    assert patch_chunk(auth_client, location, 0, b"ab").status_code == 400
+    assert patch_chunk(auth_client, location, 0, b"abcdefghi").status_code == 413
+    assert auth_client.head(location).headers["Upload-Offset"] == "0"
+
+
+def test_resumable_upload_invalid_format(auth_client, storage):
+    before = pending_uploads(storage)
+    response = create(auth_client, filename="notes.txt")
+    assert response.status_code == 400
+    assert pending_uploads(storage) == before
+
+
+def test_resumable_upload_not_found_for_other_user(auth_client, test_client):
+    location = create(auth_client).headers["Location"]
+    test_client.post("/api/users/", json={"email": "other@example.com", "password": "password123"})
+    token = test_client.post(
+        "/api/users/login", json={"email": "other@example.com", "password": "password123"}
+    ).json()["access_token"]
+    response = test_client.head(location, headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 404
+
+
+def test_resumable_upload_delete_aborts(auth_client, storage):
+    before = pending_uploads(storage)
+    location = create(auth_client).headers["Location"]
+    assert len(pending_uploads(storage) - before) == 1
+    assert auth_client.delete(location).status_code == 204
+    assert pending_uploads(storage) == before
+    assert auth_client.head(location).status_code == 404
+
+
+def test_expire_stale_sessions(auth_client, db_session, storage):
+    before = pending_uploads(storage)
+    location = create(auth_client).headers["Location"]
+    now = datetime.utcnow() + timedelta(hours=settings.RESUMABLE_SESSION_TTL_HOURS, minutes=1)
+
+    assert resumable_uploads.expire_stale_sessions(db_session, now=now) == 1
+    assert pending_uploads(storage) == before
+    assert db_session.query(models.UploadSession).count() == 0
+    assert auth_client.head(location).status_code == 404
+
+
+def test_delete_user_aborts_upload_sessions(auth_client, db_session, storage):
+    before = pending_uploads(storage)
+    create(auth_client)
+    user_id = db_session.query(models.User.id).scalar()
+
+    assert auth_client.delete(f"/api/users/{user_id}").status_code == 202
+    assert pending_uploads(storage) == before
+    assert db_session.query(models.UploadSession).count() == 0
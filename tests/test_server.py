@@ -0,0 +1,109 @@
+import asyncio
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+import websockets
+
+from app.config import settings
+from app.server import build_config, prepare_metrics_dir
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_build_config_defaults(monkeypatch):
+    monkeypatch.setattr(settings, "WEB_CONCURRENCY", 3)
+    monkeypatch.setattr(settings, "GRACEFUL_SHUTDOWN_TIMEOUT", 12)
+    config = build_config(port=9000)
+    assert config.workers == 3
+    assert config.port == 9000
+    assert config.timeout_graceful_shutdown == 12
+    assert build_config(workers=1).workers == 1
+
+
+def test_prepare_metrics_dir_removes_stale_samples(tmp_path, monkeypatch):
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    (tmp_path / "counter_123.db").write_bytes(b"stale")
+    assert prepare_metrics_dir() == str(tmp_path)
+    assert list(tmp_path.iterdir()) == []
+
+
+def wait_until_listening(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError(f"Server did not listen on port {port}")
+
+
+def test_sigterm_drains_websockets(tmp_path):
+    port = free_port()
+    env = {
+        "PATH": os.environ["PATH"], "PYTHONPATH": PROJECT_ROOT, "SECRET_KEY": "test",
+        "STORAGE_BACKEND": "local", "LOCAL_STORAGE_ROOT": str(tmp_path),
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "app.server", "--host", "127.0.0.1", "--port", str(port), "--workers", "2"],
+        cwd=tmp_path, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_listening(port)
+
+        async def client():
+            async with websockets.connect(f"ws://127.0.0.1:{port}/ws") as websocket:
+                assert await websocket.recv() == "Connection established"
+                server.send_signal(signal.SIGTERM)
+                notice = json.loads(await asyncio.wait_for(websocket.recv(), timeout=10))
+                await asyncio.wait_for(websocket.wait_closed(), timeout=10)
+                return notice, websocket.close_code
+
+        notice, close_code = asyncio.run(client())
+        assert notice["type"] == "reconnect"
+        assert close_code == 1012
+        assert server.wait(timeout=30) == 0
+    finally:
+        if server.poll() is None:
+            server.kill()
+            server.wait()
+
+
+def test_metrics_are_summed_across_workers(tmp_path):
+    port = free_port()
+    env = {
+        "PATH": os.environ["PATH"], "PYTHONPATH": PROJECT_ROOT, "SECRET_KEY": "test",
+        "STORAGE_BACKEND": "local", "LOCAL_STORAGE_ROOT": str(tmp_path), "METRICS_ENABLED": "true",
+        "PROMETHEUS_MULTIPROC_DIR": str(tmp_path),
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "app.server", "--host", "127.0.0.1", "--port", str(port), "--workers", "2"],
+        cwd=tmp_path, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_listening(port)
+        for _ in range(20):
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/api/healthchecker").read()
+        sample = 'http_request_duration_seconds_count{method="GET",route="/api/healthchecker",status="200"} 20.0'
+        # Whichever worker answers, the scrape reports every worker's requests.
+        for _ in range(4):
+            assert sample in urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics").read().decode()
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server.wait()
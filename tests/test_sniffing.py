@@ -0,0 +1,72 @@
+import io
+
+import pytest
+from PIL import Image
+
+from app.config import settings
+from app.utils import sniffing
+
+MP4_HEAD = b"\x00\x00\x00\x18ftypmp42\x00\x00\x00\x00mp42isom"
+
+
+def make_image(format, size=(32, 24)):
+    output = io.BytesIO()
+    Image.new("RGB", size).save(output, format=format)
+    return output.getvalue()
+
+
+def test_sniff_video():
+    assert sniffing.sniff_video(MP4_HEAD) == "mp4"
+    assert sniffing.sniff_video(b"RIFF\x00\x00\x00\x00AVI LIST") == "avi"
+    assert sniffing.sniff_video(sniffing.ASF_GUID + b"\x00" * 8) == "asf"
+    assert sniffing.sniff_video(b"%PDF-1.7 renamed to .mp4") is None
+
+
+@pytest.mark.parametrize("format", ["PNG", "JPEG", "GIF"])
+def test_sniff_image_reads_dimensions_from_the_header(format):
+    assert sniffing.sniff_image(make_image(format)[:1024]) == (format, (32, 24))
+
+
+def test_sniff_image_rejects_other_content():
+    assert sniffing.sniff_image(make_image("BMP")) == (None, None)
+    assert sniffing.sniff_image(b"<html>not an image</html>") == (None, None)
+
+
+def test_upload_rejects_renamed_junk(auth_client):
+    files = {"file": ("holiday.mp4", io.BytesIO(b"#!/bin/sh\necho not a video\n"), "video/mp4")}
+    response = auth_client.post("/api/uploads/video", files=files)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid video file format"
+
+    files = {"file": ("cat.png", io.BytesIO(MP4_HEAD), "image/png")}
+    assert auth_client.post("/api/uploads/image", files=files).status_code == 400
+
+
+def test_upload_rejects_oversized_files_while_streaming(auth_client, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_MAX_VIDEO_SIZE", 1024)
+    body = MP4_HEAD + b"\x00" * 4096
+
+    def chunks():
+        # No Content-Length, so only the streaming check can catch it.
+        yield b"--boundary\r\nContent-Disposition: form-data; name=\"file\"; filename=\"big.mp4\"\r\n\r\n"
+        yield body
+        yield b"\r\n--boundary--\r\n"
+
+    response = auth_client.post(
+        "/api/uploads/video", content=chunks(), headers={"Content-Type": "multipart/form-data; boundary=boundary"}
+    )
+    assert response.status_code == 413
+
+    # Refused from Content-Length alone.
+    files = {"file": ("big.mp4", io.BytesIO(body + b"\x00" * sniffing.MULTIPART_OVERHEAD), "video/mp4")}
+    response = auth_client.post("/api/uploads/video", files=files)
+    assert response.status_code == 413
+    assert response.json()["detail"] == "File exceeds the 1024 bytes allowed"
+
+
+def test_upload_rejects_images_with_too_many_pixels(auth_client, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_MAX_IMAGE_PIXELS", 100)
+    files = {"file": ("wide.png", io.BytesIO(make_image("PNG", (20, 10))), "image/png")}
+    response = auth_client.post("/api/uploads/image", files=files)
+    assert response.status_code == 413
+    assert response.json()["detail"] == "Image exceeds 100 pixels"
@@ -0,0 +1,101 @@
+import os
+import subprocess
+import sys
+import uuid
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import Session
+
+from app import models
+from app.models import Base
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_python(args, cwd, **env):
+    environment = {"PATH": os.environ["PATH"], "PYTHONPATH": PROJECT_ROOT, **env}
+    return subprocess.run(
+        [sys.executable, *args], cwd=cwd, env=environment, capture_output=True, text=True, timeout=60
+    )
+
+
+def test_import_has_no_side_effects(tmp_path):
+    # No .env, no AWS credentials and no database: importing the app must still succeed.
+    result = run_python(
+        ["-c", "import sys, app.main; print('boto3' in sys.modules, 'botocore' in sys.modules)"], tmp_path
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split() == ["False", "False"]
+    assert os.listdir(tmp_path) == []
+
+
+def test_migrations_create_schema_matching_models(tmp_path):
+    database_url = f"sqlite:///{tmp_path / 'app.db'}"
+    result = run_python(["-m", "app.cli", "migrate"], tmp_path, DATABASE_URL=database_url)
+    assert result.returncode == 0, result.stderr
+
+    alembic_ini = os.path.join(PROJECT_ROOT, "alembic.ini")
+    result = run_python(["-m", "alembic", "-c", alembic_ini, "check"], tmp_path, DATABASE_URL=database_url)
+    assert result.returncode == 0, result.stderr
+
+    engine = create_engine(database_url)
+    result = run_python(["-m", "app.cli", "downgrade", "base"], tmp_path, DATABASE_URL=database_url)
+    assert result.returncode == 0, result.stderr
+    assert inspect(engine).get_table_names() == ["alembic_version"]
+
+
+def test_migrate_refuses_unversioned_database(tmp_path):
+    database_url = f"sqlite:///{tmp_path / 'app.db'}"
+    Base.metadata.create_all(bind=create_engine(database_url))
+    result = run_python(["-m", "app.cli", "migrate"], tmp_path, DATABASE_URL=database_url)
+    assert result.returncode != 0
+    assert "stamp" in result.stderr
+
+
+def test_uuid_migration_converts_rows_in_place(tmp_path):
+    database_url = f"sqlite:///{tmp_path / 'app.db'}"
+    assert run_python(["-m", "app.cli", "migrate", "0003"], tmp_path, DATABASE_URL=database_url).returncode == 0
+    engine = create_engine(database_url)
+    # All digits: must not be mistaken for a number while the column type changes.
+    user_id, video_id = uuid.UUID("12345678901234567890123456789012"), uuid.uuid4()
+    with engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO users (id, email, password, token_version, video_count) VALUES (:id, 'a@b.c', 'x', 0, 1)"
+        ), {"id": user_id.hex})
+        connection.execute(text(
+            "INSERT INTO videos (id, title, video_url, image_url, shared_by, likes, dislikes, shared_at,"
+            " trending_score) VALUES (:id, 't', 'v.mp4', 'i.jpg', :user_id, 0, 0, '2024-01-01 00:00:00', 0)"
+        ), {"id": video_id.hex, "user_id": user_id.hex})
+
+    result = run_python(["-m", "app.cli", "migrate"], tmp_path, DATABASE_URL=database_url)
+    assert result.returncode == 0, result.stderr
+
+    with Session(engine) as db:
+        video = db.get(models.Video, video_id)
+        assert video.user.id == user_id
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT length(id) FROM users")).scalar() == 16
+
+
+def test_grant_and_revoke_admin(tmp_path):
+    database_url = f"sqlite:///{tmp_path / 'app.db'}"
+    assert run_python(["-m", "app.cli", "migrate"], tmp_path, DATABASE_URL=database_url).returncode == 0
+    engine = create_engine(database_url)
+    with engine.begin() as connection:
+        connection.execute(text(
+            "INSERT INTO users (id, email, password, token_version, video_count) VALUES (:id, 'a@b.c', 'x', 0, 0)"
+        ), {"id": uuid.uuid4().bytes})
+
+    def is_admin():
+        with engine.connect() as connection:
+            return connection.execute(text("SELECT is_admin FROM users")).scalar()
+
+    assert not is_admin()
+    result = run_python(["-m", "app.cli", "grant-admin", "a@b.c"], tmp_path, DATABASE_URL=database_url)
+    assert result.returncode == 0, result.stderr
+    assert is_admin()
+    result = run_python(["-m", "app.cli", "revoke-admin", "a@b.c"], tmp_path, DATABASE_URL=database_url)
+    assert result.returncode == 0, result.stderr
+    assert not is_admin()
+    result = run_python(["-m", "app.cli", "grant-admin", "nobody@b.c"], tmp_path, DATABASE_URL=database_url)
+    assert result.returncode != 0
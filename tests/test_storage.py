@@ -0,0 +1,78 @@
+import asyncio
+import io
+
+import pytest
+
+from app.utils.storage import AsyncStorage, LocalStorage, S3Storage, StorageBackend, StorageError
+
+
+@pytest.fixture
+def local(tmp_path):
+    return LocalStorage(str(tmp_path), base_url="http://testserver/media")
+
+
+def test_local_storage_roundtrip(local):
+    local.upload_fileobj(io.BytesIO(b"video bytes"), "videos/a.mp4")
+    local.put_bytes(b"thumb", "thumbnails/a.webp", "image/webp")
+    with open(local.path("videos/a.mp4"), "rb") as stored:
+        assert stored.read() == b"video bytes"
+    with open(local.source_url("thumbnails/a.webp"), "rb") as stored:
+        assert stored.read() == b"thumb"
+    assert local.public_url("videos/a.mp4") == "http://testserver/media/videos/a.mp4"
+
+
+def test_incomplete_backend_cannot_be_created():
+    class UploadOnly(StorageBackend):
+        def upload_fileobj(self, fileobj, key, content_type=None):
+            pass
+
+    with pytest.raises(TypeError, match="abstract"):
+        UploadOnly()
+
+
+def test_local_storage_rejects_keys_outside_root(local):
+    with pytest.raises(StorageError):
+        local.path("../outside.txt")
+
+
+def test_local_storage_multipart(local):
+    upload_id = local.create_multipart_upload("videos/big.mov")
+    etag_2 = local.upload_part("videos/big.mov", upload_id, 2, io.BytesIO(b"world"), 5)
+    etag_1 = local.upload_part("videos/big.mov", upload_id, 1, io.BytesIO(b"hello "), 6)
+    local.complete_multipart_upload("videos/big.mov", upload_id, [
+        {"PartNumber": 2, "ETag": etag_2}, {"PartNumber": 1, "ETag": etag_1},
+    ])
+    with open(local.path("videos/big.mov"), "rb") as stored:
+        assert stored.read() == b"hello world"
+
+    with pytest.raises(StorageError):
+        local.upload_part("videos/big.mov", upload_id, 3, io.BytesIO(b"late"), 4)
+
+
+def test_async_storage_runs_backend_off_loop(local):
+    storage = AsyncStorage(local, max_workers=2)
+
+    async def run():
+        await asyncio.gather(*[
+            storage.upload_fileobj(io.BytesIO(str(index).encode()), f"videos/{index}.mp4") for index in range(5)
+        ])
+
+    asyncio.run(run())
+    storage.shutdown()
+    for index in range(5):
+        with open(local.path(f"videos/{index}.mp4"), "rb") as stored:
+            assert stored.read() == str(index).encode()
+
+
+def test_s3_storage_client_configuration():
+    storage = S3Storage(
+        bucket="bucket", region="us-east-1", access_key_id="key", secret_access_key="secret",
+        max_pool_connections=64, max_attempts=7, connect_timeout=2, read_timeout=30,
+    )
+    assert storage._client is None
+    client_config = storage.client.meta.config
+    assert client_config.max_pool_connections == 64
+    assert client_config.retries == {"total_max_attempts": 7, "mode": "adaptive"}
+    assert client_config.connect_timeout == 2
+    assert client_config.read_timeout == 30
+    assert storage.public_url("videos/a.mp4") == "https://bucket.s3.us-east-1.amazonaws.com/videos/a.mp4"
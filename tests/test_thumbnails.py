@@ -0,0 +1,98 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from PIL import Image
+
+from app import models
+from app.config import settings
+from app.utils import thumbnails
+from app.utils.images import render_thumbnails
+from app.utils.storage import get_storage
+
+
+def make_png(width=800, height=600):
+    output = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 30, 30)).save(output, format="PNG")
+    return output.getvalue()
+
+
+def test_thumbnail_key():
+    assert thumbnails.thumbnail_key("images/cat_1700000000.jpg", 320) == "thumbnails/images/cat_1700000000_320w.webp"
+
+
+def test_render_thumbnails_resizes_to_webp_without_upscaling():
+    variants = render_thumbnails(make_png(), [160, 320, 1000])
+    assert sorted(variants) == [160, 320, 1000]
+    sizes = {}
+    for width, data in variants.items():
+        with Image.open(io.BytesIO(data)) as image:
+            assert image.format == "WEBP"
+            sizes[width] = image.size
+    assert sizes[160] == (160, 120)
+    assert sizes[320] == (320, 240)
+    assert sizes[1000] == (800, 600)
+
+
+def test_pick_variant():
+    variants = {160: "small", 320: "medium", 640: "large"}
+    assert thumbnails.pick_variant(variants, 100) == "small"
+    assert thumbnails.pick_variant(variants, 200) == "medium"
+    assert thumbnails.pick_variant(variants, 2000) == "large"
+    assert thumbnails.pick_variant({}, 320) is None
+
+
+@patch("app.utils.thumbnails.s3.upload_bytes_to_s3", side_effect=lambda data, key, content_type: key)
+def test_generate_thumbnails_stores_variants(mock_upload, db_session, monkeypatch):
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(thumbnails, "get_process_pool", lambda: pool)
+    monkeypatch.setattr(thumbnails, "SessionLocal", lambda: db_session)
+
+    get_storage().put_bytes(make_png(), "images/cat.png", "image/png")
+
+    thumbnails.generate_thumbnails("images/cat.png")
+
+    rows = db_session.query(models.Thumbnail).filter(models.Thumbnail.source_key == "images/cat.png").all()
+    assert sorted(row.width for row in rows) == sorted(settings.THUMBNAIL_WIDTHS)
+    assert mock_upload.call_count == len(settings.THUMBNAIL_WIDTHS)
+
+
+def test_list_videos_serves_smallest_suitable_thumbnail(auth_client, db_session, video_payload):
+    video_payload["image_url"] = "images/cat.png"
+    auth_client.post("/api/videos/", json=video_payload)
+    for width in (160, 320, 640):
+        db_session.add(models.Thumbnail(
+            source_key="images/cat.png", width=width, key=thumbnails.thumbnail_key("images/cat.png", width)
+        ))
+    db_session.commit()
+
+    response = auth_client.get("/api/videos/", params={"image_width": 300})
+    image_url = response.json()["Videos"][0]["image_url"]
+    assert image_url.endswith("thumbnails/images/cat_320w.webp")
+
+    response = auth_client.get("/api/videos/", params={"image_width": 100})
+    assert response.json()["Videos"][0]["image_url"].endswith("thumbnails/images/cat_160w.webp")
+
+
+@patch("app.api.uploads.thumbnails.schedule_thumbnails", return_value=["thumbnails/images/cat_160w.webp"])
+@patch("app.api.uploads.upload_file_to_s3", return_value="images/cat.png")
+def test_upload_image_schedules_thumbnails(mock_upload, mock_schedule, auth_client, monkeypatch):
+    monkeypatch.setattr(settings, "THUMBNAILS_ENABLED", True)
+    body = make_png(64, 64)
+    response = auth_client.post("/api/uploads/image", files={"file": ("cat.png", io.BytesIO(body), "image/png")})
+    assert response.status_code == 200
+    assert response.json()["thumbnails"] == ["thumbnails/images/cat_160w.webp"]
+    mock_schedule.assert_called_once_with("images/cat.png")
+
+
+def test_generate_thumbnails_skips_existing_variants(db_session, monkeypatch, caplog):
+    for width in settings.THUMBNAIL_WIDTHS:
+        db_session.add(models.Thumbnail(source_key="images/dup.png", width=width, key=f"k{width}"))
+    db_session.commit()
+    monkeypatch.setattr(thumbnails, "SessionLocal", lambda: db_session)
+    monkeypatch.setattr(thumbnails, "get_process_pool", lambda: None)
+
+    with patch("app.utils.thumbnails.s3.upload_bytes_to_s3") as mock_upload:
+        thumbnails.generate_thumbnails("images/dup.png")
+    mock_upload.assert_not_called()
+    assert not [record for record in caplog.records if record.levelname == "ERROR"]
@@ -0,0 +1,88 @@
+import pytest
+
+from app.auth import get_current_user, revocations
+from app.config import settings
+
+
+@pytest.fixture(autouse=True)
+def clear_revocations():
+    yield
+    revocations.clear()
+
+
+@pytest.fixture
+def tokens(test_client, user_payload):
+    response = test_client.post("/api/users/login", json=user_payload)
+    assert response.status_code == 200
+    return response.json()
+
+
+def refresh(client, refresh_token):
+    return client.post("/api/users/token/refresh", json={"refresh_token": refresh_token})
+
+
+def bearer(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_login_returns_token_pair(tokens, user_payload):
+    assert tokens["token_type"] == "bearer"
+    assert tokens["email"] == user_payload["email"]
+    assert tokens["access_token"] and tokens["refresh_token"]
+
+
+def test_refresh_rotates_token(test_client, tokens):
+    response = refresh(test_client, tokens["refresh_token"])
+    assert response.status_code == 200
+    rotated = response.json()
+    assert rotated["refresh_token"] != tokens["refresh_token"]
+    assert test_client.get("/api/users/", headers=bearer(rotated["access_token"])).status_code == 200
+
+
+def test_reused_refresh_token_revokes_family(test_client, tokens):
+    rotated = refresh(test_client, tokens["refresh_token"]).json()
+
+    assert refresh(test_client, tokens["refresh_token"]).status_code == 401
+    # The legitimate holder is logged out too: the token leaked.
+    assert refresh(test_client, rotated["refresh_token"]).status_code == 401
+
+
+def test_refresh_and_access_tokens_are_not_interchangeable(test_client, tokens):
+    assert refresh(test_client, tokens["access_token"]).status_code == 401
+    assert test_client.get("/api/users/", headers=bearer(tokens["refresh_token"])).status_code == 401
+
+
+def test_logout_revokes_refresh_token(test_client, tokens):
+    response = test_client.post("/api/users/logout", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 204
+    assert refresh(test_client, tokens["refresh_token"]).status_code == 401
+
+
+def test_access_token_checked_without_database(test_client, db_session, tokens, monkeypatch):
+    monkeypatch.setattr(settings, "REVOCATION_REFRESH_SECONDS", 3600)
+    revocations.load(db_session)
+
+    user = get_current_user(tokens["access_token"], db=None)
+    assert user.email == tokens["email"]
+
+
+def test_password_change_revokes_tokens(test_client, tokens):
+    headers = bearer(tokens["access_token"])
+    user_id = test_client.get("/api/users/", headers=headers).json()["users"][0]["id"]
+
+    response = test_client.patch(f"/api/users/{user_id}", json={"password": "anotherpassword"}, headers=headers)
+    assert response.status_code == 202
+
+    assert test_client.get("/api/users/", headers=headers).status_code == 401
+    assert refresh(test_client, tokens["refresh_token"]).status_code == 401
+
+
+def test_revocations_reach_other_workers(test_client, db_session, tokens, monkeypatch):
+    headers = bearer(tokens["access_token"])
+    user_id = test_client.get("/api/users/", headers=headers).json()["users"][0]["id"]
+    assert test_client.delete(f"/api/users/{user_id}", headers=headers).status_code == 202
+
+    # A worker that did not handle the delete picks it up on its next reload.
+    revocations.clear()
+    monkeypatch.setattr(settings, "REVOCATION_REFRESH_SECONDS", 0)
+    assert test_client.get("/api/users/", headers=headers).status_code == 401
@@ -0,0 +1,162 @@
+import os
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+from uuid import UUID
+
+import pytest
+
+from app import models
+from app.config import settings
+from app.utils import hls, transcoding
+
+RENDITIONS = hls.parse_renditions(["720:2800", "360:800", "1080:5000"])
+
+
+def test_parse_renditions_sorts_lowest_first():
+    assert [rendition.name for rendition in RENDITIONS] == ["360p", "720p", "1080p"]
+    assert RENDITIONS[0].bandwidth == (800 + 128) * 1100
+
+
+def test_select_renditions_does_not_upscale():
+    assert [rendition.height for rendition in hls.select_renditions(RENDITIONS, 720)] == [360, 720]
+    assert hls.select_renditions(RENDITIONS, 240) == RENDITIONS[:1]
+    assert hls.select_renditions(RENDITIONS, None) == RENDITIONS
+
+
+def test_master_playlist_lists_renditions():
+    playlist = hls.master_playlist(RENDITIONS[:2], {RENDITIONS[0]: 640})
+    assert playlist.splitlines() == [
+        "#EXTM3U",
+        "#EXT-X-VERSION:3",
+        "#EXT-X-STREAM-INF:BANDWIDTH=1020800,RESOLUTION=640x360",
+        "360p/index.m3u8",
+        "#EXT-X-STREAM-INF:BANDWIDTH=3220800",
+        "720p/index.m3u8",
+    ]
+
+
+def test_ffmpeg_command_aligns_keyframes_with_segments():
+    command = hls.ffmpeg_command("ffmpeg", "in.mp4", RENDITIONS[1], "/out", 4)
+    assert command[command.index("-force_key_frames") + 1] == "expr:gte(t,n_forced*4)"
+    assert command[command.index("-hls_time") + 1] == "4"
+    assert command[command.index("-vf") + 1] == "scale=-2:720"
+    assert command[-1] == os.path.join("/out", "720p", "index.m3u8")
+
+
+def fake_transcode(source, output_dir, renditions, segment_seconds, timeout):
+    files = []
+    for rendition in renditions:
+        os.makedirs(os.path.join(output_dir, rendition.name))
+        for name in ("segment_00000.ts", "index.m3u8"):
+            with open(os.path.join(output_dir, rendition.name, name), "w") as file:
+                file.write(name)
+            files.append(os.path.join(rendition.name, name))
+    with open(os.path.join(output_dir, hls.MASTER_PLAYLIST), "w") as file:
+        file.write(hls.master_playlist(renditions, {}))
+    return files + [hls.MASTER_PLAYLIST]
+
+
+def share_upload(auth_client, video_payload, monkeypatch):
+    """Share `videos/abc.mp4` with transcoding on; returns the video id and the keys queued for transcoding."""
+    monkeypatch.setattr(settings, "TRANSCODING_ENABLED", True)
+    video_payload["video_url"] = "videos/abc.mp4"
+    with patch("app.api.videos.schedule_transcode") as mock_schedule:
+        response = auth_client.post("/api/videos/", json=video_payload)
+    assert response.status_code == 201
+    return UUID(response.json()["Video"]["id"]), [call.args[0] for call in mock_schedule.call_args_list]
+
+
+def test_create_video_queues_uploaded_videos_only(auth_client, video_payload, monkeypatch):
+    monkeypatch.setattr(settings, "TRANSCODING_ENABLED", True)
+    with patch("app.api.videos.schedule_transcode") as mock_schedule:
+        response = auth_client.post("/api/videos/", json=video_payload)
+    assert response.json()["Video"]["processing_status"] is None
+    mock_schedule.assert_not_called()
+
+    video_id, queued = share_upload(auth_client, video_payload, monkeypatch)
+    assert queued == ["videos/abc.mp4"]
+    video = auth_client.get(f"/api/videos/{video_id}").json()["Video"]
+    assert video["processing_status"] == transcoding.PENDING
+    assert video["manifest_url"] is None
+
+
+@patch("app.utils.transcoding.s3.upload_bytes_to_s3", side_effect=lambda data, key, content_type: key)
+def test_transcode_video_stores_renditions(mock_upload, auth_client, db_session, video_payload, monkeypatch):
+    video_id, _ = share_upload(auth_client, video_payload, monkeypatch)
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(transcoding, "get_process_pool", lambda: pool)
+    monkeypatch.setattr(transcoding, "SessionLocal", lambda: db_session)
+    monkeypatch.setattr(transcoding.hls, "transcode_hls", fake_transcode)
+
+    transcoding.transcode_video("videos/abc.mp4")
+
+    keys = [call.args[1] for call in mock_upload.call_args_list]
+    assert keys[-1] == "hls/videos/abc/master.m3u8"
+    assert "hls/videos/abc/360p/segment_00000.ts" in keys
+    content_types = {call.args[1]: call.args[2] for call in mock_upload.call_args_list}
+    assert content_types["hls/videos/abc/360p/segment_00000.ts"] == "video/mp2t"
+    assert content_types["hls/videos/abc/master.m3u8"] == "application/vnd.apple.mpegurl"
+
+    video = auth_client.get(f"/api/videos/{video_id}").json()["Video"]
+    assert video["processing_status"] == transcoding.READY
+    assert video["manifest_url"].endswith("/hls/videos/abc/master.m3u8")
+    listed = auth_client.get("/api/videos/").json()["Videos"][0]
+    assert listed["manifest_url"] == video["manifest_url"]
+
+    # Sharing the same upload again reuses the renditions.
+    _, queued = share_upload(auth_client, video_payload, monkeypatch)
+    assert queued == []
+    assert {video["processing_status"] for video in auth_client.get("/api/videos/").json()["Videos"]} == {"ready"}
+
+
+def test_transcode_video_marks_failures(auth_client, db_session, video_payload, monkeypatch, caplog):
+    video_id, _ = share_upload(auth_client, video_payload, monkeypatch)
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(transcoding, "get_process_pool", lambda: pool)
+    monkeypatch.setattr(transcoding, "SessionLocal", lambda: db_session)
+
+    def broken_transcode(*args):
+        raise RuntimeError("ffmpeg failed for 360p")
+
+    monkeypatch.setattr(transcoding.hls, "transcode_hls", broken_transcode)
+
+    transcoding.transcode_video("videos/abc.mp4")
+
+    assert db_session.get(models.Video, video_id).processing_status == transcoding.FAILED
+    assert "Transcoding failed for videos/abc.mp4" in caplog.text
+
+
+def test_update_video_url_resets_renditions(auth_client, db_session, video_payload, monkeypatch):
+    video_id, _ = share_upload(auth_client, video_payload, monkeypatch)
+    db_session.query(models.Video).filter(models.Video.id == video_id).update(
+        {models.Video.processing_status: transcoding.READY, models.Video.manifest_key: "hls/videos/abc/master.m3u8"}
+    )
+    db_session.commit()
+
+    with patch("app.api.videos.schedule_transcode") as mock_schedule:
+        response = auth_client.patch(f"/api/videos/{video_id}", json={"video_url": "videos/def.mp4"})
+    assert response.json()["Video"]["processing_status"] == transcoding.PENDING
+    assert response.json()["Video"]["manifest_url"] is None
+    mock_schedule.assert_called_once_with("videos/def.mp4")
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is not installed")
+def test_transcode_hls_with_ffmpeg(tmp_path):
+    source = str(tmp_path / "source.mp4")
+    subprocess.run(
+        ["ffmpeg", "-loglevel", "error", "-f", "lavfi", "-i", "testsrc=duration=5:size=640x360:rate=25",
+         "-f", "lavfi", "-i", "sine=duration=5", "-shortest", source],
+        check=True,
+    )
+    output_dir = str(tmp_path / "hls")
+
+    files = hls.transcode_hls(source, output_dir, RENDITIONS, segment_seconds=2)
+
+    # Only the rendition that does not upscale the 360p source.
+    assert files[-1] == hls.MASTER_PLAYLIST
+    assert os.path.join("360p", "index.m3u8") in files
+    assert not any(name.startswith("720p") for name in files)
+    with open(os.path.join(output_dir, hls.MASTER_PLAYLIST)) as master:
+        assert "RESOLUTION=640x360" in master.read()
@@ -0,0 +1,89 @@
+import base64
+import json
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import models
+from app.utils import trending
+
+
+def test_score_favours_votes_and_recency():
+    now = datetime(2024, 6, 1)
+    assert trending.trending_score(100, 0, now) > trending.trending_score(10, 0, now)
+    assert trending.trending_score(0, 10, now) < trending.trending_score(0, 0, now)
+    # A day newer beats ten times the net votes.
+    assert trending.trending_score(1, 0, now + timedelta(days=1)) > trending.trending_score(10, 0, now)
+
+
+@pytest.fixture
+def videos(auth_client, db_session, video_payload):
+    ids = [auth_client.post("/api/videos", json=video_payload).json()["Video"]["id"] for _ in range(5)]
+    # Same age, so the ranking is decided by votes alone.
+    shared_at = datetime(2024, 6, 1)
+    db_session.query(models.Video).update({models.Video.shared_at: shared_at}, synchronize_session=False)
+    for likes, video_id in enumerate(ids):
+        db_session.query(models.Video).filter(models.Video.id == video_id).update(
+            {models.Video.likes: likes * 10}, synchronize_session=False
+        )
+    trending.refresh_all_scores(db_session)
+    return ids
+
+
+def test_trending_orders_by_score(test_client, videos):
+    response = test_client.get("/api/videos/trending", params={"limit": 10})
+    assert response.status_code == 200
+    body = response.json()
+    assert [video["id"] for video in body["Videos"]] == videos[::-1]
+    assert body["NextCursor"] is None
+
+
+def test_trending_keyset_pagination(test_client, videos):
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        body = test_client.get("/api/videos/trending", params=params).json()
+        seen += [video["id"] for video in body["Videos"]]
+        cursor = body["NextCursor"]
+        if cursor is None:
+            break
+    assert seen == videos[::-1]
+
+
+def test_trending_rejects_bad_cursor(test_client):
+    assert test_client.get("/api/videos/trending", params={"cursor": "not-a-cursor"}).status_code == 400
+
+
+@pytest.mark.parametrize("values", [[1.0, 5], [1.0, None], ["1.0", uuid.uuid4().hex], {"a": 1, "b": 2}])
+def test_trending_rejects_cursor_with_wrong_types(test_client, values):
+    cursor = base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+    assert test_client.get("/api/videos/trending", params={"cursor": cursor}).status_code == 400
+
+
+def test_vote_updates_counts_and_score(auth_client, db_session, videos):
+    video_id = uuid.UUID(videos[1])
+    before = db_session.get(models.Video, video_id).trending_score
+    response = auth_client.post(f"/api/videos/{videos[1]}/vote", json={"value": 1})
+    assert response.status_code == 200
+    assert response.json()["Video"]["likes"] == 11
+
+    assert trending.refresher.flush(db_session) == 1
+    assert db_session.get(models.Video, video_id).trending_score > before
+
+
+def test_vote_can_change_and_be_withdrawn(auth_client, videos):
+    video_id = videos[0]
+    auth_client.post(f"/api/videos/{video_id}/vote", json={"value": 1})
+    video = auth_client.post(f"/api/videos/{video_id}/vote", json={"value": -1}).json()["Video"]
+    assert (video["likes"], video["dislikes"]) == (0, 1)
+    # Repeating a vote does not count it twice.
+    video = auth_client.post(f"/api/videos/{video_id}/vote", json={"value": -1}).json()["Video"]
+    assert (video["likes"], video["dislikes"]) == (0, 1)
+    video = auth_client.post(f"/api/videos/{video_id}/vote", json={"value": 0}).json()["Video"]
+    assert (video["likes"], video["dislikes"]) == (0, 0)
+
+
+def test_vote_requires_known_video(auth_client):
+    response = auth_client.post("/api/videos/00000000-0000-4000-8000-000000000000/vote", json={"value": 1})
+    assert response.status_code == 404
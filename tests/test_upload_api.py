@@ -1,5 +1,15 @@
+import hashlib
+import io
+import threading
 from unittest.mock import patch
 
+import pytest
+from fastapi import UploadFile
+
+from app.models import Upload
+from app.utils.s3 import upload_file_to_s3
+from app.utils.storage import get_storage
+
 
 @patch('app.api.uploads.upload_file_to_s3')
 def test_upload_image_jpg(mock_upload, auth_client, sample_image):
@@ -129,3 +139,53 @@ def test_upload_invalid_video_format(auth_client, sample_video):
     response = auth_client.post("/api/uploads/video", files=files)
     assert response.status_code == 400
     assert "Invalid video file format" in response.json()["detail"]
+
+
+def make_upload(content, filename="test_video.mp4"):
+    return UploadFile(file=io.BytesIO(content), filename=filename, size=len(content))
+
+
+def store(content, filename, db):
+    return upload_file_to_s3(make_upload(content, filename), "videos", db, hashlib.sha256(content).hexdigest())
+
+
+@pytest.mark.asyncio
+async def test_upload_uses_content_addressed_key(db_session):
+    content = b"fake video content"
+    key = await store(content, "Holiday.MP4", db_session)
+    assert key == f"videos/{hashlib.sha256(content).hexdigest()}.mp4"
+    with open(get_storage().path(key), "rb") as stored:
+        assert stored.read() == content
+    assert db_session.get(Upload, hashlib.sha256(content).hexdigest()).size == len(content)
+
+
+@pytest.mark.asyncio
+async def test_upload_duplicate_content_is_not_resent(db_session):
+    first = await store(b"same bytes", "a.mp4", db_session)
+    assert db_session.get(Upload, hashlib.sha256(b"same bytes").hexdigest()).last_seen_at is None
+    with patch("app.utils.storage.LocalStorage.upload_fileobj") as mock_upload:
+        second = await store(b"same bytes", "b.mov", db_session)
+        assert second == first
+        mock_upload.assert_not_called()
+        assert db_session.get(Upload, hashlib.sha256(b"same bytes").hexdigest()).last_seen_at is not None
+
+        third = await store(b"other bytes", "a.mp4", db_session)
+        assert third != first
+        mock_upload.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_upload_index_is_queried_off_the_event_loop(db_session):
+    threads, get = [], db_session.get
+    with patch.object(db_session, "get", side_effect=lambda *args: threads.append(threading.get_ident()) or get(*args)):
+        await store(b"some bytes", "a.mp4", db_session)
+        await store(b"some bytes", "a.mp4", db_session)
+    assert len(threads) == 2
+    assert threading.get_ident() not in threads
+
+
+def test_upload_is_hashed_while_it_streams_in(auth_client, sample_video):
+    content = sample_video.getvalue()
+    response = auth_client.post("/api/uploads/video", files={"file": ("clip.mp4", sample_video, "video/mp4")})
+    assert response.status_code == 200
+    assert response.json()["url"] == f"videos/{hashlib.sha256(content).hexdigest()}.mp4"
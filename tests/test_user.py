@@ -1,6 +1,9 @@
 import time
 from uuid import UUID
 
+from app import models
+from app.auth import create_token_pair, hash_password
+
 
 def test_root(test_client):
     response = test_client.get("/api/healthchecker")
@@ -230,3 +233,53 @@ def test_delete_user_not_found(auth_client):
     response = auth_client.delete(f"/api/users/{non_existent_user_id}")
 
     assert response.status_code == 500
+
+
+def test_get_user_videos(auth_client, video_payload):
+    user_id = auth_client.get("/api/users/").json()["users"][0]["id"]
+    created = [auth_client.post("/api/videos", json=video_payload).json()["Video"]["id"] for _ in range(3)]
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = auth_client.get(f"/api/users/{user_id}/videos", params=params)
+        assert response.status_code == 200
+        response_json = response.json()
+        assert response_json["VideoCount"] == 3
+        seen += [video["id"] for video in response_json["Videos"]]
+        cursor = response_json["NextCursor"]
+        if cursor is None:
+            break
+    assert sorted(seen) == sorted(created)
+    assert len(seen) == 3
+
+    auth_client.delete(f"/api/videos/{created[0]}")
+    assert auth_client.get(f"/api/users/{user_id}").json()["User"]["video_count"] == 2
+
+
+def test_get_user_videos_not_found(test_client):
+    response = test_client.get(f"/api/users/{UUID(int=0)}/videos")
+    assert response.status_code == 404
+
+
+def test_delete_user_hands_videos_to_the_reaper_and_removes_votes(auth_client, db_session, video_payload):
+    user_id = auth_client.get("/api/users/").json()["users"][0]["id"]
+    own_video = auth_client.post("/api/videos", json=video_payload).json()["Video"]["id"]
+
+    other = models.User(email="other@example.com", password=hash_password("securepassword123"))
+    db_session.add(other)
+    db_session.commit()
+    other_headers = {"Authorization": f"Bearer {create_token_pair(db_session, other)['access_token']}"}
+    other_video = auth_client.post("/api/videos", json=video_payload, headers=other_headers).json()["Video"]["id"]
+    auth_client.post(f"/api/videos/{other_video}/vote", json={"value": 1})
+    auth_client.post(f"/api/videos/{own_video}/vote", json={"value": -1}, headers=other_headers)
+
+    assert auth_client.delete(f"/api/users/{user_id}").status_code == 202
+
+    assert auth_client.get(f"/api/videos/{own_video}", headers=other_headers).status_code == 404
+    assert auth_client.get(f"/api/videos/{other_video}", headers=other_headers).json()["Video"]["likes"] == 0
+    assert db_session.query(models.Vote).count() == 0
+    # Soft-deleted, so the reaper purges its storage objects along with the row.
+    video = db_session.get(models.Video, UUID(own_video))
+    assert video.deleted_at is not None
+    assert video.shared_by is None
@@ -60,6 +60,18 @@ def test_list_videos(auth_client, video_payload):
     assert len(response_json["Videos"]) > 0
 
 
+def test_list_videos_by_tag(auth_client, video_payload):
+    for tags in ("music,live", "live", "livestream,news", "news,live_set"):
+        auth_client.post("/api/videos/", json={**video_payload, "tags": tags})
+
+    response = auth_client.get("/api/videos/", params={"tag": "live"})
+    assert response.status_code == 200
+    assert sorted(video["tags"] for video in response.json()["Videos"]) == ["live", "music,live"]
+    # `_` is matched literally, not as a LIKE wildcard.
+    response = auth_client.get("/api/videos/", params={"tag": "live_set"})
+    assert [video["tags"] for video in response.json()["Videos"]] == ["news,live_set"]
+
+
 def test_update_video(auth_client, video_payload, video_payload_updated):
     # Create a video
     create_response = auth_client.post("/api/videos/", json=video_payload)
@@ -1,4 +1,103 @@
+import json
+
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from app.api.websockets import websocketsManager
+from app.config import settings
+
+
 def test_websocket_connection(websocket_client):
     with websocket_client.websocket_connect("/ws") as websocket:
         data = websocket.receive_text()
         assert data == "Connection established"
+
+
+def test_websocket_receives_new_video_notification(auth_client, video_payload):
+    with auth_client.websocket_connect("/ws") as websocket:
+        assert websocket.receive_text() == "Connection established"
+        response = auth_client.post("/api/videos/", json=video_payload)
+        assert response.status_code == 201
+
+        notification = json.loads(websocket.receive_text())
+        assert notification["type"] == "newVideo"
+        assert notification["data"]["id"] == response.json()["Video"]["id"]
+        assert notification["data"]["title"] == video_payload["title"]
+
+
+def test_vote_reaches_only_watchers_of_the_video(auth_client, video_payload):
+    video_id = auth_client.post("/api/videos/", json=video_payload).json()["Video"]["id"]
+    with auth_client.websocket_connect(f"/ws?channels=video:{video_id}") as watcher, \
+            auth_client.websocket_connect("/ws") as feed:
+        assert watcher.receive_text() == "Connection established"
+        assert feed.receive_text() == "Connection established"
+        assert websocketsManager.presence(f"video:{video_id}") == 1
+
+        response = auth_client.post(f"/api/videos/{video_id}/vote", json={"value": 1})
+        assert response.status_code == 200
+
+        event = watcher.receive_json()
+        assert event == {"type": "voteVideo", "data": {"id": video_id, "likes": 1, "dislikes": 0}}
+        feed.send_json({"action": "presence", "channel": f"video:{video_id}"})
+        # Nothing was queued for the feed connection before its own reply.
+        assert feed.receive_json() == {"type": "presence", "data": {"channel": f"video:{video_id}", "count": 1}}
+    assert websocketsManager.presence(f"video:{video_id}") == 0
+    assert websocketsManager.presence("feed") == 0
+
+
+def test_other_spellings_of_an_id_reach_its_channel(auth_client, video_payload):
+    video_id = auth_client.post("/api/videos/", json=video_payload).json()["Video"]["id"]
+    with auth_client.websocket_connect(f"/ws?channels=video:{video_id.replace('-', '')}") as hex_watcher, \
+            auth_client.websocket_connect("/ws") as upper_watcher:
+        assert hex_watcher.receive_text() == "Connection established"
+        assert upper_watcher.receive_text() == "Connection established"
+        upper_watcher.send_json({"action": "subscribe", "channel": f"video:{video_id.upper()}"})
+        assert upper_watcher.receive_json() == {
+            "type": "presence", "data": {"channel": f"video:{video_id}", "count": 2},
+        }
+
+        auth_client.post(f"/api/videos/{video_id}/vote", json={"value": 1})
+
+        event = {"type": "voteVideo", "data": {"id": video_id, "likes": 1, "dislikes": 0}}
+        assert hex_watcher.receive_json() == event
+        assert upper_watcher.receive_json() == event
+        upper_watcher.send_json({"action": "subscribe", "channel": f"video:{'-' * 36}"})
+        assert upper_watcher.receive_json()["type"] == "error"
+
+
+def test_subscribe_and_unsubscribe(websocket_client):
+    with websocket_client.websocket_connect("/ws") as websocket:
+        assert websocket.receive_text() == "Connection established"
+        websocket.send_json({"action": "subscribe", "channel": "tag:music"})
+        assert websocket.receive_json() == {"type": "presence", "data": {"channel": "tag:music", "count": 1}}
+        websocket.send_json({"action": "unsubscribe", "channel": "tag:music"})
+        assert websocket.receive_json() == {"type": "presence", "data": {"channel": "tag:music", "count": 0}}
+        websocket.send_json({"action": "subscribe", "channel": "everything"})
+        assert websocket.receive_json()["type"] == "error"
+
+
+@pytest.fixture
+def draining_manager():
+    yield websocketsManager
+    websocketsManager.draining = False
+
+
+def test_drain_asks_clients_to_reconnect(websocket_client, draining_manager):
+    with websocket_client.websocket_connect("/ws") as websocket:
+        assert websocket.receive_text() == "Connection established"
+        websocket.portal.call(draining_manager.drain)
+
+        notice = websocket.receive_json()
+        assert notice["type"] == "reconnect"
+        assert 0 <= notice["data"]["retry_after_ms"] <= settings.WS_RECONNECT_MAX_DELAY_MS
+        assert websocket.receive() == {"type": "websocket.close", "code": 1012, "reason": ""}
+    assert draining_manager.active_connections == set()
+    assert draining_manager.channels == {}
+
+
+def test_draining_refuses_new_connections(websocket_client, draining_manager):
+    draining_manager.draining = True
+    with pytest.raises(WebSocketDisconnect) as excinfo:
+        with websocket_client.websocket_connect("/ws"):
+            pass
+    assert excinfo.value.code == 1012